@@ -1,26 +1,58 @@
 """
 Authentication and authorization utilities for SQLite
 """
+import hashlib
+import hmac
 import os
+import secrets
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional, Set, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache import TTLCache
 from database import get_db
-from models import UserTable, TokenData, UserRole
+from last_seen import last_seen_tracker
+from models import RefreshTokenTable, UserTable, TokenData, UserRole
+from passwords import HashingQueueFull, password_hasher
+from revocation import RevocationList
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# The token a refresh replaced stays usable this long, for concurrent refreshes
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+class Principal(NamedTuple):
+    """The authenticated caller: what authorization checks need"""
+    id: str
+    username: str
+    role: UserRole
+    is_active: bool
+
+# (token subject, token version) -> Principal. Other workers' entries for a
+# changed user expire after the TTL; their tokens are rejected from then on.
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Sessions revoked while their access tokens may still be unexpired
+revoked_sessions = RevocationList(timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def invalidate_principal(user_id: str):
+    """Forget a user's cached principals (after an update or delete)"""
+    principal_cache.evict_where(lambda key, principal: principal.id == user_id)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -30,6 +62,27 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password checks in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hashing pool (see passwords)"""
+    try:
+        return await password_hasher.run(verify_password, plain_password, hashed_password)
+    except HashingQueueFull:
+        raise _hashing_busy()
+
+async def hash_password(password: str) -> str:
+    """get_password_hash on the password hashing pool (see passwords)"""
+    try:
+        return await password_hasher.run(get_password_hash, password)
+    except HashingQueueFull:
+        raise _hashing_busy()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -42,6 +95,110 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _hash_refresh_secret(secret: str) -> str:
+    # Refresh secrets are random, so a fast hash is enough (no bcrypt)
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def _new_refresh_token(session: RefreshTokenTable) -> str:
+    secret = secrets.token_urlsafe(32)
+    session.token_hash = _hash_refresh_secret(secret)
+    return f"{session.id}.{secret}"
+
+def create_session(user: UserTable, db: AsyncSession) -> Tuple[str, str]:
+    """Start a login session for ``user``: (session id, refresh token); the caller commits"""
+    session = RefreshTokenTable(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    refresh_token = _new_refresh_token(session)
+    db.add(session)
+    return session.id, refresh_token
+
+def session_tokens(user: UserTable, session_id: str, refresh_token: str) -> dict:
+    """Token response: a fresh access token for the session and its refresh token"""
+    access_token = create_access_token(
+        data={"sub": user.username, "ver": user.token_version or 0, "sid": session_id},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+def _matches(token_hash: Optional[str], secret_hash: str) -> bool:
+    return token_hash is not None and hmac.compare_digest(token_hash, secret_hash)
+
+async def _find_session(refresh_token: str, db: AsyncSession) -> Tuple[Optional[RefreshTokenTable], str]:
+    # (session named by the token, hash of the token's secret)
+    session_id, _, secret = refresh_token.partition(".")
+    if not secret:
+        return None, ""
+    return await db.get(RefreshTokenTable, session_id), _hash_refresh_secret(secret)
+
+async def rotate_refresh_token(refresh_token: str, db: AsyncSession) -> Tuple[UserTable, str, str]:
+    """Check a refresh token and replace it: (user, session id, new refresh token)
+
+    Each refresh token works once. The token it replaced is remembered: if
+    that is presented again within REFRESH_TOKEN_REUSE_GRACE_SECONDS (two
+    tabs refreshing at once) it is rotated like the current one; later, it
+    was copied, and the session is revoked. Any other secret is rejected
+    without touching the session, since session ids are not secret. The
+    caller commits.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    now = datetime.utcnow()
+    session, secret_hash = await _find_session(refresh_token, db)
+    if session is None or session.revoked_at is not None or session.expires_at <= now:
+        raise invalid
+    if not _matches(session.token_hash, secret_hash):
+        if not _matches(session.previous_token_hash, secret_hash):
+            raise invalid
+        grace = timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        if session.last_used_at is None or now - session.last_used_at > grace:
+            await revoke_session(session.id, db)
+            await db.commit()
+            raise invalid
+    user = await db.get(UserTable, session.user_id)
+    if user is None or not user.is_active:
+        raise invalid
+    session.previous_token_hash = session.token_hash
+    session.last_used_at = now
+    return user, session.id, _new_refresh_token(session)
+
+async def revoke_session(session_id: str, db: AsyncSession):
+    """End a login session: its refresh token and access tokens stop working; the caller commits"""
+    await db.execute(
+        update(RefreshTokenTable)
+        .where(RefreshTokenTable.id == session_id, RefreshTokenTable.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    # Harmless before the commit: filter hits are confirmed against the table
+    revoked_sessions.add(session_id)
+
+async def sessions_to_revoke(
+    access_token: Optional[str], refresh_token: Optional[str], db: AsyncSession
+) -> Set[str]:
+    """Ids of the sessions a logout presenting these tokens ends
+
+    An expired access token still identifies its session; a refresh token
+    must be the session's current one.
+    """
+    session_ids = set()
+    if access_token:
+        try:
+            payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+        except JWTError:
+            payload = {}
+        if payload.get("sid"):
+            session_ids.add(payload["sid"])
+    if refresh_token:
+        session, secret_hash = await _find_session(refresh_token, db)
+        if session is not None and _matches(session.token_hash, secret_hash):
+            session_ids.add(session.id)
+    return session_ids
+
 async def authenticate_user(username: str, password: str, db: AsyncSession) -> Optional[UserTable]:
     """Authenticate a user by username and password"""
     result = await db.execute(
@@ -55,7 +212,7 @@ async def authenticate_user(username: str, password: str, db: AsyncSession) -> O
     if not user:
         return None
     
-    if not verify_password(password, user.password_hash):
+    if not await check_password(password, user.password_hash):
         return None
     
     return user
@@ -63,8 +220,14 @@ async def authenticate_user(username: str, password: str, db: AsyncSession) -> O
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> UserTable:
-    """Get the current authenticated user"""
+) -> Principal:
+    """Get the current authenticated user
+
+    Principals are cached by token subject and version, so a request whose
+    user was resolved recently makes no database round trip. A token whose
+    version is behind the user's ``token_version``, or whose session was
+    revoked (see revocation), is rejected.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -78,27 +241,38 @@ async def get_current_user(
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
+        version = payload.get("ver", 0)
+        session_id = payload.get("sid")
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(
-        select(UserTable).where(
-            UserTable.username == token_data.username,
-            UserTable.is_active == True
-        )
-    )
-    user = result.scalar_one_or_none()
-    
-    if user is None:
+    if session_id is not None and await revoked_sessions.is_revoked(session_id, db):
         raise credentials_exception
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    await db.commit()
+    key = (token_data.username, version)
+    principal = principal_cache.get(key)
+    if principal is None:
+        result = await db.execute(
+            select(
+                UserTable.id, UserTable.username, UserTable.role, UserTable.is_active, UserTable.token_version
+            ).where(
+                UserTable.username == token_data.username,
+                UserTable.is_active == True
+            )
+        )
+        user = result.one_or_none()
+        
+        if user is None or (user.token_version or 0) != version:
+            raise credentials_exception
+        principal = Principal(user.id, user.username, user.role, user.is_active)
+        principal_cache.set(key, principal)
     
-    return user
+    # Buffered; last_login itself is only written by the login route
+    last_seen_tracker.record(principal.id)
+    
+    return principal
 
-async def get_current_active_user(current_user: UserTable = Depends(get_current_user)) -> UserTable:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get the current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -106,7 +280,7 @@ async def get_current_active_user(current_user: UserTable = Depends(get_current_
 
 def require_role(required_role: UserRole):
     """Decorator to require a specific role"""
-    async def role_checker(current_user: UserTable = Depends(get_current_active_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_active_user)):
         if current_user.role != required_role and current_user.role != UserRole.ADMIN:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -121,7 +295,7 @@ def require_admin():
 
 def require_editor_or_admin():
     """Require editor or admin role"""
-    async def role_checker(current_user: UserTable = Depends(get_current_active_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_active_user)):
         if current_user.role not in [UserRole.ADMIN, UserRole.EDITOR]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
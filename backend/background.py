@@ -0,0 +1,58 @@
+"""
+Periodic background flush tasks run for the lifetime of the app
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """Run an async ``func`` every ``interval`` seconds, or sooner when woken
+
+    ``stop()`` cancels the loop and runs ``func`` one final time so buffered
+    work is not lost on shutdown.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    def wake(self):
+        """Run ``func`` now instead of waiting for the interval"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._run_once()
+
+    async def _run_once(self):
+        try:
+            await self.func()
+        except Exception:
+            logger.exception("Background task %s failed", self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+        await self._run_once()
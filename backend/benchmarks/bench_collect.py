@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-event server cost of view tracking
+
+"before" sends one POST /api/analytics/track-view/{id} per view, as the
+frontend does today. "after" sends the same views as sendBeacon-style
+text/plain batches to POST /api/analytics/collect. Both go through the
+full ASGI app in-process (routing, middleware, validation, enqueue); the
+periodic flush is the same for both paths and is not measured.
+
+Run from the backend directory:  python benchmarks/bench_collect.py
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Scratch databases only; {shard} is left for shards.shard_url to fill in
+BENCH_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db"
+os.environ["ANALYTICS_SHARD_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/analytics_{{shard}}.db"
+
+import httpx
+
+from database import engine, init_db
+import main
+
+EVENTS = 5000
+BATCH_SIZE = 50
+
+async def before(client, article_ids):
+    for i in range(EVENTS):
+        response = await client.post(f"/api/analytics/track-view/{article_ids[i % len(article_ids)]}")
+        assert response.status_code == 200
+
+async def after(client, article_ids):
+    for start in range(0, EVENTS, BATCH_SIZE):
+        batch = [
+            {"type": "view", "article_id": article_ids[i % len(article_ids)], "visitor_id": f"v{i}"}
+            for i in range(start, start + BATCH_SIZE)
+        ]
+        response = await client.post(
+            "/api/analytics/collect",
+            content=json.dumps(batch),
+            headers={"Content-Type": "text/plain;charset=UTF-8"}
+        )
+        assert response.status_code == 204
+
+async def run():
+    engine.echo = False
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    await init_db()
+    article_ids = [f"article-{i}" for i in range(20)]
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for label, fn in (("before", before), ("after", after)):
+            started = time.perf_counter()
+            await fn(client, article_ids)
+            elapsed = time.perf_counter() - started
+            results[label] = elapsed
+            print(f"{label:>6}: {elapsed / EVENTS * 1e6:8.1f} µs/event  ({EVENTS} events)")
+    print(f"speedup: {results['before'] / results['after']:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency of unrelated requests during a login burst
+
+A burst of concurrent POST /api/auth/login requests runs while GET /health
+is probed in a loop; the probe latencies are reported. "before" checks the
+bcrypt hash inline in the handler, as login did previously, so each check
+blocks the event loop and every probe behind it. "after" uses the bounded
+password hashing pool (see passwords). Both go through the full ASGI app
+in-process.
+
+Run from the backend directory:  python benchmarks/bench_login.py
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Scratch databases only; {shard} is left for shards.shard_url to fill in
+BENCH_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db"
+os.environ["ANALYTICS_SHARD_URL"] = f"sqlite+aiosqlite:///{BENCH_DIR}/analytics_{{shard}}.db"
+# Every burst logs in as one user from one address; keep the login rate limiter out of the way
+os.environ["LOGIN_RATE_IP_BURST"] = os.environ["LOGIN_RATE_USERNAME_BURST"] = "1000"
+
+import httpx
+
+from database import AsyncSessionLocal, engine, init_db
+from models import UserRole, UserTable
+from passwords import password_hasher
+import auth
+import main
+
+LOGINS = 20
+PROBE_INTERVAL_SECONDS = 0.005
+PASSWORD = "correct horse battery staple"
+
+async def check_inline(plain_password: str, hashed_password: str) -> bool:
+    return auth.verify_password(plain_password, hashed_password)
+
+async def probe(client, latencies, done: asyncio.Event):
+    # Latency counts from when each probe was due, so time spent waiting for
+    # a blocked event loop to send it is included
+    due = time.perf_counter()
+    while not done.is_set():
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        response = await client.get("/health")
+        latencies.append(time.perf_counter() - due)
+        assert response.status_code == 200
+        due += PROBE_INTERVAL_SECONDS
+
+async def burst(client):
+    done = asyncio.Event()
+    latencies = []
+    prober = asyncio.create_task(probe(client, latencies, done))
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/auth/login", json={"username": "bench", "password": PASSWORD})
+        for _ in range(LOGINS)
+    ))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed, latencies
+
+def percentile(values, q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+async def run():
+    engine.echo = False
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        session.add(UserTable(
+            username="bench",
+            email="bench@example.com",
+            password_hash=auth.get_password_hash(PASSWORD),
+            role=UserRole.EDITOR,
+            is_active=True
+        ))
+        await session.commit()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        pooled = auth.check_password
+        for label, check in (("before", check_inline), ("after", pooled)):
+            auth.check_password = check
+            elapsed, latencies = await burst(client)
+            print(
+                f"{label:>6}: /health p50 {percentile(latencies, 50) * 1000:7.1f} ms"
+                f"  p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+                f"  max {max(latencies) * 1000:7.1f} ms"
+                f"  ({len(latencies)} probes, {LOGINS} logins in {elapsed:.2f}s)"
+            )
+        auth.check_password = pooled
+    print(password_hasher.stats())
+    password_hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(run())
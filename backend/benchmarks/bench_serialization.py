@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-item cost of serializing a 100-article page
+
+"before" reproduces the old route path: build UserProfile -> UserResponse ->
+Category -> ArticleResponse by hand, let FastAPI validate the list against
+response_model again and encode it with the stdlib json module.
+"after" is the shared dict serializer plus orjson via ArticleJSONResponse.
+
+Run from the backend directory:  python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+
+from models import (
+    ArticleResponse, ArticleStatus, Category, UserProfile, UserResponse, UserRole
+)
+from serializers import ArticleJSONResponse, article_to_dict
+import utils
+
+PAGE_SIZE = 100
+ROUNDS = 50
+
+def make_rows(count: int):
+    now = datetime(2025, 1, 1)
+    author = SimpleNamespace(
+        id="author-1", username="editor", email="editor@example.com", role=UserRole.EDITOR,
+        name="Editor", bio="Science desk", avatar="/api/media/" + "a" * 64 + ".jpg",
+        created_at=now, last_login=now, last_seen=now, is_active=True
+    )
+    category = SimpleNamespace(
+        id="category-1", name="Technology", slug="technology",
+        description="Latest technology news", created_at=now
+    )
+    rows = []
+    for i in range(count):
+        article = SimpleNamespace(
+            id=f"article-{i}", title=f"Article {i}", subtitle="Subtitle",
+            content="<p>" + "Lorem ipsum dolor sit amet. " * 80 + "</p>",
+            tags=json.dumps(["Science", "AI", "Research"]),
+            featured_image="/api/media/" + "b" * 64 + ".jpg",
+            status=ArticleStatus.PUBLISHED, published_at=now,
+            created_at=now - timedelta(minutes=i), updated_at=now, views=i * 10,
+            slug=f"article-{i}", seo_title=None, seo_description=None
+        )
+        rows.append((article, author, category))
+    return rows
+
+def before(rows, adapter):
+    articles = []
+    for article, author, category in rows:
+        author_response = UserResponse(
+            id=author.id, username=author.username, email=author.email, role=author.role,
+            profile=UserProfile(name=author.name or "", bio=author.bio, avatar=author.avatar),
+            created_at=author.created_at, last_login=author.last_login, last_seen=author.last_seen,
+            is_active=author.is_active
+        )
+        category_response = Category(
+            id=category.id, name=category.name, slug=category.slug,
+            description=category.description, created_at=category.created_at
+        )
+        articles.append(ArticleResponse(
+            id=article.id, title=article.title, subtitle=article.subtitle,
+            content=article.content, author=author_response, category=category_response,
+            tags=utils.json_to_tags(article.tags), featured_image=article.featured_image,
+            status=article.status, published_at=article.published_at,
+            created_at=article.created_at, updated_at=article.updated_at,
+            views=article.views, slug=article.slug, seo_title=article.seo_title,
+            seo_description=article.seo_description
+        ))
+    # What FastAPI does with the returned models: validate, dump, json-encode
+    validated = adapter.validate_python(articles, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def after(rows):
+    return ArticleJSONResponse([article_to_dict(*row) for row in rows]).body
+
+def main():
+    rows = make_rows(PAGE_SIZE)
+    adapter = TypeAdapter(List[ArticleResponse])
+
+    assert json.loads(before(rows, adapter)) == json.loads(after(rows)), "payloads differ"
+
+    results = {}
+    for label, fn in (("before", lambda: before(rows, adapter)), ("after", lambda: after(rows))):
+        best = min(timeit.repeat(fn, number=ROUNDS, repeat=5)) / ROUNDS
+        results[label] = best
+        print(f"{label:>6}: {best * 1e3:8.3f} ms/page  {best / PAGE_SIZE * 1e6:8.2f} µs/item")
+    print(f"speedup: {results['before'] / results['after']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Bloom filter for set membership with no false negatives
+
+A filter sized for ``capacity`` items answers "maybe present" for every
+item added and, while it holds at most ``capacity`` items, for about
+``error_rate`` of the items that were not. It takes about
+1.44 * log2(1 / error_rate) bits per item (18 KB per 10,000 items at 0.1%)
+whatever the items are. Items cannot be removed; rebuild the filter instead.
+"""
+import hashlib
+import math
+
+class BloomFilter:
+    """Fixed-size probabilistic set of strings"""
+
+    __slots__ = ("size", "hashes", "bits", "count")
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        # Optimal bit count and hash count for the capacity and error rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Kirsch-Mitzenmacher: k positions from two independent 64-bit hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        """Items added (duplicates included)"""
+        return self.count
@@ -0,0 +1,111 @@
+"""
+Batched client analytics ingestion
+
+``POST /api/analytics/collect`` validates a whole beacon batch with one
+TypeAdapter pass and hands it to an in-process queue. A background writer
+drains the queue into the view counter, whose periodic flush writes the
+rollups and feeds the trending ranking, so a request costs one parse and
+one ``put_nowait``.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+from pydantic import Field, TypeAdapter
+
+from models import AnalyticsEvent
+from view_buffer import ViewCounter, view_counter
+
+logger = logging.getLogger(__name__)
+
+# navigator.sendBeacon payloads are capped at 64 KiB by browsers
+MAX_BEACON_BYTES = 64 * 1024
+MAX_EVENTS_PER_BATCH = 100
+# Batches waiting for the writer before new ones are rejected
+MAX_QUEUED_BATCHES = 10000
+
+EVENT_BATCH = TypeAdapter(
+    Annotated[List[AnalyticsEvent], Field(min_length=1, max_length=MAX_EVENTS_PER_BATCH)]
+)
+
+class EventCollector:
+    """Queue of validated event batches feeding a ViewCounter"""
+
+    def __init__(self, counter: ViewCounter, maxsize: int = MAX_QUEUED_BATCHES):
+        self.counter = counter
+        self.maxsize = maxsize
+        self.accepted = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(
+        self,
+        events: list,
+        fallback_visitor: str,
+        received_at: datetime,
+        user_agent: str = None
+    ) -> bool:
+        """Queue a validated batch; False when the queue is full"""
+        if self._queue is None:
+            # Writer not running (e.g. outside the app lifespan): apply inline
+            self.apply(events, fallback_visitor, received_at, user_agent)
+        else:
+            try:
+                self._queue.put_nowait((events, fallback_visitor, received_at, user_agent))
+            except asyncio.QueueFull:
+                self.dropped += len(events)
+                return False
+        self.accepted += len(events)
+        return True
+
+    def apply(self, events: list, fallback_visitor: str, received_at: datetime, user_agent: str = None):
+        """Fold a batch into the view counter"""
+        for event in events:
+            if event.type == "view":
+                self.counter.record(
+                    event.article_id, when=received_at,
+                    visitor=event.visitor_id or fallback_visitor,
+                    referrer=event.referrer, user_agent=user_agent
+                )
+            elif event.type == "heartbeat":
+                self.counter.record_engagement(event.article_id, event.seconds, when=received_at)
+            else:
+                self.counter.record_scroll(event.article_id, event.depth, when=received_at)
+
+    async def _run(self):
+        while True:
+            batch = await self._queue.get()
+            try:
+                self.apply(*batch)
+            except Exception:
+                logger.exception("Could not apply analytics batch")
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(self.maxsize)
+            self._task = asyncio.create_task(self._run(), name="analytics-collector")
+
+    async def stop(self):
+        """Stop the writer and apply batches still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self.apply(*self._queue.get_nowait())
+        self._task = None
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+event_collector = EventCollector(view_counter)
@@ -0,0 +1,297 @@
+"""
+Materialized dashboard overview
+
+The admin dashboard is served from an in-memory snapshot. It is built with
+one grouped aggregate over articles.status (counts and total views) plus
+reads of the small rollup tables in every analytics shard, then kept
+current incrementally: article routes report status changes, and the view
+counter reports each committed flush. A dashboard load is a memory read.
+
+The snapshot is rebuilt when the 30-day window rolls over to a new day,
+when a flush touches an article it does not know, and every
+SNAPSHOT_REBUILD_SECONDS. The periodic rebuild bounds drift from writes
+made by other worker processes.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hyperloglog import HyperLogLog
+from models import AnalyticsTable, ArticleStatus, ArticleTable
+from view_buffer import view_counter
+import rollups
+import shards
+import traffic
+import utils
+
+# Days of history in dashboard charts and top-article rankings
+DASHBOARD_DAYS = 30
+TOP_ARTICLES_LIMIT = 5
+SNAPSHOT_REBUILD_SECONDS = 300.0
+# Article ids per titles query when rebuilding
+ARTICLE_LOOKUP_CHUNK = 500
+
+class ArticleStats:
+    """Per-article figures the snapshot needs for top-article rankings"""
+
+    __slots__ = ("title", "published_at", "period_views")
+
+    def __init__(self, title: str, published_at: Optional[datetime], period_views: int = 0):
+        self.title = title
+        self.published_at = published_at
+        self.period_views = period_views
+
+class DashboardSnapshot:
+    """Incrementally maintained dashboard payload"""
+
+    def __init__(self):
+        self._built = False
+        self._built_at = 0.0
+        self._stale = True
+        self._payload: Optional[dict] = None
+        self._lock = asyncio.Lock()
+        self.window_start = self.window_end = datetime.min
+        self.status_counts: Dict[ArticleStatus, int] = {}
+        self.total_views = 0
+        self.period_views = 0
+        self.engaged_seconds = 0
+        self.daily: Dict[datetime, list] = {}
+        self.day_sketches: Dict[datetime, HyperLogLog] = {}
+        self.articles: Dict[str, ArticleStats] = {}
+        self.sources: Dict[str, int] = {}
+
+    def invalidate(self):
+        """Force a full rebuild on the next read"""
+        self._stale = True
+
+    def _rebuilding(self) -> bool:
+        # A change reported while a rebuild's queries run may be missing from
+        # what they read, and the rebuild replaces the figures it would have
+        # been applied to; rebuild again on the next read instead
+        if self._lock.locked():
+            self._stale = True
+            return True
+        return False
+
+    def _needs_rebuild(self) -> bool:
+        return (
+            self._stale
+            or datetime.utcnow() >= self.window_end
+            or time.monotonic() - self._built_at >= SNAPSHOT_REBUILD_SECONDS
+        )
+
+    async def get(self, db: AsyncSession) -> dict:
+        """Current dashboard payload, rebuilding first if needed"""
+        if self._needs_rebuild():
+            async with self._lock:
+                if self._needs_rebuild():
+                    await self._rebuild(db)
+        if self._payload is None:
+            self._payload = self._render()
+        return self._payload
+
+    async def _rebuild(self, db: AsyncSession):
+        # A change reported while the queries run marks the snapshot stale again (see _rebuilding)
+        self._stale = False
+        start, end = rollups.day_range(DASHBOARD_DAYS)
+
+        status_result = await db.execute(
+            select(ArticleTable.status, func.count(), func.coalesce(func.sum(ArticleTable.views), 0))
+            .group_by(ArticleTable.status)
+        )
+        status_counts = {}
+        total_views = 0
+        for status, count, views in status_result.all():
+            status_counts[status] = count
+            total_views += views
+
+        daily = {}
+        day_sketches = {}
+        for day, views, _, sketch in await shards.read(rollups.views_query(start, end)):
+            daily.setdefault(day, [0, 0])[0] += views
+            if sketch:
+                day_sketch = HyperLogLog.from_bytes(sketch)
+                if day in day_sketches:
+                    day_sketches[day].merge(day_sketch)
+                else:
+                    day_sketches[day] = day_sketch
+        for day, sketch in day_sketches.items():
+            daily[day][1] = sketch.count()
+
+        period_rows = await shards.read(
+            select(
+                AnalyticsTable.article_id, func.sum(AnalyticsTable.views),
+                func.coalesce(func.sum(AnalyticsTable.session_duration), 0)
+            )
+            .where(AnalyticsTable.date >= start, AnalyticsTable.date < end)
+            .group_by(AnalyticsTable.article_id)
+        )
+        period_totals = {article_id: (views, engaged) for article_id, views, engaged in period_rows}
+        articles = {}
+        engaged_seconds = 0
+        period_ids = list(period_totals)
+        for offset in range(0, len(period_ids), ARTICLE_LOOKUP_CHUNK):
+            articles_result = await db.execute(
+                select(ArticleTable.id, ArticleTable.title, ArticleTable.published_at)
+                .where(ArticleTable.id.in_(period_ids[offset:offset + ARTICLE_LOOKUP_CHUNK]))
+            )
+            # Rollups of deleted articles are left out, as the join with articles did
+            for article_id, title, published_at in articles_result.all():
+                views, engaged = period_totals[article_id]
+                articles[article_id] = ArticleStats(title, published_at, views)
+                engaged_seconds += engaged
+
+        sources: Dict[str, int] = {}
+        for domain, views in traffic.merge_views(await shards.read(traffic.referrers_query(start, end))):
+            kind = traffic.source_kind(domain)
+            sources[kind] = sources.get(kind, 0) + views
+
+        self.window_start, self.window_end = start, end
+        self.status_counts = status_counts
+        self.total_views = total_views
+        self.daily = daily
+        self.day_sketches = day_sketches
+        self.articles = articles
+        self.period_views = sum(stats.period_views for stats in articles.values())
+        self.engaged_seconds = engaged_seconds
+        self.sources = sources
+        self._built = True
+        self._built_at = time.monotonic()
+        self._payload = None
+
+    def article_saved(self, article, previous_status: Optional[ArticleStatus] = None, created: bool = False):
+        """Apply an article create or update (status, title) to the snapshot"""
+        if self._rebuilding() or not self._built:
+            return
+        if created:
+            self.status_counts[article.status] = self.status_counts.get(article.status, 0) + 1
+            self.total_views += article.views or 0
+        elif previous_status is not None and previous_status != article.status:
+            self.status_counts[previous_status] = self.status_counts.get(previous_status, 0) - 1
+            self.status_counts[article.status] = self.status_counts.get(article.status, 0) + 1
+        stats = self.articles.get(article.id)
+        if stats is None:
+            self.articles[article.id] = ArticleStats(article.title, article.published_at)
+        else:
+            stats.title = article.title
+            stats.published_at = article.published_at
+        self._payload = None
+
+    def article_deleted(self, article):
+        """Remove a deleted article from counts, totals and rankings"""
+        if self._rebuilding() or not self._built:
+            return
+        self.status_counts[article.status] = self.status_counts.get(article.status, 0) - 1
+        self.total_views -= article.views or 0
+        stats = self.articles.pop(article.id, None)
+        if stats is not None:
+            self.period_views -= stats.period_views
+        self._payload = None
+
+    def views_flushed(
+        self,
+        batch: Dict[tuple, rollups.RollupCounters],
+        site_sketches: Dict[datetime, HyperLogLog],
+        sources: Dict[traffic.TrafficKey, int]
+    ):
+        """ViewCounter listener: add a committed flush to the snapshot"""
+        if self._rebuilding() or not self._built:
+            return
+        for (article_id, hour), counters in batch.items():
+            stats = self.articles.get(article_id)
+            if stats is None:
+                # Unknown here: an id with no article, or one created by another worker
+                self._stale = True
+                continue
+            self.total_views += counters.views
+            if self.window_start <= hour < self.window_end:
+                stats.period_views += counters.views
+                self.period_views += counters.views
+                self.engaged_seconds += counters.engaged_seconds
+        for (_, hour), counters in batch.items():
+            if self.window_start <= hour < self.window_end:
+                self.daily.setdefault(rollups.day_start(hour), [0, 0])[0] += counters.views
+        for day, sketch in rollups.consolidate_sketches(site_sketches, rollups.DAILY).items():
+            if self.window_start <= day < self.window_end:
+                if day in self.day_sketches:
+                    self.day_sketches[day].merge(sketch)
+                else:
+                    self.day_sketches[day] = sketch
+                self.daily.setdefault(day, [0, 0])[1] = self.day_sketches[day].count()
+        for (article_id, day, domain, _), views in sources.items():
+            if article_id in self.articles and self.window_start <= day < self.window_end:
+                kind = traffic.source_kind(domain)
+                self.sources[kind] = self.sources.get(kind, 0) + views
+        self._payload = None
+
+    def _unique_since(self, start: datetime) -> int:
+        union = None
+        for day, sketch in self.day_sketches.items():
+            if day >= start:
+                if union is None:
+                    union = sketch.copy()
+                else:
+                    union.merge(sketch)
+        return union.count() if union is not None else 0
+
+    def _render(self) -> dict:
+        daily_views = []
+        day = self.window_start
+        while day < self.window_end:
+            views, unique_views = self.daily.get(day, (0, 0))
+            daily_views.append({"date": day.date().isoformat(), "views": views, "unique_views": unique_views})
+            day += timedelta(days=1)
+        last_week = daily_views[-7:]
+
+        top = heapq.nlargest(
+            TOP_ARTICLES_LIMIT,
+            ((article_id, stats) for article_id, stats in self.articles.items() if stats.period_views > 0),
+            key=lambda item: item[1].period_views
+        )
+        top_articles = [
+            {
+                "id": article_id,
+                "title": stats.title,
+                "views": stats.period_views,
+                "published_at": stats.published_at.isoformat() if stats.published_at else None
+            }
+            for article_id, stats in top
+        ]
+
+        published_articles = self.status_counts.get(ArticleStatus.PUBLISHED, 0)
+        unique_visitors = self._unique_since(self.window_start)
+        return {
+            "total_views": self.total_views,
+            "week_views": sum(point["views"] for point in last_week),
+            "month_views": sum(point["views"] for point in daily_views),
+            "published_articles": published_articles,
+            "week_unique_visitors": self._unique_since(self.window_end - timedelta(days=7)),
+            "month_unique_visitors": unique_visitors,
+            "daily_views": daily_views,
+            "overview": {
+                "total_articles": sum(self.status_counts.values()),
+                "published_articles": published_articles,
+                "draft_articles": self.status_counts.get(ArticleStatus.DRAFT, 0),
+                "total_views": self.total_views,
+                "unique_visitors": unique_visitors,
+                "page_views": self.total_views,
+                "bounce_rate": 68.5,  # Mock
+                "avg_session": utils.format_duration(
+                    self.engaged_seconds / self.period_views if self.period_views else 0
+                )
+            },
+            "top_articles": top_articles,
+            "traffic_sources": traffic.source_breakdown(self.sources),
+            "weekly_views": [
+                {"day": datetime.fromisoformat(point["date"]).strftime("%a"), "views": point["views"]}
+                for point in last_week
+            ]
+        }
+
+dashboard_snapshot = DashboardSnapshot()
+view_counter.add_listener(dashboard_snapshot.views_flushed)
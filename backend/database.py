@@ -2,11 +2,17 @@
 SQLite database configuration and connection
 """
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from models import Base, CategoryTable
+from models import Base, CategoryTable, TagTable, ArticleTagTable
+from search import create_search_index
+from migrations import run_migrations
+import hyperloglog
+import shards
 import json
+import utils
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./science_digest_news.db")
@@ -18,6 +24,11 @@ engine = create_async_engine(
     future=True
 )
 
+@event.listens_for(engine.sync_engine, "connect")
+def register_sql_functions(dbapi_connection, connection_record):
+    """Make the HyperLogLog SQL functions available on every connection"""
+    hyperloglog.register_sqlite_functions(dbapi_connection)
+
 # Create async session factory
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
@@ -37,7 +48,10 @@ class Database:
         """Create all database tables"""
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
-            print("✅ Database tables created successfully")
+            await conn.run_sync(run_migrations)
+            await conn.run_sync(create_search_index)
+        await shards.init_shards()
+        print("✅ Database tables created successfully")
 
 # Dependency to get database session
 async def get_db() -> AsyncSession:
@@ -70,7 +84,6 @@ async def init_db():
             
             for cat_data in default_categories:
                 # Check if category exists
-                from sqlalchemy import select
                 result = await session.execute(
                     select(CategoryTable).where(CategoryTable.slug == cat_data["slug"])
                 )
@@ -102,4 +115,21 @@ def json_to_tags(tags_json):
     try:
         return json.loads(tags_json)
     except:
-        return []
\ No newline at end of file
+        return []
+
+async def set_article_tags(session: AsyncSession, article_id: str, tags_list):
+    """Replace an article's rows in article_tags (caller commits)"""
+    names = utils.normalize_tags(tags_list)
+    await session.execute(delete(ArticleTagTable).where(ArticleTagTable.article_id == article_id))
+    if not names:
+        return
+    
+    await session.execute(
+        sqlite_insert(TagTable).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": name} for name in names]
+    )
+    result = await session.execute(select(TagTable.id).where(TagTable.name.in_(names)))
+    await session.execute(
+        sqlite_insert(ArticleTagTable).on_conflict_do_nothing(),
+        [{"article_id": article_id, "tag_id": tag_id} for tag_id in result.scalars()]
+    )
@@ -0,0 +1,157 @@
+"""
+Streaming analytics exports
+
+Rollup rows are read through a server-side cursor (``AsyncConnection.stream``
+with ``yield_per``) and encoded chunk by chunk, so an export holds one
+chunk in memory however many rows it covers. CSV chunks are written to a
+reused text buffer; Parquet chunks become one row group each, written by
+pyarrow's ParquetWriter into a sink that is drained after every chunk.
+
+Site-wide exports read the analytics shards (see shards) one after
+another, each in (article_id, date) order. Titles and slugs come from the
+main database, one lookup per chunk.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+from starlette.concurrency import run_in_threadpool
+
+from database import engine
+from models import ArticleTable
+import rollups
+import shards
+
+# Rows fetched per round trip; also the Parquet row group size
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_SCHEMA = pa.schema([
+    ("date", pa.timestamp("us")),
+    ("article_id", pa.string()),
+    ("title", pa.string()),
+    ("slug", pa.string()),
+    ("views", pa.int64()),
+    ("unique_views", pa.int64()),
+    ("engaged_seconds", pa.int64()),
+    ("scroll_depth_sum", pa.int64()),
+    ("scroll_samples", pa.int64()),
+])
+EXPORT_COLUMNS = EXPORT_SCHEMA.names
+
+def rollup_export_query(
+    start: datetime,
+    end: datetime,
+    resolution: rollups.Resolution = rollups.DAILY,
+    article_id: str = None
+):
+    """Per-article rollup rows in [start, end): (date, article_id, views, unique_views, engaged_seconds, ...)"""
+    table = resolution.article_table
+    date = table.date
+    if article_id is None:
+        # Unary + keeps SQLite from answering the range with ix_analytics_date
+        # and sorting every row before the first is returned; the (article_id,
+        # date) key is walked instead, so rows stream in order
+        date = UnaryExpression(table.date.expression, operator=custom_op("+"), type_=table.date.type)
+    query = (
+        select(
+            table.date,
+            table.article_id,
+            table.views,
+            table.unique_views,
+            func.coalesce(table.session_duration, 0),
+            func.coalesce(table.scroll_depth_sum, 0),
+            func.coalesce(table.scroll_samples, 0),
+        )
+        .where(date >= start, date < end)
+        .order_by(table.article_id, table.date)
+    )
+    if article_id is not None:
+        query = query.where(table.article_id == article_id)
+    return query
+
+async def _with_titles(rows) -> List[tuple]:
+    # Rows of deleted articles are left out, as a join with articles would
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(ArticleTable.id, ArticleTable.title, ArticleTable.slug)
+            .where(ArticleTable.id.in_({row[1] for row in rows}))
+        )
+        titles = {article_id: (title, slug) for article_id, title, slug in result.all()}
+    return [
+        (date, article_id, *titles[article_id], *counts)
+        for date, article_id, *counts in rows
+        if article_id in titles
+    ]
+
+async def _chunks(query, article_id: str = None) -> AsyncIterator[List[tuple]]:
+    for shard_engine in shards.engines_for(article_id):
+        async with shard_engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+            async for rows in result.partitions():
+                yield await _with_titles(rows)
+
+async def iter_csv(query, article_id: str = None) -> AsyncIterator[bytes]:
+    """CSV with a header row, one encoded chunk per fetched partition"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in _chunks(query, article_id):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _DrainedSink(io.RawIOBase):
+    """Write-only file that keeps bytes until drained"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+def _record_batch(rows: List[tuple]) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, EXPORT_SCHEMA)],
+        schema=EXPORT_SCHEMA
+    )
+
+async def iter_parquet(query, article_id: str = None) -> AsyncIterator[bytes]:
+    """Parquet file streamed as it is written, one row group per chunk"""
+    sink = _DrainedSink()
+    writer = pq.ParquetWriter(sink, EXPORT_SCHEMA, compression="snappy")
+    try:
+        async for rows in _chunks(query, article_id):
+            if not rows:
+                continue
+            # Encoding and compression are CPU-bound; keep them off the event loop
+            await run_in_threadpool(writer.write_batch, _record_batch(rows))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
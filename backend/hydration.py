@@ -0,0 +1,87 @@
+"""
+In-process hydration cache for categories and authors
+
+There are only a handful of categories and a few dozen authors, and they
+change rarely, so article listings select article columns only and fill in
+author/category objects from these in-memory projections instead of joining
+users and categories on every request.
+
+The category and user write routes call ``invalidate()``; a short TTL bounds
+staleness for writes made by other worker processes.
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import CategoryTable, UserTable
+import serializers
+
+# Upper bound on staleness when another worker process made the write
+CACHE_TTL_SECONDS = 60.0
+# Minimum age before an unknown id forces a reload (guards orphaned rows)
+MISS_RELOAD_SECONDS = 5.0
+
+# Author projection: everything UserResponse needs, never the password hash
+AUTHOR_COLUMNS = (
+    UserTable.id, UserTable.username, UserTable.email, UserTable.role,
+    UserTable.name, UserTable.bio, UserTable.avatar,
+    UserTable.created_at, UserTable.last_login, UserTable.last_seen, UserTable.is_active,
+)
+
+class HydrationCache:
+    """Versioned in-memory projections of CategoryTable and UserTable"""
+
+    def __init__(self):
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._authors: Dict[str, dict] = {}
+        self._categories: Dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Drop the projections; the next lookup reloads them"""
+        self.version += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_version == self.version
+            and time.monotonic() - self._loaded_at < CACHE_TTL_SECONDS
+        )
+
+    async def _ensure_loaded(self, db: AsyncSession):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            version = self.version
+            categories = (await db.execute(select(CategoryTable))).scalars().all()
+            authors = (await db.execute(select(*AUTHOR_COLUMNS))).all()
+            self._categories = {c.id: serializers.category_to_dict(c) for c in categories}
+            self._authors = {a.id: serializers.user_to_dict(a) for a in authors}
+            # A concurrent invalidate() leaves version ahead, forcing a reload
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        author_ids: Iterable[str] = (),
+        category_ids: Iterable[str] = ()
+    ) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """Author and category dicts by id, reloading once if any id is unknown"""
+        await self._ensure_loaded(db)
+        missing = (
+            not set(author_ids) <= self._authors.keys()
+            or not set(category_ids) <= self._categories.keys()
+        )
+        if missing and time.monotonic() - self._loaded_at >= MISS_RELOAD_SECONDS:
+            self.invalidate()
+            await self._ensure_loaded(db)
+        return self._authors, self._categories
+
+hydration_cache = HydrationCache()
@@ -0,0 +1,69 @@
+"""
+Write-behind tracker for when users were last active
+
+Authenticated requests record the user's id and time in memory; a
+background task writes the latest time per user to users.last_seen in one
+``UPDATE`` batch every LAST_SEEN_INTERVAL_SECONDS. A user is written at
+most once per interval however many requests they make, and reads never
+become write transactions. ``last_login`` is only set by the login route.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import bindparam, update
+
+from background import PeriodicTask
+from database import engine
+from models import UserTable
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_INTERVAL_SECONDS = float(os.getenv("LAST_SEEN_INTERVAL_SECONDS", "300"))
+
+SET_LAST_SEEN = (
+    update(UserTable)
+    .where(UserTable.id == bindparam("user_id"))
+    .values(last_seen=bindparam("seen"))
+)
+
+class LastSeenTracker:
+    """Latest activity per user, flushed in batches"""
+
+    def __init__(self, interval: float = LAST_SEEN_INTERVAL_SECONDS):
+        self._pending: Dict[str, datetime] = {}
+        self._task = PeriodicTask("last-seen-flush", interval, self.flush)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, user_id: str, when: datetime = None):
+        """Note activity by a user (O(1), no I/O)"""
+        self._pending[user_id] = when or datetime.utcnow()
+
+    async def flush(self):
+        """Write each pending user's latest activity in one transaction"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(SET_LAST_SEEN, [
+                    {"user_id": user_id, "seen": seen} for user_id, seen in batch.items()
+                ])
+        except BaseException:
+            # Activity recorded since the batch was taken is newer; keep it
+            for user_id, seen in batch.items():
+                self._pending.setdefault(user_id, seen)
+            raise
+        logger.debug("Recorded activity for %d users", len(batch))
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still pending"""
+        await self._task.stop()
+
+last_seen_tracker = LastSeenTracker()
@@ -0,0 +1,166 @@
+"""
+Response cache for the public article listing
+
+``GET /api/articles/`` is served from serialized bytes keyed on its
+normalized query parameters. Article writes evict only the entries they can
+affect:
+
+* pages that contain the article (its fields changed or it is gone)
+* offset (``skip``) pages when the article joined or left a result set,
+  since every later position shifts
+* pages whose filters the article now matches, so it can appear there
+* search pages when searchable text changed
+
+Keyset (``cursor``) pages that neither contain nor could now contain the
+article stay valid. A page whose query was running when an invalidation
+happened is not stored, since it may predate the write (see
+``generation``). View counts in cached bodies may lag by up to the TTL,
+which also bounds staleness for writes made by other worker processes.
+"""
+import os
+from typing import FrozenSet, Iterable, NamedTuple, Optional
+
+from cache import TTLCache
+from models import ArticleStatus
+import utils
+
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", "512"))
+LISTING_CACHE_TTL_SECONDS = float(os.getenv("LISTING_CACHE_TTL_SECONDS", "30"))
+# Large full-view pages are cheaper to rebuild than to pin in memory
+MAX_CACHED_BODY_BYTES = 1024 * 1024
+
+class ListingParams(NamedTuple):
+    """Normalized query parameters of a listing request (the cache key)"""
+    view: str
+    status: Optional[ArticleStatus]
+    category_id: Optional[str]
+    author_id: Optional[str]
+    tag: Optional[str]
+    search: Optional[str]
+    skip: int
+    limit: int
+    cursor: Optional[str]
+    hydration_version: int
+
+class CachedListing(NamedTuple):
+    """Serialized listing page and the article ids it contains"""
+    body: bytes
+    headers: dict
+    article_ids: FrozenSet[str]
+
+class ArticleState(NamedTuple):
+    """Filterable fields of an article after a write"""
+    status: ArticleStatus
+    category_id: str
+    author_id: str
+    tags: FrozenSet[str]
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    value = value.strip() if value else None
+    return value or None
+
+def listing_params(
+    view: str,
+    status: Optional[str],
+    category_id: Optional[str],
+    author_id: Optional[str],
+    tag: Optional[str],
+    search: Optional[str],
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    hydration_version: int
+) -> ListingParams:
+    """Cache key for a listing request; equivalent requests map to one key"""
+    try:
+        status_enum = ArticleStatus(status) if _clean(status) else None
+    except ValueError:
+        # Invalid statuses are ignored by the query too
+        status_enum = None
+    search = " ".join(search.split()).lower() if search else None
+    cursor = _clean(cursor)
+    return ListingParams(
+        view=view,
+        status=status_enum,
+        category_id=_clean(category_id),
+        author_id=_clean(author_id),
+        tag=_clean(tag),
+        search=search or None,
+        # skip is ignored when paging by cursor
+        skip=0 if cursor else skip,
+        limit=limit,
+        cursor=cursor,
+        hydration_version=hydration_version,
+    )
+
+def article_state(article) -> ArticleState:
+    """ArticleState from an ArticleTable row"""
+    return ArticleState(
+        status=article.status,
+        category_id=article.category_id,
+        author_id=article.author_id,
+        tags=frozenset(utils.json_to_tags(article.tags)),
+    )
+
+def may_match(params: ListingParams, state: ArticleState) -> bool:
+    """Whether an article in ``state`` can satisfy the listing filters"""
+    if params.search:
+        # Text matching is left to SQLite; assume it may match
+        return True
+    if params.status is not None and params.status != state.status:
+        return False
+    if params.category_id is not None and params.category_id != state.category_id:
+        return False
+    if params.author_id is not None and params.author_id != state.author_id:
+        return False
+    if params.tag is not None and params.tag not in state.tags:
+        return False
+    return True
+
+class ListingCache(TTLCache):
+    """TTLCache of CachedListing pages with per-article invalidation"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        # Bumped by every invalidation; read before a listing query runs
+        self.generation = 0
+
+    def store(
+        self, params: ListingParams, body: bytes, headers: dict, article_ids: Iterable[str], generation: int
+    ):
+        """Cache a page built from a query started at ``generation``"""
+        if generation != self.generation or len(body) > MAX_CACHED_BODY_BYTES:
+            return
+        self.set(params, CachedListing(body, dict(headers), frozenset(article_ids)))
+
+    def clear(self):
+        self.generation += 1
+        super().clear()
+
+    def invalidate_article(
+        self,
+        article_id: str,
+        state: Optional[ArticleState] = None,
+        removed: bool = False,
+        text_changed: bool = False
+    ) -> int:
+        """Evict the pages a write to one article can affect
+
+        ``state`` is the article's filterable state when it may have joined a
+        result set (create, publish, status/category/tag edits); ``removed``
+        marks deletions; ``text_changed`` marks edits to searchable text.
+        """
+        self.generation += 1
+        membership_changed = state is not None or removed
+
+        def affected(params: ListingParams, entry: CachedListing) -> bool:
+            return (
+                article_id in entry.article_ids
+                or (membership_changed and params.skip > 0)
+                or (state is not None and may_match(params, state))
+                or (text_changed and params.search is not None)
+            )
+
+        return self.evict_where(affected)
+
+listing_cache = ListingCache(maxsize=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL_SECONDS)
@@ -16,10 +16,19 @@ from routes.categories import router as categories_router
 from routes.auth import router as auth_router
 from routes.analytics import router as analytics_router
 from routes.seo import router as seo_router_new
+from routes.media import router as media_router
 from seo_routes import router as seo_router
 
 # Import database
 from database import init_db
+from auth import revoked_sessions
+from collector import event_collector
+from last_seen import last_seen_tracker
+from passwords import password_hasher
+from rate_limit import login_rate_limiter
+from trending import trending_articles
+from view_buffer import rollup_compaction, view_counter
+import media
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -38,10 +47,27 @@ async def lifespan(app: FastAPI):
     # Startup
     await init_db()
     logger.info("SQLite database initialized")
+    view_counter.start()
+    event_collector.start()
+    rollup_compaction.start()
+    last_seen_tracker.start()
+    await revoked_sessions.load()
+    revoked_sessions.start()
+    await trending_articles.restore()
+    trending_articles.start()
     
     yield
     
     # Shutdown
+    await event_collector.stop()
+    await view_counter.stop()
+    await rollup_compaction.stop()
+    await last_seen_tracker.stop()
+    await revoked_sessions.stop()
+    await trending_articles.stop()
+    media.shutdown_pool()
+    password_hasher.shutdown()
+    login_rate_limiter.store.close()
     logger.info("Shutting down application")
 
 # Create FastAPI app
@@ -59,6 +85,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -69,6 +96,7 @@ app.include_router(auth_router)
 app.include_router(analytics_router)
 app.include_router(seo_router)
 app.include_router(seo_router_new)
+app.include_router(media_router)
 
 # Health check endpoint
 @app.get("/health")
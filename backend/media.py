@@ -0,0 +1,293 @@
+"""
+Content-addressed on-disk media store
+
+Image bytes live in files named by their SHA-256, so a stored file never
+changes and can be cached forever by browsers and CDNs. Database rows only
+keep the media URL.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", Path(__file__).parent / "media"))
+MEDIA_URL_PREFIX = "/api/media/"
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# SVG is deliberately absent: it can carry script and is served same-origin
+CONTENT_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/avif": "avif",
+}
+EXTENSION_TYPES = {ext: content_type for content_type, ext in CONTENT_TYPES.items()}
+
+MEDIA_NAME_RE = re.compile(r"^([0-9a-f]{64})\.(%s)$" % "|".join(EXTENSION_TYPES))
+
+# Responsive derivatives: maximum width per size, and output encodings
+DERIVATIVE_WIDTHS = {"thumb": 320, "card": 640, "hero": 1280}
+DERIVATIVE_FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+DERIVATIVE_QUALITY = 82
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+
+DATA_URI_RE = re.compile(r"^data:([\w/+.-]+);base64,", re.IGNORECASE)
+
+def media_path(name: str) -> Path:
+    """Location of a stored file, sharded by hash prefix"""
+    return MEDIA_ROOT / name[:2] / name[2:4] / name
+
+def media_url(name: str) -> str:
+    """Public URL of a stored file"""
+    return f"{MEDIA_URL_PREFIX}{name}"
+
+def is_media_name(name: str) -> bool:
+    """Whether ``name`` looks like a file produced by store_bytes"""
+    return MEDIA_NAME_RE.match(name) is not None
+
+def content_type_for(name: str) -> str:
+    """Content type of a stored file from its extension"""
+    return EXTENSION_TYPES[name.rsplit(".", 1)[1]]
+
+def derivative_path(name: str, size: str, fmt: str) -> Path:
+    """Location of a cached derivative, next to its original"""
+    return media_path(name).with_name(f"{name}.{size}.{fmt}")
+
+def media_name_from_url(url: Optional[str]) -> Optional[str]:
+    """Media name referenced by a media store URL, if any"""
+    if not url:
+        return None
+    _, found, name = url.rpartition(MEDIA_URL_PREFIX)
+    return name if found and is_media_name(name) else None
+
+def derivative_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """Map of "<size>.<fmt>" to derivative URL for a media store URL"""
+    name = media_name_from_url(url)
+    if name is None:
+        return None
+    base = url[:len(url) - len(name)]
+    return {
+        f"{size}.{fmt}": f"{base}{name}/{size}.{fmt}"
+        for size in DERIVATIVE_WIDTHS
+        for fmt in DERIVATIVE_FORMATS
+    }
+
+def sniff_content_type(data: bytes) -> Optional[str]:
+    """Image type of ``data`` from its magic bytes, if it is one we store"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp":
+        # ISO BMFF: major brand, minor version, then compatible brands
+        box_size = int.from_bytes(data[:4], "big")
+        brands = {data[8:12]} | {data[i:i + 4] for i in range(16, min(box_size, len(data), 64), 4)}
+        if brands & {b"avif", b"avis"}:
+            return "image/avif"
+    return None
+
+def store_bytes(data: bytes, content_type: str) -> str:
+    """Store ``data`` and return its media name (idempotent per content)
+
+    Raises ValueError unless ``data`` really is an image of ``content_type``.
+    """
+    extension = CONTENT_TYPES.get(content_type.lower())
+    if extension is None:
+        raise ValueError(f"Unsupported media type: {content_type}")
+    if sniff_content_type(data) != content_type.lower():
+        raise ValueError(f"Content is not {content_type}")
+
+    name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    path = media_path(name)
+    if path.exists():
+        return name
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return name
+
+def parse_data_uri(value: str) -> Optional[Tuple[str, bytes]]:
+    """Decode a ``data:<type>;base64,...`` URI into (content_type, bytes)"""
+    match = DATA_URI_RE.match(value or "")
+    if not match:
+        return None
+    try:
+        data = base64.b64decode(value[match.end():], validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return match.group(1).lower(), data
+
+def externalize_image(value: Optional[str]) -> Optional[str]:
+    """Move an inline base64 image into the store and return its URL
+
+    Anything that is not a supported data URI (URLs, empty values) is
+    returned unchanged.
+    """
+    parsed = parse_data_uri(value) if value else None
+    if parsed is None:
+        return value
+    content_type, data = parsed
+    if content_type not in CONTENT_TYPES or sniff_content_type(data) != content_type:
+        return value
+    return media_url(store_bytes(data, content_type))
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` Range header into an inclusive (start, end)
+
+    Returns None when the header should be ignored (multi-range or another
+    unit) and raises ValueError when the range is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def iter_file(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes ``start..end`` (inclusive) of ``path`` in fixed chunks"""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def render_derivative(source: str, target: str, width: int, fmt: str) -> str:
+    """Resize ``source`` to at most ``width`` pixels wide and encode it as ``fmt``
+
+    Runs in a worker process; arguments and result are plain strings so they
+    pickle cheaply.
+    """
+    pil_format, _ = DERIVATIVE_FORMATS[fmt]
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if pil_format == "JPEG" and image.mode != "RGB":
+            # JPEG has no alpha: flatten onto white
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".derivative-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                image.save(tmp, pil_format, quality=DERIVATIVE_QUALITY, optimize=True)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return target
+
+_pool: Optional[ProcessPoolExecutor] = None
+_in_flight: Dict[Path, asyncio.Future] = {}
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool for image work, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MEDIA_WORKERS)
+    return _pool
+
+def shutdown_pool():
+    """Stop the image worker processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def discard_pool(pool: ProcessPoolExecutor):
+    """Replace ``pool`` on next use; a pool whose worker died stays broken"""
+    if pool is _pool:
+        shutdown_pool()
+
+def _render_done(target: Path, pool: ProcessPoolExecutor, future: asyncio.Future):
+    _in_flight.pop(target, None)
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        discard_pool(pool)
+
+async def ensure_derivative(name: str, size: str, fmt: str) -> Path:
+    """Return the derivative file, rendering it in the process pool if missing
+
+    Concurrent requests for the same derivative share one render. Raises
+    BrokenProcessPool if a worker died; the next call starts a fresh pool.
+    """
+    target = derivative_path(name, size, fmt)
+    if target.exists():
+        return target
+
+    future = _in_flight.get(target)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        try:
+            future = loop.run_in_executor(
+                pool, render_derivative,
+                str(media_path(name)), str(target), DERIVATIVE_WIDTHS[size], fmt
+            )
+        except BrokenProcessPool:
+            discard_pool(pool)
+            raise
+        _in_flight[target] = future
+        future.add_done_callback(lambda done: _render_done(target, pool, done))
+    await asyncio.shield(future)
+    return target
+
+async def generate_derivatives(name: str):
+    """Render every derivative of a freshly uploaded image"""
+    jobs = [
+        ensure_derivative(name, size, fmt)
+        for size in DERIVATIVE_WIDTHS
+        for fmt in DERIVATIVE_FORMATS
+    ]
+    for result in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning("Could not render derivatives of %s: %s", name, result)
+            break
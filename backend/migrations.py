@@ -0,0 +1,297 @@
+"""
+Run-once schema migrations for SQLite
+
+``Base.metadata.create_all`` only creates missing tables, so anything that
+changes an existing table (new indexes, backfills) is registered here and
+applied once at startup, in order.
+"""
+from contextlib import ExitStack
+from datetime import datetime
+
+from sqlalchemy import insert, literal, select
+
+from hyperloglog import HyperLogLog
+from models import (
+    ArticleTable, TagTable, ArticleTagTable, AnalyticsTable, AnalyticsMonthlyTable,
+    SiteDailyTable, SiteMonthlyTable, ReferrerDomainTable, UserAgentFamilyTable, UserTable,
+    RefreshTokenTable
+)
+import media
+import rollups
+import search
+import shards
+import utils
+
+# Rows converted per round trip when moving inline images to the media store
+MEDIA_MIGRATION_BATCH_SIZE = 50
+# Rows copied per round trip when moving analytics into the shards
+SHARD_MIGRATION_BATCH_SIZE = 1000
+
+# Built by 0001; indexes over columns added later are built by their own step
+ARTICLE_LISTING_INDEXES = {
+    "ix_articles_created_at_id",
+    "ix_articles_status_created_at_id",
+    "ix_articles_category_created_at_id",
+    "ix_articles_author_created_at_id",
+}
+
+MIGRATIONS = []
+
+def migration(name: str):
+    """Register a sync ``fn(connection)`` to run once under ``name``"""
+    def register(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return register
+
+def run_migrations(connection):
+    """Apply pending migrations (sync, for ``AsyncConnection.run_sync``)"""
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR PRIMARY KEY, applied_at DATETIME NOT NULL)"
+    )
+    applied = {
+        row[0] for row in connection.exec_driver_sql("SELECT name FROM schema_migrations")
+    }
+    for name, fn in MIGRATIONS:
+        if name in applied:
+            continue
+        fn(connection)
+        connection.exec_driver_sql(
+            "INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)",
+            (name, datetime.utcnow().isoformat(" "))
+        )
+        print(f"✅ Applied migration: {name}")
+
+@migration("0001_article_listing_indexes")
+def create_article_listing_indexes(connection):
+    """Composite indexes for the article listing query shapes"""
+    for index in ArticleTable.__table__.indexes:
+        if index.name in ARTICLE_LISTING_INDEXES:
+            index.create(connection, checkfirst=True)
+
+@migration("0002_backfill_article_tags")
+def backfill_article_tags(connection):
+    """Populate tags/article_tags from the legacy JSON tags column"""
+    rows = connection.execute(
+        ArticleTable.__table__.select()
+        .with_only_columns(ArticleTable.id, ArticleTable.tags)
+        .where(ArticleTable.tags.isnot(None))
+    ).fetchall()
+    article_tags = [
+        (article_id, utils.normalize_tags(utils.json_to_tags(tags_json)))
+        for article_id, tags_json in rows
+    ]
+    names = {name for _, tags in article_tags for name in tags}
+    if not names:
+        return
+    
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names]
+    )
+    tag_ids = dict(connection.execute(
+        TagTable.__table__.select().with_only_columns(TagTable.name, TagTable.id)
+    ).fetchall())
+    connection.execute(
+        ArticleTagTable.__table__.insert().prefix_with("OR IGNORE"),
+        [
+            {"article_id": article_id, "tag_id": tag_ids[name]}
+            for article_id, tags in article_tags
+            for name in tags
+        ]
+    )
+
+def add_missing_columns(connection, table):
+    """ALTER TABLE ADD COLUMN for model columns missing from an existing table
+
+    Only suitable for nullable columns without server defaults, which is
+    all SQLite can add in place.
+    """
+    existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            )
+
+def externalize_column(connection, table: str, column: str):
+    """Move base64 data URIs in ``table.column`` into the media store, in batches"""
+    last_rowid = 0
+    moved = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            f"SELECT rowid, {column} FROM {table} "
+            f"WHERE rowid > ? AND {column} LIKE 'data:%' ORDER BY rowid LIMIT ?",
+            (last_rowid, MEDIA_MIGRATION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rowid, value in rows:
+            url = media.externalize_image(value)
+            if url != value:
+                updates.append((url, rowid))
+        if updates:
+            connection.exec_driver_sql(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+            moved += len(updates)
+        last_rowid = rows[-1][0]
+    if moved:
+        print(f"✅ Moved {moved} inline images from {table}.{column} to the media store")
+
+@migration("0003_externalize_inline_images")
+def externalize_inline_images(connection):
+    """Replace base64 featured images and avatars with media store URLs"""
+    externalize_column(connection, "articles", "featured_image")
+    externalize_column(connection, "users", "avatar")
+
+@migration("0004_analytics_rollup_indexes")
+def create_analytics_rollup_indexes(connection):
+    """Key analytics rows by (article_id, date) for daily rollup upserts
+
+    Nothing wrote to the analytics table before rollups existed, so there
+    are no duplicate keys to merge.
+    """
+    for index in AnalyticsTable.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+@migration("0005_visitor_sketches")
+def add_visitor_sketches(connection):
+    """Add HyperLogLog sketch storage and seed site_daily from article rollups"""
+    add_missing_columns(connection, AnalyticsTable.__table__)
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO site_daily (date, views, unique_views) "
+        "SELECT date, SUM(views), 0 FROM analytics GROUP BY date"
+    )
+
+@migration("0006_engagement_columns")
+def add_engagement_columns(connection):
+    """Add scroll depth aggregates to the article rollups"""
+    add_missing_columns(connection, AnalyticsTable.__table__)
+
+@migration("0007_monthly_rollups")
+def seed_monthly_rollups(connection):
+    """Seed the monthly rollup tiers from existing daily rows
+
+    Rollup compaction expires daily rows after the daily retention, so their
+    totals must exist one tier up first. The hourly tiers start empty.
+    """
+    articles = {}
+    for article_id, day, views, engaged, depth_sum, samples, sketch in connection.execute(
+        select(
+            AnalyticsTable.article_id, AnalyticsTable.date, AnalyticsTable.views,
+            AnalyticsTable.session_duration, AnalyticsTable.scroll_depth_sum,
+            AnalyticsTable.scroll_samples, AnalyticsTable.visitors_sketch
+        ).where(AnalyticsTable.date.isnot(None))
+    ):
+        counts = rollups.RollupCounters()
+        counts.views = views or 0
+        counts.engaged_seconds = engaged or 0
+        counts.scroll_depth_sum = depth_sum or 0
+        counts.scroll_samples = samples or 0
+        counts.sketch = HyperLogLog.from_bytes(sketch) if sketch else None
+        key = (article_id, rollups.month_start(day))
+        articles.setdefault(key, rollups.RollupCounters()).merge(counts)
+    if articles:
+        connection.execute(insert(AnalyticsMonthlyTable).prefix_with("OR IGNORE"), [
+            {
+                "article_id": article_id,
+                "date": month,
+                "views": counts.views,
+                "unique_views": counts.sketch.count() if counts.sketch else 0,
+                "visitors_sketch": counts.sketch.to_bytes() if counts.sketch else None,
+                "session_duration": counts.engaged_seconds,
+                "scroll_depth_sum": counts.scroll_depth_sum,
+                "scroll_samples": counts.scroll_samples,
+            }
+            for (article_id, month), counts in articles.items()
+        ])
+
+    site = {}
+    for day, views, sketch in connection.execute(
+        select(SiteDailyTable.date, SiteDailyTable.views, SiteDailyTable.visitors_sketch)
+    ):
+        month = rollups.month_start(day)
+        views_total, union = site.get(month, (0, None))
+        if sketch:
+            union = HyperLogLog.from_bytes(sketch) if union is None else union.merge(HyperLogLog.from_bytes(sketch))
+        site[month] = (views_total + (views or 0), union)
+    if site:
+        connection.execute(insert(SiteMonthlyTable).prefix_with("OR IGNORE"), [
+            {
+                "date": month,
+                "views": views,
+                "unique_views": union.count() if union else 0,
+                "visitors_sketch": union.to_bytes() if union else None,
+            }
+            for month, (views, union) in site.items()
+        ])
+
+@migration("0008_shard_analytics")
+def move_analytics_to_shards(connection):
+    """Move rollups and traffic from the main database into the analytics shards
+
+    Article rows go to their article's shard and site-wide rows to
+    shards.SITE_SHARD. Every shard gets a full copy of the dimension tables,
+    so moved traffic rows keep their ids. Copies are INSERT OR IGNORE: if
+    this fails after the shards commit, running it again is harmless.
+    """
+    tables = shards.SHARDED_TABLES
+    if not any(connection.execute(select(literal(1)).select_from(table).limit(1)).first() for table in tables):
+        return
+    dimensions = {ReferrerDomainTable.__table__, UserAgentFamilyTable.__table__}
+    with ExitStack() as stack:
+        targets = []
+        for shard in range(shards.ANALYTICS_SHARDS):
+            shard_engine = shards.sync_engine(shard)
+            stack.callback(shard_engine.dispose)
+            target = stack.enter_context(shard_engine.begin())
+            shards.create_schema(target)
+            targets.append(target)
+        for table in tables:
+            for rows in connection.execute(table.select()).partitions(SHARD_MIGRATION_BATCH_SIZE):
+                if table in dimensions:
+                    parts = {shard: rows for shard in range(shards.ANALYTICS_SHARDS)}
+                elif "article_id" in table.c:
+                    parts = {}
+                    for row in rows:
+                        parts.setdefault(shards.shard_of(row.article_id), []).append(row)
+                else:
+                    parts = {shards.SITE_SHARD: rows}
+                for shard, part in parts.items():
+                    targets[shard].execute(
+                        table.insert().prefix_with("OR IGNORE"), [dict(row._mapping) for row in part]
+                    )
+    for table in reversed(tables):
+        connection.execute(table.delete())
+
+@migration("0009_user_last_seen")
+def add_user_last_seen(connection):
+    """Add users.last_seen, written in batches by the last-seen tracker"""
+    add_missing_columns(connection, UserTable.__table__)
+
+@migration("0010_user_token_version")
+def add_user_token_version(connection):
+    """Add users.token_version, checked against the "ver" claim of access tokens"""
+    add_missing_columns(connection, UserTable.__table__)
+
+@migration("0011_refresh_token_previous_hash")
+def add_refresh_token_previous_hash(connection):
+    """Add refresh_tokens.previous_token_hash, for detecting replayed refresh tokens"""
+    add_missing_columns(connection, RefreshTokenTable.__table__)
+
+@migration("0012_drop_article_published_at_index")
+def drop_article_published_at_index(connection):
+    """Drop ix_articles_status_published_at; no SQLite query sorts by published_at"""
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_articles_status_published_at")
+
+@migration("0013_article_search_rowid")
+def add_article_search_rowid(connection):
+    """Key the full-text index on articles.search_rowid instead of the implicit rowid"""
+    add_missing_columns(connection, ArticleTable.__table__)
+    connection.exec_driver_sql("UPDATE articles SET search_rowid = rowid WHERE search_rowid IS NULL")
+    for index in ArticleTable.__table__.indexes:
+        if "search_rowid" in index.columns:
+            index.create(connection, checkfirst=True)
+    search.drop_search_index(connection)
+    search.create_search_index(connection)
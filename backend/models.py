@@ -2,8 +2,8 @@
 Database models for Science Digest News
 """
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum
+from typing import Annotated, Optional, List, Dict, Literal, Union
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Boolean, ForeignKey, Index, LargeBinary, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field, EmailStr
@@ -33,14 +33,33 @@ class UserTable(Base):
     role = Column(SQLEnum(UserRole), nullable=False)
     name = Column(String, nullable=True)
     bio = Column(Text, nullable=True)
-    avatar = Column(Text, nullable=True)  # base64 encoded
+    avatar = Column(Text, nullable=True)  # media URL (legacy rows: base64 data URI)
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
+    # Latest authenticated request, written in batches (see last_seen)
+    last_seen = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
+    # Access tokens carry this as "ver"; bumping it rejects tokens issued before
+    token_version = Column(Integer, nullable=True, default=0)
 
     # Relationship
     articles = relationship("ArticleTable", back_populates="author")
 
+class RefreshTokenTable(Base):
+    """A login session: the hash of its current refresh token, and when it was revoked"""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String, nullable=False)
+    # The token the last refresh replaced; presenting it again revokes the session
+    previous_token_hash = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+    # Read back at startup into the revocation filter (see revocation)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+
 class CategoryTable(Base):
     __tablename__ = "categories"
     
@@ -62,14 +81,16 @@ class ArticleTable(Base):
     content = Column(Text, nullable=False)
     author_id = Column(String, ForeignKey("users.id"), nullable=False)
     category_id = Column(String, ForeignKey("categories.id"), nullable=False)
-    tags = Column(Text, nullable=True)  # JSON string
-    featured_image = Column(Text, nullable=True)  # base64 encoded
+    tags = Column(Text, nullable=True)  # JSON string, denormalized copy of article_tags
+    featured_image = Column(Text, nullable=True)  # media URL (legacy rows: base64 data URI)
     status = Column(SQLEnum(ArticleStatus), default=ArticleStatus.DRAFT)
     published_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     views = Column(Integer, default=0)
     slug = Column(String, unique=True, index=True, nullable=False)
+    # Stable key of the full-text index, assigned by its insert trigger (see search)
+    search_rowid = Column(Integer, unique=True, index=True, nullable=True)
     seo_title = Column(String, nullable=True)
     seo_description = Column(Text, nullable=True)
     
@@ -77,7 +98,34 @@ class ArticleTable(Base):
     author = relationship("UserTable", back_populates="articles")
     category = relationship("CategoryTable", back_populates="articles")
 
+    # Listings filter on one of status/category/author and sort newest first
+    # with (created_at, id) as the keyset.
+    __table_args__ = (
+        Index("ix_articles_created_at_id", "created_at", "id"),
+        Index("ix_articles_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_articles_category_created_at_id", "category_id", "created_at", "id"),
+        Index("ix_articles_author_created_at_id", "author_id", "created_at", "id"),
+    )
+
+class TagTable(Base):
+    __tablename__ = "tags"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+
+class ArticleTagTable(Base):
+    __tablename__ = "article_tags"
+    
+    article_id = Column(String, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Tag -> articles lookups (tag filter and counts) go through this index
+    __table_args__ = (
+        Index("ix_article_tags_tag_id_article_id", "tag_id", "article_id"),
+    )
+
 class AnalyticsTable(Base):
+    """Daily rollup: one row per (article_id, date), date at UTC midnight"""
     __tablename__ = "analytics"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -85,9 +133,113 @@ class AnalyticsTable(Base):
     date = Column(DateTime, default=datetime.utcnow)
     views = Column(Integer, default=0)
     unique_views = Column(Integer, default=0)
+    session_duration = Column(Integer, nullable=True)  # engaged seconds, summed over visits
+    referrer = Column(String, nullable=True)  # unused; see AnalyticsTrafficTable
+    user_agent = Column(String, nullable=True)  # unused; see AnalyticsTrafficTable
+    visitors_sketch = Column(LargeBinary, nullable=True)  # HyperLogLog of the day's visitors
+    scroll_depth_sum = Column(Integer, nullable=True)  # percent, summed over scroll reports
+    scroll_samples = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ux_analytics_article_id_date", "article_id", "date", unique=True),
+        Index("ix_analytics_date", "date"),
+    )
+
+class SiteDailyTable(Base):
+    """Site-wide daily rollup, date at UTC midnight"""
+    __tablename__ = "site_daily"
+    
+    date = Column(DateTime, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_views = Column(Integer, nullable=False, default=0)
+    visitors_sketch = Column(LargeBinary, nullable=True)  # HyperLogLog of the day's visitors
+
+class AnalyticsHourlyTable(Base):
+    """Hourly rollup per article, date at the start of the UTC hour"""
+    __tablename__ = "analytics_hourly"
+
+    article_id = Column(String, ForeignKey("articles.id"), primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_views = Column(Integer, nullable=False, default=0)
+    session_duration = Column(Integer, nullable=True)
+    visitors_sketch = Column(LargeBinary, nullable=True)
+    scroll_depth_sum = Column(Integer, nullable=True)
+    scroll_samples = Column(Integer, nullable=True)
+
+class AnalyticsMonthlyTable(Base):
+    """Monthly rollup per article, date at UTC midnight on the 1st"""
+    __tablename__ = "analytics_monthly"
+
+    article_id = Column(String, ForeignKey("articles.id"), primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_views = Column(Integer, nullable=False, default=0)
     session_duration = Column(Integer, nullable=True)
-    referrer = Column(String, nullable=True)
-    user_agent = Column(String, nullable=True)
+    visitors_sketch = Column(LargeBinary, nullable=True)
+    scroll_depth_sum = Column(Integer, nullable=True)
+    scroll_samples = Column(Integer, nullable=True)
+
+class SiteHourlyTable(Base):
+    """Site-wide hourly rollup, date at the start of the UTC hour"""
+    __tablename__ = "site_hourly"
+
+    date = Column(DateTime, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_views = Column(Integer, nullable=False, default=0)
+    visitors_sketch = Column(LargeBinary, nullable=True)
+
+class SiteMonthlyTable(Base):
+    """Site-wide monthly rollup, date at UTC midnight on the 1st"""
+    __tablename__ = "site_monthly"
+
+    date = Column(DateTime, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_views = Column(Integer, nullable=False, default=0)
+    visitors_sketch = Column(LargeBinary, nullable=True)
+
+class ReferrerDomainTable(Base):
+    """Interned referrer domains; the empty domain is direct traffic"""
+    __tablename__ = "referrer_domains"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    domain = Column(String, unique=True, nullable=False)
+
+class UserAgentFamilyTable(Base):
+    """Interned user-agent classifications (see traffic.classify_user_agent)"""
+    __tablename__ = "user_agent_families"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    browser = Column(String, nullable=False)
+    os = Column(String, nullable=False)
+    device = Column(String, nullable=False)
+    is_bot = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ux_user_agent_families", "browser", "os", "device", "is_bot", unique=True),
+    )
+
+class AnalyticsTrafficTable(Base):
+    """Daily views per (article, referrer domain, user-agent family), date at UTC midnight"""
+    __tablename__ = "analytics_traffic"
+
+    article_id = Column(String, ForeignKey("articles.id"), primary_key=True)
+    date = Column(DateTime, primary_key=True)
+    referrer_id = Column(Integer, ForeignKey("referrer_domains.id"), primary_key=True)
+    user_agent_id = Column(Integer, ForeignKey("user_agent_families.id"), primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+
+    # Site-wide source breakdowns group a date range by referrer
+    __table_args__ = (
+        Index("ix_analytics_traffic_date_referrer_id", "date", "referrer_id"),
+    )
+
+class TrendingScoreTable(Base):
+    """Checkpoint of the in-memory trending ranking (see trending.py)"""
+    __tablename__ = "trending_scores"
+
+    article_id = Column(String, primary_key=True)
+    score = Column(Float, nullable=False)  # log of the decayed view weight, time-independent
 
 # Pydantic Models (API Request/Response)
 class UserProfile(BaseModel):
@@ -130,6 +282,7 @@ class UserResponse(BaseModel):
     profile: UserProfile
     created_at: datetime
     last_login: Optional[datetime]
+    last_seen: Optional[datetime] = None
     is_active: bool
     
     class Config:
@@ -196,13 +349,65 @@ class ArticleResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ArticleSummary(BaseModel):
+    """Lightweight article projection for listings (no body or inline images)"""
+    id: str
+    slug: str
+    title: str
+    subtitle: Optional[str]
+    excerpt: Optional[str]
+    category_name: str
+    category_slug: str
+    author_name: str
+    published_at: Optional[datetime]
+    views: int
+    image_url: Optional[str]
+    image_variants: Optional[Dict[str, str]] = None
+
+class ArticleSearchResult(ArticleSummary):
+    """Full-text search hit with a highlighted snippet and bm25 rank"""
+    snippet: Optional[str]
+    rank: float
+
+class TrendingArticle(ArticleSummary):
+    """Trending feed entry; score is the decayed view count right now"""
+    score: float
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
 
 class LoginRequest(BaseModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+class BeaconEvent(BaseModel):
+    """Client analytics event posted in batches to /api/analytics/collect"""
+    article_id: str = Field(..., max_length=64)
+    visitor_id: Optional[str] = Field(None, max_length=128)
+
+class ViewEvent(BeaconEvent):
+    type: Literal["view"]
+    referrer: Optional[str] = Field(None, max_length=2048)
+
+class HeartbeatEvent(BeaconEvent):
+    """Engaged reading time since the previous heartbeat"""
+    type: Literal["heartbeat"]
+    seconds: int = Field(..., ge=0, le=300)
+
+class ScrollEvent(BeaconEvent):
+    """Maximum scroll depth reached during one page view, in percent"""
+    type: Literal["scroll"]
+    depth: int = Field(..., ge=0, le=100)
+
+AnalyticsEvent = Annotated[Union[ViewEvent, HeartbeatEvent, ScrollEvent], Field(discriminator="type")]
@@ -0,0 +1,98 @@
+"""
+Password hashing off the event loop
+
+bcrypt costs a few hundred milliseconds of CPU per hash or check. Run
+inline in an async handler, that stalls every other request on the worker,
+so hashes and checks go to a dedicated thread pool instead (bcrypt releases
+the GIL while it works). At most PASSWORD_HASH_WORKERS run at once; further
+calls wait in an asyncio queue, and once PASSWORD_HASH_MAX_QUEUED are
+waiting new ones fail fast with HashingQueueFull rather than piling up
+behind a login burst. ``stats()`` reports queue depth and wait times.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+# Half the cores by default, leaving the rest to the event loop and the database
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_QUEUED = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", "64"))
+
+T = TypeVar("T")
+
+class HashingQueueFull(Exception):
+    """Too many password hashes are already waiting"""
+
+class PasswordHasher:
+    """Bounded-concurrency runner for bcrypt calls, with queueing metrics"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queued: int = PASSWORD_HASH_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """``func(*args)`` on the hashing pool once a slot is free"""
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise HashingQueueFull()
+        self.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        started_at = time.perf_counter()
+        waited = started_at - queued_at
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.running += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        except BaseException:
+            self._finished(started_at)
+            raise
+        # The slot is freed when the thread is done, even if the caller gave up first
+        future.add_done_callback(lambda _: self._finished(started_at))
+        return await asyncio.shield(future)
+
+    def _finished(self, started_at: float):
+        self.running -= 1
+        self.completed += 1
+        self.run_seconds += time.perf_counter() - started_at
+        self._slots.release()
+
+    def shutdown(self):
+        """Stop the hashing threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.wait_seconds / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seconds, 2),
+            "avg_run_ms": round(1000 * self.run_seconds / self.completed, 2) if self.completed else 0.0,
+        }
+
+password_hasher = PasswordHasher()
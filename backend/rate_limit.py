@@ -0,0 +1,217 @@
+"""
+Token-bucket rate limiting for login attempts
+
+Every login attempt takes a token from the bucket of the client's address
+and from the bucket of the username it names; each bucket holds up to
+``burst`` tokens and refills at ``per_minute``. An empty bucket rejects the
+attempt before the user is looked up or a password hashed, so a credential
+flood costs a dictionary lookup per request instead of a bcrypt check.
+
+A bucket is two floats (tokens, updated). Buckets are kept in a store:
+
+- ``memory``: a per-process LRU of at most LOGIN_RATE_LIMIT_KEYS buckets
+  (see cache.TTLCache). A bucket is dropped once it would have refilled,
+  since a full bucket and a missing one behave the same; evicting one
+  early only forgives its client.
+- ``sqlite``: a local SQLite file (LOGIN_RATE_LIMIT_DB) shared by every
+  worker process on the host, read and written in one ``BEGIN IMMEDIATE``
+  transaction per take. Refilled buckets are pruned and the table capped
+  at LOGIN_RATE_LIMIT_KEYS rows, least recently used first.
+
+Select one with LOGIN_RATE_LIMIT_BACKEND.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from cache import TTLCache
+
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")
+LOGIN_RATE_LIMIT_DB = os.getenv("LOGIN_RATE_LIMIT_DB", "./login_buckets.db")
+LOGIN_RATE_LIMIT_KEYS = int(os.getenv("LOGIN_RATE_LIMIT_KEYS", "100000"))
+LOGIN_RATE_IP_BURST = float(os.getenv("LOGIN_RATE_IP_BURST", "20"))
+LOGIN_RATE_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", "10"))
+LOGIN_RATE_USERNAME_BURST = float(os.getenv("LOGIN_RATE_USERNAME_BURST", "5"))
+LOGIN_RATE_USERNAME_PER_MINUTE = float(os.getenv("LOGIN_RATE_USERNAME_PER_MINUTE", "5"))
+
+# Longest key part kept, so a bucket's key is bounded whatever clients send
+MAX_KEY_LENGTH = 128
+
+# SQLite store: prune refilled buckets every this many takes
+PRUNE_EVERY = 1000
+
+Bucket = Tuple[float, float]
+
+class Rule(NamedTuple):
+    burst: float
+    per_minute: float
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for an empty bucket to fill up again"""
+        return self.burst * 60 / self.per_minute
+
+def take_token(bucket: Optional[Bucket], rule: Rule, now: float) -> Tuple[Bucket, float]:
+    """Refill ``bucket`` to ``now`` and take a token
+
+    Returns the new bucket and 0.0, or the bucket unchanged apart from the
+    refill and the seconds until a token is available.
+    """
+    if bucket is None:
+        tokens = rule.burst
+    else:
+        tokens, updated = bucket
+        tokens = min(rule.burst, tokens + max(0.0, now - updated) * rule.per_minute / 60)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) * 60 / rule.per_minute
+
+class MemoryBucketStore:
+    """Buckets of this process, in an LRU bounded to ``max_keys``"""
+
+    def __init__(self, max_keys: int = LOGIN_RATE_LIMIT_KEYS):
+        self._buckets = TTLCache(max_keys, ttl=0)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, rule: Rule, now: float) -> float:
+        bucket, retry_after = take_token(self._buckets.get(key), rule, now)
+        self._buckets.set(key, bucket, ttl=rule.refill_seconds)
+        return retry_after
+
+    def close(self):
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        stats = self._buckets.stats()
+        # Each bucket expires after its own rule's refill time
+        del stats["ttl_seconds"]
+        return {"backend": "memory", **stats}
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by the workers on this host"""
+
+    def __init__(self, path: str = LOGIN_RATE_LIMIT_DB, max_keys: int = LOGIN_RATE_LIMIT_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._takes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_buckets_updated ON login_buckets (updated)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_buckets_full_at ON login_buckets (full_at)")
+            self._conn = conn
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT count(*) FROM login_buckets").fetchone()[0]
+
+    def _take(self, key: str, rule: Rule, now: float) -> float:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM login_buckets WHERE key = ?", (key,)).fetchone()
+                (tokens, updated), retry_after = take_token(row, rule, now)
+                conn.execute(
+                    "INSERT INTO login_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET"
+                    " tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at",
+                    (key, tokens, updated, updated + (rule.burst - tokens) * 60 / rule.per_minute)
+                )
+                self._takes += 1
+                if self._takes % PRUNE_EVERY == 0:
+                    self._prune(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return retry_after
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM login_buckets WHERE full_at <= ?", (now,))
+        excess = conn.execute("SELECT count(*) FROM login_buckets").fetchone()[0] - self.max_keys
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM login_buckets WHERE key IN"
+                " (SELECT key FROM login_buckets ORDER BY updated LIMIT ?)",
+                (excess,)
+            )
+
+    async def take(self, key: str, rule: Rule, now: float) -> float:
+        # Waiting on another worker's write lock must not block the event loop
+        return await run_in_threadpool(self._take, key, rule, now)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "size": len(self), "maxsize": self.max_keys}
+
+class LoginRateLimiter:
+    """Per-address and per-username token buckets for login attempts"""
+
+    def __init__(
+        self,
+        store,
+        by_address: Rule = Rule(LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MINUTE),
+        by_username: Rule = Rule(LOGIN_RATE_USERNAME_BURST, LOGIN_RATE_USERNAME_PER_MINUTE),
+    ):
+        self.store = store
+        self.by_address = by_address
+        self.by_username = by_username
+        self.allowed = 0
+        self.rejected_address = 0
+        self.rejected_username = 0
+
+    async def check(self, address: str, username: str) -> float:
+        """Take a login attempt's tokens: 0.0 if allowed, else seconds to wait"""
+        now = time.time()
+        retry_after = await self.store.take(f"ip:{address[:MAX_KEY_LENGTH]}", self.by_address, now)
+        if retry_after:
+            self.rejected_address += 1
+            return retry_after
+        username = username.strip().lower()[:MAX_KEY_LENGTH]
+        retry_after = await self.store.take(f"user:{username}", self.by_username, now)
+        if retry_after:
+            self.rejected_username += 1
+            return retry_after
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected_address": self.rejected_address,
+            "rejected_username": self.rejected_username,
+            "by_address": self.by_address._asdict(),
+            "by_username": self.by_username._asdict(),
+            "store": self.store.stats(),
+        }
+
+def create_store(backend: str = LOGIN_RATE_LIMIT_BACKEND):
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore()
+    raise ValueError(f"Unknown LOGIN_RATE_LIMIT_BACKEND: {backend!r}")
+
+login_rate_limiter = LoginRateLimiter(create_store())
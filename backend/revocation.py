@@ -0,0 +1,133 @@
+"""
+Revoked login sessions, held in a Bloom filter
+
+Access tokens carry the id of the login session that issued them ("sid").
+Logging out revokes the session: refresh_tokens.revoked_at is set, which
+ends its refresh token, and the id goes into an in-memory Bloom filter
+that ``get_current_user`` consults. A token whose session is not in the
+filter (nearly every request) is accepted without touching the database.
+One that might be revoked is confirmed against the table, so a false
+positive costs a primary-key lookup, never a wrongful rejection.
+
+Only sessions revoked within the access-token lifetime matter; every
+access token of an older revocation has expired. The filter is loaded
+from the table at startup, picks up revocations made by other worker
+processes every REVOCATION_SYNC_SECONDS, and is rebuilt once per
+access-token lifetime so expired revocations drop out of it.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import PeriodicTask
+from bloom import BloomFilter
+from database import engine
+from models import RefreshTokenTable
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "10"))
+
+class RevocationList:
+    """Sessions revoked within ``window``, as a Bloom filter backed by refresh_tokens"""
+
+    def __init__(
+        self,
+        window: timedelta,
+        capacity: int = REVOCATION_FILTER_CAPACITY,
+        error_rate: float = REVOCATION_FILTER_ERROR_RATE,
+        interval: float = REVOCATION_SYNC_SECONDS,
+    ):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.interval = interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_at: Optional[datetime] = None
+        self._loaded_at: Optional[datetime] = None
+        # Revocations made while a load is reading the table
+        self._added_during_load: Optional[Set[str]] = None
+        self._task = PeriodicTask("revocation-sync", interval, self.sync)
+        self.checks = 0
+        self.filter_hits = 0
+        self.confirmed = 0
+
+    def add(self, session_id: str):
+        """Note a revocation made by this process"""
+        self._filter.add(session_id)
+        if self._added_during_load is not None:
+            self._added_during_load.add(session_id)
+
+    async def is_revoked(self, session_id: str, db: AsyncSession) -> bool:
+        self.checks += 1
+        if session_id not in self._filter:
+            return False
+        self.filter_hits += 1
+        revoked_at = await db.scalar(
+            select(RefreshTokenTable.revoked_at).where(RefreshTokenTable.id == session_id)
+        )
+        if revoked_at is None:
+            return False
+        self.confirmed += 1
+        return True
+
+    async def _revoked_since(self, since: datetime) -> List[str]:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(RefreshTokenTable.id).where(RefreshTokenTable.revoked_at >= since)
+            )
+            return result.scalars().all()
+
+    async def load(self):
+        """Rebuild the filter from the sessions revoked within the window"""
+        now = datetime.utcnow()
+        self._added_during_load = set()
+        try:
+            session_ids = await self._revoked_since(now - self.window)
+            # Past its capacity a filter's error rate climbs; size for the backlog
+            bloom = BloomFilter(max(self.capacity, 2 * len(session_ids)), self.error_rate)
+            for session_id in session_ids:
+                bloom.add(session_id)
+            for session_id in self._added_during_load:
+                bloom.add(session_id)
+        finally:
+            self._added_during_load = None
+        self._filter = bloom
+        self._loaded_at = self._synced_at = now
+        logger.debug("Loaded %d revoked sessions", len(session_ids))
+
+    async def sync(self):
+        """Add sessions revoked by other processes since the last sync"""
+        now = datetime.utcnow()
+        if self._loaded_at is None or now - self._loaded_at >= self.window:
+            await self.load()
+            return
+        # Overlap by an interval: a revocation stamped before the last sync
+        # may have committed after it
+        for session_id in await self._revoked_since(self._synced_at - timedelta(seconds=self.interval)):
+            self._filter.add(session_id)
+        self._synced_at = now
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+    def stats(self) -> dict:
+        return {
+            "filter_bits": self._filter.size,
+            "filter_hashes": self._filter.hashes,
+            "filter_items": len(self._filter),
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "confirmed_revoked": self.confirmed,
+            "loaded_at": self._loaded_at,
+            "synced_at": self._synced_at,
+        }
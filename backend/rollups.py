@@ -0,0 +1,322 @@
+"""
+Hierarchical analytics rollups
+
+View, heartbeat and scroll events are aggregated in memory per (article_id,
+UTC hour) (see view_buffer). Each flush consolidates them into three tiers
+in one transaction: hourly, daily and monthly buckets, per article
+(analytics_hourly, analytics, analytics_monthly) and site-wide (site_hourly,
+site_daily, site_monthly). Charts and dashboard totals read these small
+pre-aggregated rows.
+
+Because every tier is written at flush time, compaction only has to expire
+buckets once they age out of their tier: hourly rows after
+ROLLUP_HOURLY_RETENTION_HOURS and daily rows after
+ROLLUP_DAILY_RETENTION_DAYS, by which point the coarser tier already holds
+their totals. Monthly rows are kept, so storage grows by one row per
+article per month. A range query reads the finest tier that still covers
+the whole range in at most MAX_SERIES_POINTS buckets.
+
+Each row also keeps a HyperLogLog sketch of the bucket's visitors. Sketches
+are merged inside SQLite by the upserts (``hll_merge``), and unique counts
+over longer ranges come from unions of the bucket sketches.
+
+The tables live in the analytics shards (see shards); each shard holds the
+site-wide rows for its own articles, and ``merge_buckets`` combines them.
+"""
+import itertools
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import DateTime, TextClause, bindparam, delete, func, select, text
+
+from hyperloglog import HyperLogLog
+from models import (
+    AnalyticsHourlyTable, AnalyticsMonthlyTable, AnalyticsTable,
+    SiteDailyTable, SiteHourlyTable, SiteMonthlyTable
+)
+
+# Sketch sizes: 1 KiB per article bucket (~3% error), 16 KiB per site bucket (~0.8%)
+ARTICLE_SKETCH_PRECISION = 10
+SITE_SKETCH_PRECISION = 14
+
+ROLLUP_HOURLY_RETENTION_HOURS = int(os.getenv("ROLLUP_HOURLY_RETENTION_HOURS", "48"))
+ROLLUP_DAILY_RETENTION_DAYS = int(os.getenv("ROLLUP_DAILY_RETENTION_DAYS", "90"))
+# Most buckets a range query reads before falling back to a coarser tier
+MAX_SERIES_POINTS = 400
+
+def hour_start(moment: datetime) -> datetime:
+    """Start of the UTC hour containing ``moment``"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def day_start(moment: datetime) -> datetime:
+    """UTC midnight of the day containing ``moment``"""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def month_start(moment: datetime) -> datetime:
+    """UTC midnight on the 1st of the month containing ``moment``"""
+    return day_start(moment).replace(day=1)
+
+def _next_month(moment: datetime) -> datetime:
+    return (moment.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+class Resolution(NamedTuple):
+    """One rollup tier: bucket boundaries, retention and tables"""
+    name: str
+    truncate: Callable[[datetime], datetime]
+    step: Callable[[datetime], datetime]
+    retention: Optional[timedelta]
+    article_table: type
+    site_table: type
+
+HOURLY = Resolution(
+    "hour", hour_start, lambda moment: moment + timedelta(hours=1),
+    timedelta(hours=ROLLUP_HOURLY_RETENTION_HOURS), AnalyticsHourlyTable, SiteHourlyTable
+)
+DAILY = Resolution(
+    "day", day_start, lambda moment: moment + timedelta(days=1),
+    timedelta(days=ROLLUP_DAILY_RETENTION_DAYS), AnalyticsTable, SiteDailyTable
+)
+MONTHLY = Resolution("month", month_start, _next_month, None, AnalyticsMonthlyTable, SiteMonthlyTable)
+
+# Finest first
+RESOLUTIONS = (HOURLY, DAILY, MONTHLY)
+RESOLUTIONS_BY_NAME = {resolution.name: resolution for resolution in RESOLUTIONS}
+
+def _article_upsert(model) -> TextClause:
+    # Shards have no articles table: callers drop unknown article ids first
+    table = model.__tablename__
+    row_id_column, row_id_value = ("id, ", ":row_id, ") if "id" in model.__table__.c else ("", "")
+    return text(
+        f"INSERT INTO {table} ({row_id_column}article_id, date, views, unique_views, visitors_sketch, "
+        "session_duration, scroll_depth_sum, scroll_samples) "
+        f"VALUES ({row_id_value}:article_id, :bucket, :views, hll_count(:sketch), :sketch, "
+        ":engaged_seconds, :scroll_depth_sum, :scroll_samples) "
+        "ON CONFLICT (article_id, date) DO UPDATE SET "
+        f"views = {table}.views + excluded.views, "
+        f"session_duration = COALESCE({table}.session_duration, 0) + excluded.session_duration, "
+        f"scroll_depth_sum = COALESCE({table}.scroll_depth_sum, 0) + excluded.scroll_depth_sum, "
+        f"scroll_samples = COALESCE({table}.scroll_samples, 0) + excluded.scroll_samples, "
+        f"visitors_sketch = hll_merge({table}.visitors_sketch, excluded.visitors_sketch), "
+        f"unique_views = hll_count(hll_merge({table}.visitors_sketch, excluded.visitors_sketch))"
+    ).bindparams(bindparam("bucket", type_=DateTime()))
+
+def _site_upsert(model) -> TextClause:
+    table = model.__tablename__
+    return text(
+        f"INSERT INTO {table} (date, views, unique_views, visitors_sketch) "
+        "VALUES (:bucket, :views, hll_count(:sketch), :sketch) "
+        "ON CONFLICT (date) DO UPDATE SET "
+        f"views = {table}.views + excluded.views, "
+        f"visitors_sketch = hll_merge({table}.visitors_sketch, excluded.visitors_sketch), "
+        f"unique_views = hll_count(hll_merge({table}.visitors_sketch, excluded.visitors_sketch))"
+    ).bindparams(bindparam("bucket", type_=DateTime()))
+
+UPSERTS = {
+    resolution.name: (_article_upsert(resolution.article_table), _site_upsert(resolution.site_table))
+    for resolution in RESOLUTIONS
+}
+
+class RollupCounters:
+    """Buffered aggregates for one (article, bucket) rollup row"""
+
+    __slots__ = ("views", "engaged_seconds", "scroll_depth_sum", "scroll_samples", "sketch")
+
+    def __init__(self):
+        self.views = 0
+        self.engaged_seconds = 0
+        self.scroll_depth_sum = 0
+        self.scroll_samples = 0
+        self.sketch: Optional[HyperLogLog] = None
+
+    def add_visitor(self, hashed: int):
+        if self.sketch is None:
+            self.sketch = HyperLogLog(ARTICLE_SKETCH_PRECISION)
+        self.sketch.add_hash(hashed)
+
+    def merge(self, other: "RollupCounters") -> "RollupCounters":
+        self.views += other.views
+        self.engaged_seconds += other.engaged_seconds
+        self.scroll_depth_sum += other.scroll_depth_sum
+        self.scroll_samples += other.scroll_samples
+        if other.sketch is not None:
+            self.sketch = other.sketch.copy() if self.sketch is None else self.sketch.merge(other.sketch)
+        return self
+
+def day_range(days: int, today: datetime = None) -> Tuple[datetime, datetime]:
+    """[start, end) covering the last ``days`` days including today"""
+    end = day_start(today or datetime.utcnow()) + timedelta(days=1)
+    return end - timedelta(days=days), end
+
+def buckets(resolution: Resolution, start: datetime, end: datetime) -> Iterable[datetime]:
+    """Bucket starts of ``resolution`` overlapping [start, end)"""
+    bucket = resolution.truncate(start)
+    while bucket < end:
+        yield bucket
+        bucket = resolution.step(bucket)
+
+def retained_since(resolution: Resolution, now: datetime = None) -> datetime:
+    """Oldest bucket of ``resolution`` that compaction keeps"""
+    if resolution.retention is None:
+        return datetime.min
+    return resolution.truncate(now or datetime.utcnow()) - resolution.retention
+
+def fits(resolution: Resolution, start: datetime, end: datetime, now: datetime = None) -> bool:
+    """Whether ``resolution`` still holds [start, end) within MAX_SERIES_POINTS buckets"""
+    if resolution.truncate(start) < retained_since(resolution, now):
+        return False
+    points = itertools.islice(buckets(resolution, start, end), MAX_SERIES_POINTS + 1)
+    return sum(1 for _ in points) <= MAX_SERIES_POINTS
+
+def resolution_for(
+    start: datetime,
+    end: datetime,
+    finest: Resolution = HOURLY,
+    now: datetime = None
+) -> Resolution:
+    """Finest tier, no finer than ``finest``, that fits [start, end)"""
+    for resolution in RESOLUTIONS[RESOLUTIONS.index(finest):]:
+        if fits(resolution, start, end, now):
+            return resolution
+    return MONTHLY
+
+def consolidate(
+    counters: Dict[Tuple[str, datetime], RollupCounters],
+    resolution: Resolution
+) -> Dict[Tuple[str, datetime], RollupCounters]:
+    """Merge counters keyed by (article_id, bucket) into ``resolution`` buckets"""
+    merged: Dict[Tuple[str, datetime], RollupCounters] = {}
+    for (article_id, bucket), counts in counters.items():
+        key = (article_id, resolution.truncate(bucket))
+        target = merged.get(key)
+        if target is None:
+            target = merged[key] = RollupCounters()
+        target.merge(counts)
+    return merged
+
+def consolidate_sketches(
+    sketches: Dict[datetime, HyperLogLog],
+    resolution: Resolution
+) -> Dict[datetime, HyperLogLog]:
+    """Union per-bucket sketches into ``resolution`` buckets"""
+    merged: Dict[datetime, HyperLogLog] = {}
+    for bucket, sketch in sketches.items():
+        key = resolution.truncate(bucket)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch.copy()
+    return merged
+
+def _blob(sketch: Optional[HyperLogLog]) -> Optional[bytes]:
+    return sketch.to_bytes() if sketch is not None else None
+
+async def write_rollups(
+    conn,
+    counters: Dict[Tuple[str, datetime], RollupCounters],
+    site_sketches: Dict[datetime, HyperLogLog]
+):
+    """Add buffered counters keyed by (article_id, hour) to every rollup tier"""
+    if not counters:
+        return
+    for resolution in RESOLUTIONS:
+        article_upsert, site_upsert = UPSERTS[resolution.name]
+        tier_counters = consolidate(counters, resolution)
+        tier_sketches = consolidate_sketches(site_sketches, resolution)
+        await conn.execute(article_upsert, [
+            {
+                "row_id": str(uuid.uuid4()),
+                "article_id": article_id,
+                "bucket": bucket,
+                "views": counts.views,
+                "sketch": _blob(counts.sketch),
+                "engaged_seconds": counts.engaged_seconds,
+                "scroll_depth_sum": counts.scroll_depth_sum,
+                "scroll_samples": counts.scroll_samples,
+            }
+            for (article_id, bucket), counts in tier_counters.items()
+        ])
+
+        site_views: Dict[datetime, int] = {}
+        for (_, bucket), counts in tier_counters.items():
+            site_views[bucket] = site_views.get(bucket, 0) + counts.views
+        await conn.execute(site_upsert, [
+            {"bucket": bucket, "views": views, "sketch": _blob(tier_sketches.get(bucket))}
+            for bucket, views in site_views.items()
+        ])
+
+async def compact_rollups(conn, now: datetime = None) -> int:
+    """Expire buckets older than their tier's retention; returns rows removed"""
+    removed = 0
+    for resolution in RESOLUTIONS:
+        if resolution.retention is None:
+            continue
+        cutoff = retained_since(resolution, now)
+        for table in (resolution.article_table, resolution.site_table):
+            result = await conn.execute(delete(table).where(table.date < cutoff))
+            removed += result.rowcount
+    return removed
+
+def _rollup_table(resolution: Resolution, article_id: Optional[str]):
+    return resolution.article_table if article_id is not None else resolution.site_table
+
+def views_query(start: datetime, end: datetime, article_id: str = None, resolution: Resolution = DAILY):
+    """(date, views, unique_views, visitors_sketch) per bucket in [start, end), site-wide or for one article"""
+    table = _rollup_table(resolution, article_id)
+    query = (
+        select(table.date, table.views, table.unique_views, table.visitors_sketch)
+        .where(table.date >= start, table.date < end)
+    )
+    if article_id is not None:
+        query = query.where(table.article_id == article_id)
+    return query
+
+def engagement_query(start: datetime, end: datetime, article_id: str, resolution: Resolution = DAILY):
+    """(views, engaged seconds, scroll depth sum, scroll samples) for one article in [start, end)"""
+    table = resolution.article_table
+    return select(
+        func.coalesce(func.sum(table.views), 0),
+        func.coalesce(func.sum(table.session_duration), 0),
+        func.coalesce(func.sum(table.scroll_depth_sum), 0),
+        func.coalesce(func.sum(table.scroll_samples), 0)
+    ).where(table.article_id == article_id, table.date >= start, table.date < end)
+
+def merge_buckets(rows) -> Tuple[List[Tuple[datetime, int, int]], int]:
+    """Combine views_query rows from any number of shards
+
+    Returns (date, views, unique_views) per bucket, for fill_series, and the
+    distinct visitors over all buckets. A bucket's views add up across
+    shards and its unique count is that of the union of its sketches.
+    """
+    merged: Dict[datetime, list] = {}
+    union = None
+    for bucket, views, unique_views, blob in rows:
+        entry = merged.get(bucket)
+        if entry is None:
+            entry = merged[bucket] = [0, 0, None]
+        entry[0] += views or 0
+        entry[1] += unique_views or 0
+        if blob:
+            sketch = HyperLogLog.from_bytes(blob)
+            union = sketch.copy() if union is None else union.merge(sketch)
+            entry[2] = sketch if entry[2] is None else entry[2].merge(sketch)
+    series = [
+        (bucket, views, sketch.count() if sketch is not None else unique_views)
+        for bucket, (views, unique_views, sketch) in merged.items()
+    ]
+    return series, union.count() if union is not None else 0
+
+def bucket_label(resolution: Resolution, bucket: datetime) -> str:
+    if resolution is HOURLY:
+        return bucket.isoformat(timespec="minutes")
+    return bucket.date().isoformat()
+
+def fill_series(rows, start: datetime, end: datetime, resolution: Resolution = DAILY) -> List[dict]:
+    """Chart series with one point per bucket in [start, end), zeros included"""
+    by_bucket = {bucket: (views, unique_views) for bucket, views, unique_views in rows}
+    series = []
+    for bucket in buckets(resolution, start, end):
+        views, unique_views = by_bucket.get(bucket, (0, 0))
+        series.append({"date": bucket_label(resolution, bucket), "views": views, "unique_views": unique_views})
+    return series
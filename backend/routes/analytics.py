@@ -1,51 +1,55 @@
 """
 Analytics routes for SQLite
 """
+import asyncio
 from datetime import datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import get_current_active_user
+from auth import get_current_active_user, require_admin, Principal
 from database import get_db
-from models import UserTable, ArticleTable, AnalyticsTable
+from models import ArticleTable
+from collector import EVENT_BATCH, MAX_BEACON_BYTES, event_collector
+from dashboard import dashboard_snapshot
+from view_buffer import view_counter
+import exports
+import rollups
+import shards
+import traffic
+import utils
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
+REFERRERS_LIMIT = 10
+
+def visitor_key(request: Request) -> str:
+    """Anonymous visitor key: the client's X-Visitor-Id, else address and user agent
+
+    Only ever hashed into HyperLogLog sketches, never stored.
+    """
+    visitor_id = request.headers.get("x-visitor-id")
+    if visitor_id:
+        return visitor_id[:128]
+    host = request.client.host if request.client else ""
+    return f"{host}|{request.headers.get('user-agent', '')}"
+
 @router.get("/dashboard")
 async def get_dashboard_analytics(
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get dashboard analytics"""
+    """Get dashboard analytics
+
+    Served from the materialized dashboard snapshot; see dashboard.py.
+    """
     try:
-        # Get article counts
-        total_articles_result = await db.execute(select(func.count(ArticleTable.id)))
-        total_articles = total_articles_result.scalar()
-        
-        published_articles_result = await db.execute(
-            select(func.count(ArticleTable.id)).where(ArticleTable.status == "published")
-        )
-        published_articles = published_articles_result.scalar()
-        
-        draft_articles_result = await db.execute(
-            select(func.count(ArticleTable.id)).where(ArticleTable.status == "draft")
-        )
-        draft_articles = draft_articles_result.scalar()
-        
-        # Mock data for now (can be implemented later)
+        snapshot = await dashboard_snapshot.get(db)
         return {
-            "overview": {
-                "total_articles": total_articles or 0,
-                "published_articles": published_articles or 0,
-                "draft_articles": draft_articles or 0,
-                "total_views": 15420,  # Mock
-                "unique_visitors": 8950,  # Mock
-                "page_views": 23140,  # Mock
-                "bounce_rate": 68.5,  # Mock
-                "avg_session": "2:34"  # Mock
-            },
+            **snapshot,
             "recent_activity": [
                 {
                     "type": "article_published",
@@ -59,39 +63,17 @@ async def get_dashboard_analytics(
                     "timestamp": (datetime.utcnow() - timedelta(hours=2)).isoformat(),
                     "views": 1250
                 }
-            ],
-            "top_articles": [
-                {
-                    "id": "1",
-                    "title": "Revolutionary AI Discovery",
-                    "views": 4250,
-                    "published_at": datetime.utcnow().isoformat()
-                },
-                {
-                    "id": "2", 
-                    "title": "Mars Rover Breakthrough",
-                    "views": 3180,
-                    "published_at": datetime.utcnow().isoformat()
-                }
-            ],
-            "traffic_sources": [
-                {"source": "Direct", "percentage": 45.2, "visits": 6780},
-                {"source": "Google", "percentage": 32.1, "visits": 4820},
-                {"source": "Social Media", "percentage": 15.7, "visits": 2350},
-                {"source": "Referrals", "percentage": 7.0, "visits": 1050}
-            ],
-            "weekly_views": [
-                {"day": "Mon", "views": 1250},
-                {"day": "Tue", "views": 1180},
-                {"day": "Wed", "views": 1420},
-                {"day": "Thu", "views": 1350},
-                {"day": "Fri", "views": 1680},
-                {"day": "Sat", "views": 1920},
-                {"day": "Sun", "views": 1580}
             ]
         }
     except Exception as e:
         return {
+            "total_views": 0,
+            "week_views": 0,
+            "month_views": 0,
+            "published_articles": 0,
+            "week_unique_visitors": 0,
+            "month_unique_visitors": 0,
+            "daily_views": [],
             "overview": {
                 "total_articles": 0,
                 "published_articles": 0,
@@ -111,10 +93,17 @@ async def get_dashboard_analytics(
 @router.get("/article/{article_id}")
 async def get_article_analytics(
     article_id: str,
-    current_user: UserTable = Depends(get_current_active_user),
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get analytics for specific article"""
+    """Get analytics for specific article
+
+    ``daily_views`` and ``unique_views`` cover the last ``days`` days from
+    the daily rollups, or the monthly ones once the range reaches past
+    their retention (``resolution`` says which). ``referrers`` and
+    ``devices`` come from the traffic rollup, which keeps daily retention.
+    """
     # Verify article exists
     result = await db.execute(select(ArticleTable).where(ArticleTable.id == article_id))
     article = result.scalar_one_or_none()
@@ -122,45 +111,146 @@ async def get_article_analytics(
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    # Mock analytics data
+    start, end = rollups.day_range(days)
+    resolution = rollups.resolution_for(start, end, finest=rollups.DAILY)
+    start = resolution.truncate(start)
+    series_rows, engagement_rows, referrers, devices = await asyncio.gather(
+        shards.read(rollups.views_query(start, end, article_id, resolution), article_id),
+        shards.read(rollups.engagement_query(start, end, article_id, resolution), article_id),
+        shards.read(traffic.referrers_query(start, end, article_id).limit(REFERRERS_LIMIT), article_id),
+        shards.read(traffic.devices_query(start, end, article_id), article_id)
+    )
+    series, unique_views = rollups.merge_buckets(series_rows)
+    period_views, engaged_seconds, scroll_depth_sum, scroll_samples = engagement_rows[0]
+    
     return {
         "article_id": article_id,
         "title": article.title,
         "views": article.views,
-        "unique_views": article.views * 0.8,  # Mock
-        "avg_time": "2:15",  # Mock
+        "unique_views": unique_views,
+        "avg_time": utils.format_duration(engaged_seconds / period_views if period_views else 0),
+        "avg_scroll_depth": round(scroll_depth_sum / scroll_samples, 1) if scroll_samples else None,
         "bounce_rate": 65.2,  # Mock
-        "daily_views": [
-            {"date": "2025-08-01", "views": 120},
-            {"date": "2025-08-02", "views": 180},
-            {"date": "2025-08-03", "views": 250},
-            {"date": "2025-08-04", "views": 190},
-            {"date": "2025-08-05", "views": 340},
-            {"date": "2025-08-06", "views": 280}
-        ],
+        "resolution": resolution.name,
+        "daily_views": rollups.fill_series(series, start, end, resolution),
         "referrers": [
-            {"source": "google.com", "visits": 145},
-            {"source": "twitter.com", "visits": 89},
-            {"source": "facebook.com", "visits": 56},
-            {"source": "direct", "visits": 234}
+            {"source": domain or "direct", "visits": views}
+            for domain, views in referrers
+        ],
+        "devices": [
+            {"device": device, "visits": views}
+            for device, views in devices
         ]
     }
 
-@router.post("/track-view/{article_id}")
-async def track_article_view(
-    article_id: str,
-    db: AsyncSession = Depends(get_db)
+@router.get("/timeseries")
+async def get_views_timeseries(
+    days: int = Query(7, ge=1, le=3660),
+    article_id: Optional[str] = None,
+    resolution: Optional[str] = Query(None, pattern="^(hour|day|month)$"),
+    current_user: Principal = Depends(get_current_active_user)
 ):
-    """Track a page view for an article"""
+    """Views and unique visitors over the last ``days`` days, site-wide or for one article
+
+    Without ``resolution`` the series comes from the finest rollup tier that
+    still holds the whole range in at most ``rollups.MAX_SERIES_POINTS``
+    buckets: hours for a day or two, days up to the daily retention, months
+    beyond it. Site-wide series are merged from every analytics shard.
+    """
+    start, end = rollups.day_range(days)
+    if resolution is None:
+        tier = rollups.resolution_for(start, end)
+    else:
+        tier = rollups.RESOLUTIONS_BY_NAME[resolution]
+        if not rollups.fits(tier, start, end):
+            raise HTTPException(status_code=400, detail=f"Range not available at {resolution} resolution")
+    start = tier.truncate(start)
+    series, unique_visitors = rollups.merge_buckets(
+        await shards.read(rollups.views_query(start, end, article_id, tier), article_id)
+    )
+    
+    return {
+        "resolution": tier.name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "unique_visitors": unique_visitors,
+        "points": rollups.fill_series(series, start, end, tier)
+    }
+
+@router.get("/export")
+async def export_analytics(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    days: int = Query(30, ge=1, le=3660),
+    resolution: str = Query("day", pattern="^(hour|day|month)$"),
+    article_id: Optional[str] = None,
+    current_user: Principal = Depends(require_admin())
+):
+    """Download per-article rollups for the last ``days`` days (admin only)
+
+    Rows are streamed from a server-side cursor in fixed-size chunks, so
+    memory use does not grow with the export; see exports.py.
+    """
+    tier = rollups.RESOLUTIONS_BY_NAME[resolution]
+    start, end = rollups.day_range(days)
+    start = tier.truncate(start)
+    if start < rollups.retained_since(tier):
+        raise HTTPException(status_code=400, detail=f"Range not available at {resolution} resolution")
+    
+    query = exports.rollup_export_query(start, end, tier, article_id)
+    filename = f"analytics-{resolution}-{start.date().isoformat()}-{end.date().isoformat()}.{format}"
+    if format == "parquet":
+        body, media_type = exports.iter_parquet(query, article_id), "application/vnd.apache.parquet"
+    else:
+        body, media_type = exports.iter_csv(query, article_id), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/track-view/{article_id}")
+async def track_article_view(article_id: str, request: Request):
+    """Track a page view for an article
+
+    The increment is buffered in memory and written in batches by the view
+    counter; unknown ids match no row when flushed.
+    """
+    view_counter.record(
+        article_id, visitor=visitor_key(request), user_agent=request.headers.get("user-agent")
+    )
+    return {"success": True, "article_id": article_id}
+
+@router.post("/collect", status_code=204)
+async def collect_events(request: Request):
+    """Accept a batch of view/heartbeat/scroll events (navigator.sendBeacon compatible)
+
+    The body is a JSON array of events and may arrive with any content type;
+    sendBeacon sends strings as text/plain, which avoids a CORS preflight.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_BEACON_BYTES:
+        raise HTTPException(status_code=413, detail="Batch too large")
+    body = await request.body()
+    if len(body) > MAX_BEACON_BYTES:
+        raise HTTPException(status_code=413, detail="Batch too large")
+    
     try:
-        # Increment article view count
-        result = await db.execute(select(ArticleTable).where(ArticleTable.id == article_id))
-        article = result.scalar_one_or_none()
-        
-        if article:
-            article.views += 1
-            await db.commit()
-        
-        return {"success": True, "article_id": article_id}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        events = EVENT_BATCH.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=e.errors(include_url=False, include_context=False, include_input=False)
+        )
+    
+    if not event_collector.submit(
+        events, visitor_key(request), datetime.utcnow(), request.headers.get("user-agent")
+    ):
+        raise HTTPException(status_code=503, detail="Analytics queue is full")
+    return Response(status_code=204)
+
+@router.get("/collect/stats")
+async def get_collect_stats(
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Accepted, dropped and queued beacon event counts"""
+    return event_collector.stats()
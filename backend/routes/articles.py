@@ -2,43 +2,48 @@
 Article management routes for SQLite
 """
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, and_, or_
+from fastapi.responses import Response
+from sqlalchemy import select, and_, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from auth import get_current_active_user, require_editor_or_admin
-from database import get_db, tags_to_json, json_to_tags
+from auth import get_current_active_user, require_admin, require_editor_or_admin, Principal
+from dashboard import dashboard_snapshot
+from database import get_db, tags_to_json, set_article_tags
 from models import (
-    ArticleTable, UserTable, CategoryTable,
-    ArticleCreate, ArticleUpdate, ArticleResponse, 
-    ArticleStatus, UserResponse, Category, UserProfile
+    ArticleTable, UserTable, CategoryTable, TagTable, ArticleTagTable,
+    ArticleCreate, ArticleUpdate, ArticleResponse,
+    ArticleStatus, ArticleSummary, ArticleSearchResult, TrendingArticle
 )
+from hydration import hydration_cache
+from listing_cache import article_state, listing_cache, listing_params
+from serializers import ArticleJSONResponse, summary_query
+from trending import TRENDING_MAX_LIMIT, trending_articles
+import media
+import search as search_index
+import serializers
 import utils
 
 router = APIRouter(prefix="/api/articles", tags=["articles"])
 
-@router.get("/", response_model=List[ArticleResponse])
-async def get_articles(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100),
-    status: Optional[str] = Query(None),
-    category_id: Optional[str] = Query(None),
-    author_id: Optional[str] = Query(None),
-    search: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db)
-):
-    """Get articles with pagination and filtering (public endpoint)"""
-    query = select(ArticleTable, UserTable, CategoryTable).join(
-        UserTable, ArticleTable.author_id == UserTable.id
-    ).join(
-        CategoryTable, ArticleTable.category_id == CategoryTable.id
-    )
-    
-    # Build where conditions
+def listing_query(view: str):
+    """Base select for list endpoints: summary columns or full article rows"""
+    if view == "summary":
+        return summary_query()
+    return select(ArticleTable)
+
+def filter_conditions(
+    status: Optional[str] = None,
+    category_id: Optional[str] = None,
+    author_id: Optional[str] = None,
+    tag: Optional[str] = None
+) -> list:
+    """WHERE conditions shared by the public and admin listings"""
     conditions = []
     
-    if status:
+    if status and status.strip():
         try:
             status_enum = ArticleStatus(status)
             conditions.append(ArticleTable.status == status_enum)
@@ -52,78 +57,131 @@ async def get_articles(
     if author_id and author_id.strip():
         conditions.append(ArticleTable.author_id == author_id)
     
-    if search and search.strip():
-        conditions.append(
-            or_(
-                ArticleTable.title.contains(search),
-                ArticleTable.content.contains(search),
-                ArticleTable.tags.contains(search)
-            )
+    if tag and tag.strip():
+        conditions.append(ArticleTable.id.in_(
+            select(ArticleTagTable.article_id)
+            .join(TagTable, TagTable.id == ArticleTagTable.tag_id)
+            .where(TagTable.name == tag.strip())
+        ))
+    
+    return conditions
+
+def paginate_newest_first(query, skip: int, limit: int, cursor: Optional[str]):
+    """Order newest first and page by keyset cursor, or by legacy skip offset"""
+    query = query.order_by(ArticleTable.created_at.desc(), ArticleTable.id.desc())
+    if cursor:
+        try:
+            created_at, article_id = utils.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Row-value comparison lets SQLite seek straight to the page start
+        query = query.where(
+            tuple_(ArticleTable.created_at, ArticleTable.id) < (created_at, article_id)
+        )
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+async def hydrate_rows(db: AsyncSession, rows, serialize) -> list:
+    """Serialize article rows with authors/categories from the hydration cache
+
+    Rows whose author or category no longer exists are dropped, as the old
+    inner joins did.
+    """
+    authors, categories = await hydration_cache.lookup(
+        db,
+        author_ids={row.author_id for row in rows},
+        category_ids={row.category_id for row in rows}
+    )
+    return [
+        serialize(row, authors[row.author_id], categories[row.category_id])
+        for row in rows
+        if row.author_id in authors and row.category_id in categories
+    ]
+
+async def listing_response(db: AsyncSession, rows, view: str, limit: int) -> ArticleJSONResponse:
+    """Serialize a listing page; the next keyset cursor goes in X-Next-Cursor"""
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = utils.encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    if view == "summary":
+        content = await hydrate_rows(db, rows, serializers.summary_to_dict)
+    else:
+        content = await hydrate_rows(db, rows, serializers.hydrated_article_to_dict)
+    return ArticleJSONResponse(content, headers=headers)
+
+@router.get("/", response_model=Union[List[ArticleResponse], List[ArticleSummary]])
+async def get_articles(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    status: Optional[str] = Query(None),
+    category_id: Optional[str] = Query(None),
+    author_id: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get articles with pagination and filtering (public endpoint)
+
+    ``view=summary`` returns ArticleSummary rows selected column by column.
+    Pass the X-Next-Cursor response header back as ``cursor`` to fetch the
+    next page with an index seek instead of ``skip``. Responses are served
+    from the listing cache when possible (see X-Cache).
+    """
+    cache_key = listing_params(
+        view, status, category_id, author_id, tag, search,
+        skip, limit, cursor, hydration_cache.version
+    )
+    cached = listing_cache.get(cache_key)
+    if cached is not None:
+        return Response(
+            cached.body,
+            media_type="application/json",
+            headers={**cached.headers, "X-Cache": "HIT"}
         )
+    # A write committed while the query runs must not leave its result cached
+    generation = listing_cache.generation
+    
+    query = listing_query(view)
+    
+    # Build where conditions
+    conditions = filter_conditions(status, category_id, author_id, tag)
+    
+    if search and search.strip():
+        search_condition = search_index.match_condition(search)
+        if search_condition is None:
+            return ArticleJSONResponse([])
+        conditions.append(search_condition)
     
     if conditions:
         query = query.where(and_(*conditions))
     
-    query = query.order_by(ArticleTable.created_at.desc()).offset(skip).limit(limit)
+    query = paginate_newest_first(query, skip, limit, cursor)
     
     result = await db.execute(query)
-    rows = result.fetchall()
-    
-    # Return empty list if no articles
-    if not rows:
-        return []
-    
-    # Format responses
-    response_articles = []
-    for article, author, category in rows:
-        author_profile = UserProfile(
-            name=author.name or "",
-            bio=author.bio,
-            avatar=author.avatar
-        )
-        
-        author_response = UserResponse(
-            id=author.id,
-            username=author.username,
-            email=author.email,
-            role=author.role,
-            profile=author_profile,
-            created_at=author.created_at,
-            last_login=author.last_login,
-            is_active=author.is_active
-        )
-        
-        category_response = Category(
-            id=category.id,
-            name=category.name,
-            slug=category.slug,
-            description=category.description,
-            created_at=category.created_at
-        )
-        
-        response_articles.append(ArticleResponse(
-            id=article.id,
-            title=article.title,
-            subtitle=article.subtitle,
-            content=article.content,
-            author=author_response,
-            category=category_response,
-            tags=json_to_tags(article.tags),
-            featured_image=article.featured_image,
-            status=article.status,
-            published_at=article.published_at,
-            created_at=article.created_at,
-            updated_at=article.updated_at,
-            views=article.views,
-            slug=article.slug,
-            seo_title=article.seo_title,
-            seo_description=article.seo_description
-        ))
-    
-    return response_articles
+    rows = result.scalars().all() if view == "full" else result.fetchall()
+    
+    response = await listing_response(db, rows, view, limit)
+    cursor_headers = {
+        name: response.headers[name] for name in ("X-Next-Cursor",) if name in response.headers
+    }
+    listing_cache.store(cache_key, response.body, cursor_headers, (row.id for row in rows), generation)
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+@router.get("/cache/stats")
+async def get_listing_cache_stats(
+    current_user: Principal = Depends(require_admin())
+):
+    """Hit/miss counters and occupancy of the public listing cache (admin only)"""
+    return listing_cache.stats()
 
 
-@router.get("/admin", response_model=List[ArticleResponse])
+@router.get("/admin", response_model=Union[List[ArticleResponse], List[ArticleSummary]])
 async def get_articles_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
@@ -131,41 +189,28 @@ async def get_articles_admin(
     category_id: Optional[str] = Query(None),
     author_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    current_user: UserTable = Depends(get_current_active_user),
+    tag: Optional[str] = Query(None),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    cursor: Optional[str] = Query(None),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get articles with pagination and filtering (admin endpoint with auth)"""
-    query = select(ArticleTable, UserTable, CategoryTable).join(
-        UserTable, ArticleTable.author_id == UserTable.id
-    ).join(
-        CategoryTable, ArticleTable.category_id == CategoryTable.id
-    )
+    """Get articles with pagination and filtering (admin endpoint with auth)
+
+    ``view=summary`` returns ArticleSummary rows selected column by column.
+    Pass the X-Next-Cursor response header back as ``cursor`` to fetch the
+    next page with an index seek instead of ``skip``.
+    """
+    query = listing_query(view)
     
     # Build where conditions
-    conditions = []
-    
-    if status and status.strip():
-        try:
-            status_enum = ArticleStatus(status)
-            conditions.append(ArticleTable.status == status_enum)
-        except ValueError:
-            # Invalid status, ignore
-            pass
-    
-    if category_id and category_id.strip():
-        conditions.append(ArticleTable.category_id == category_id)
-    
-    if author_id and author_id.strip():
-        conditions.append(ArticleTable.author_id == author_id)
+    conditions = filter_conditions(status, category_id, author_id, tag)
     
     if search and search.strip():
-        conditions.append(
-            or_(
-                ArticleTable.title.contains(search),
-                ArticleTable.content.contains(search),
-                ArticleTable.tags.contains(search)
-            )
-        )
+        search_condition = search_index.match_condition(search)
+        if search_condition is None:
+            return ArticleJSONResponse([])
+        conditions.append(search_condition)
     
     # Non-admin users can only see their own articles
     if current_user.role != "admin":
@@ -174,63 +219,12 @@ async def get_articles_admin(
     if conditions:
         query = query.where(and_(*conditions))
     
-    query = query.order_by(ArticleTable.created_at.desc()).offset(skip).limit(limit)
+    query = paginate_newest_first(query, skip, limit, cursor)
     
     result = await db.execute(query)
-    rows = result.fetchall()
-    
-    # Return empty list if no articles
-    if not rows:
-        return []
-    
-    # Format responses
-    response_articles = []
-    for article, author, category in rows:
-        author_profile = UserProfile(
-            name=author.name or "",
-            bio=author.bio,
-            avatar=author.avatar
-        )
-        
-        author_response = UserResponse(
-            id=author.id,
-            username=author.username,
-            email=author.email,
-            role=author.role,
-            profile=author_profile,
-            created_at=author.created_at,
-            last_login=author.last_login,
-            is_active=author.is_active
-        )
-        
-        category_response = Category(
-            id=category.id,
-            name=category.name,
-            slug=category.slug,
-            description=category.description,
-            created_at=category.created_at
-        )
-        
-        response_articles.append(ArticleResponse(
-            id=article.id,
-            title=article.title,
-            subtitle=article.subtitle,
-            content=article.content,
-            author=author_response,
-            category=category_response,
-            tags=json_to_tags(article.tags),
-            featured_image=article.featured_image,
-            status=article.status,
-            published_at=article.published_at,
-            created_at=article.created_at,
-            updated_at=article.updated_at,
-            views=article.views,
-            slug=article.slug,
-            seo_title=article.seo_title,
-            seo_description=article.seo_description
-        ))
+    rows = result.scalars().all() if view == "full" else result.fetchall()
     
-    return response_articles
+    return await listing_response(db, rows, view, limit)
 
 
 @router.get("/tags", response_model=dict)
@@ -239,27 +233,26 @@ async def get_tags(
 ):
     """Get all tags from articles"""
     try:
-        result = await db.execute(select(ArticleTable.tags).where(ArticleTable.tags.isnot(None)))
-        tags_data = result.scalars().all()
-        
-        # Parse all tags and count them
-        all_tags = []
-        for tags_json in tags_data:
-            if tags_json:
-                tags_list = json_to_tags(tags_json)
-                all_tags.extend(tags_list)
-        
-        # Count tag frequencies
-        from collections import Counter
-        tag_counts = Counter(all_tags)
+        article_count = func.count(ArticleTagTable.article_id).label("count")
+        result = await db.execute(
+            select(TagTable.name, article_count)
+            .join(ArticleTagTable, ArticleTagTable.tag_id == TagTable.id)
+            .group_by(TagTable.id)
+            .order_by(article_count.desc(), TagTable.name)
+            .limit(50)
+        )
+        popular_tags = [{"name": name, "count": count} for name, count in result.all()]
         
-        # Return popular tags
-        popular_tags = [{"name": tag, "count": count} for tag, count in tag_counts.most_common(50)]
+        totals = await db.execute(
+            select(func.count(func.distinct(ArticleTagTable.tag_id)), func.count())
+            .select_from(ArticleTagTable)
+        )
+        total_unique_tags, total_tags = totals.one()
         
         return {
             "popular_tags": popular_tags,
-            "total_unique_tags": len(tag_counts),
-            "total_tags": len(all_tags)
+            "total_unique_tags": total_unique_tags,
+            "total_tags": total_tags
         }
     except Exception as e:
         return {
@@ -274,10 +267,60 @@ async def get_tags(
             "total_tags": 51
         }
 
+@router.get("/search", response_model=List[ArticleSearchResult])
+async def search_articles(
+    q: str = Query(..., min_length=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    status: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over articles, best matches first (public endpoint)"""
+    fts_query = search_index.to_fts_query(q)
+    if fts_query is None:
+        return ArticleJSONResponse([])
+    
+    query = summary_query().add_columns(
+        func.snippet(search_index.fts_column, -1, "<mark>", "</mark>", "…", 24).label("snippet"),
+        func.bm25(search_index.fts_column, *search_index.BM25_WEIGHTS).label("rank")
+    ).join(
+        search_index.fts_table,
+        search_index.fts_table.c.rowid == search_index.article_key
+    ).where(search_index.match(fts_query))
+    
+    if status:
+        try:
+            query = query.where(ArticleTable.status == ArticleStatus(status))
+        except ValueError:
+            # Invalid status, ignore
+            pass
+    
+    # bm25() is lower-is-better
+    query = query.order_by("rank").offset(skip).limit(limit)
+    
+    result = await db.execute(query)
+    return ArticleJSONResponse(await hydrate_rows(
+        db, result.fetchall(),
+        lambda row, author, category: {
+            **serializers.summary_to_dict(row, author, category),
+            "snippet": row.snippet,
+            "rank": row.rank
+        }
+    ))
+
+@router.get("/trending", response_model=List[TrendingArticle])
+async def get_trending_articles(limit: int = Query(10, ge=1, le=TRENDING_MAX_LIMIT)):
+    """Most-read published articles right now (public endpoint)
+
+    Served from the in-memory trending ranking without touching the
+    database; see trending.py.
+    """
+    return ArticleJSONResponse(trending_articles.top(limit))
+
 @router.get("/{article_id}", response_model=ArticleResponse)
 async def get_article(
     article_id: str,
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get single article by ID"""
@@ -299,55 +342,12 @@ async def get_article(
     if current_user.role != "admin" and article.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # Format response
-    author_profile = UserProfile(
-        name=author.name or "",
-        bio=author.bio,
-        avatar=author.avatar
-    )
-    
-    author_response = UserResponse(
-        id=author.id,
-        username=author.username,
-        email=author.email,
-        role=author.role,
-        profile=author_profile,
-        created_at=author.created_at,
-        last_login=author.last_login,
-        is_active=author.is_active
-    )
-    
-    category_response = Category(
-        id=category.id,
-        name=category.name,
-        slug=category.slug,
-        description=category.description,
-        created_at=category.created_at
-    )
-    
-    return ArticleResponse(
-        id=article.id,
-        title=article.title,
-        subtitle=article.subtitle,
-        content=article.content,
-        author=author_response,
-        category=category_response,
-        tags=json_to_tags(article.tags),
-        featured_image=article.featured_image,
-        status=article.status,
-        published_at=article.published_at,
-        created_at=article.created_at,
-        updated_at=article.updated_at,
-        views=article.views,
-        slug=article.slug,
-        seo_title=article.seo_title,
-        seo_description=article.seo_description
-    )
+    return ArticleJSONResponse(serializers.article_to_dict(article, author, category))
 
 @router.post("/", response_model=ArticleResponse)
 async def create_article(
     article_data: ArticleCreate,
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create new article"""
@@ -377,8 +377,8 @@ async def create_article(
         content=article_data.content,
         author_id=current_user.id,
         category_id=article_data.category_id,
-        tags=tags_to_json(article_data.tags),
-        featured_image=article_data.featured_image,
+        tags=tags_to_json(utils.normalize_tags(article_data.tags)),
+        featured_image=await run_in_threadpool(media.externalize_image, article_data.featured_image),
         status=article_data.status,
         slug=slug,
         seo_title=article_data.seo_title,
@@ -391,59 +391,21 @@ async def create_article(
         article.published_at = datetime.utcnow()
     
     db.add(article)
+    await db.flush()
+    await set_article_tags(db, article.id, article_data.tags)
     await db.commit()
     await db.refresh(article)
+    listing_cache.invalidate_article(article.id, state=article_state(article))
+    dashboard_snapshot.article_saved(article, created=True)
     
-    # Get author for response
-    author_profile = UserProfile(
-        name=current_user.name or "",
-        bio=current_user.bio,
-        avatar=current_user.avatar
-    )
-    
-    author_response = UserResponse(
-        id=current_user.id,
-        username=current_user.username,
-        email=current_user.email,
-        role=current_user.role,
-        profile=author_profile,
-        created_at=current_user.created_at,
-        last_login=current_user.last_login,
-        is_active=current_user.is_active
-    )
-    
-    category_response = Category(
-        id=category.id,
-        name=category.name,
-        slug=category.slug,
-        description=category.description,
-        created_at=category.created_at
-    )
-    
-    return ArticleResponse(
-        id=article.id,
-        title=article.title,
-        subtitle=article.subtitle,
-        content=article.content,
-        author=author_response,
-        category=category_response,
-        tags=json_to_tags(article.tags),
-        featured_image=article.featured_image,
-        status=article.status,
-        published_at=article.published_at,
-        created_at=article.created_at,
-        updated_at=article.updated_at,
-        views=article.views,
-        slug=article.slug,
-        seo_title=article.seo_title,
-        seo_description=article.seo_description
-    )
+    author = await db.get(UserTable, current_user.id)
+    return ArticleJSONResponse(serializers.article_to_dict(article, author, category))
 
 @router.put("/{article_id}", response_model=ArticleResponse)
 async def update_article(
     article_id: str,
     article_data: ArticleUpdate,
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update article"""
@@ -457,6 +419,8 @@ async def update_article(
     if current_user.role != "admin" and article.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    previous_status = article.status
+    
     # Update fields
     if article_data.title is not None:
         article.title = article_data.title
@@ -494,10 +458,13 @@ async def update_article(
         article.category_id = article_data.category_id
     
     if article_data.tags is not None:
-        article.tags = tags_to_json(article_data.tags)
+        article.tags = tags_to_json(utils.normalize_tags(article_data.tags))
+        await set_article_tags(db, article.id, article_data.tags)
     
     if article_data.featured_image is not None:
-        article.featured_image = article_data.featured_image
+        article.featured_image = await run_in_threadpool(
+            media.externalize_image, article_data.featured_image
+        )
     
     if article_data.status is not None:
         article.status = article_data.status
@@ -516,67 +483,39 @@ async def update_article(
     await db.commit()
     await db.refresh(article)
     
-    # Get author and category for response
-    result = await db.execute(
-        select(UserTable, CategoryTable).where(
-            UserTable.id == article.author_id,
-            CategoryTable.id == article.category_id
-        )
+    membership_changed = any(
+        value is not None
+        for value in (article_data.status, article_data.category_id, article_data.tags)
     )
-    row = result.first()
-    if not row:
-        raise HTTPException(status_code=500, detail="Article data incomplete")
-    
-    author, category = row
-    
-    author_profile = UserProfile(
-        name=author.name or "",
-        bio=author.bio,
-        avatar=author.avatar
-    )
-    
-    author_response = UserResponse(
-        id=author.id,
-        username=author.username,
-        email=author.email,
-        role=author.role,
-        profile=author_profile,
-        created_at=author.created_at,
-        last_login=author.last_login,
-        is_active=author.is_active
+    listing_cache.invalidate_article(
+        article.id,
+        state=article_state(article) if membership_changed else None,
+        text_changed=any(
+            value is not None
+            for value in (article_data.title, article_data.subtitle, article_data.content, article_data.tags)
+        )
     )
+    dashboard_snapshot.article_saved(article, previous_status)
+    if article.status == ArticleStatus.PUBLISHED:
+        trending_articles.refresh(article.id)
+    else:
+        trending_articles.discard(article.id)
     
-    category_response = Category(
-        id=category.id,
-        name=category.name,
-        slug=category.slug,
-        description=category.description,
-        created_at=category.created_at
+    # Get author and category for response
+    authors, categories = await hydration_cache.lookup(
+        db, author_ids=[article.author_id], category_ids=[article.category_id]
     )
+    author = authors.get(article.author_id)
+    category = categories.get(article.category_id)
+    if author is None or category is None:
+        raise HTTPException(status_code=500, detail="Article data incomplete")
     
-    return ArticleResponse(
-        id=article.id,
-        title=article.title,
-        subtitle=article.subtitle,
-        content=article.content,
-        author=author_response,
-        category=category_response,
-        tags=json_to_tags(article.tags),
-        featured_image=article.featured_image,
-        status=article.status,
-        published_at=article.published_at,
-        created_at=article.created_at,
-        updated_at=article.updated_at,
-        views=article.views,
-        slug=article.slug,
-        seo_title=article.seo_title,
-        seo_description=article.seo_description
-    )
+    return ArticleJSONResponse(serializers.hydrated_article_to_dict(article, author, category))
 
 @router.delete("/{article_id}")
 async def delete_article(
     article_id: str,
-    current_user: UserTable = Depends(require_editor_or_admin()),
+    current_user: Principal = Depends(require_editor_or_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete article"""
@@ -590,15 +529,19 @@ async def delete_article(
     if current_user.role != "admin" and article.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    await set_article_tags(db, article.id, [])
     await db.delete(article)
     await db.commit()
+    listing_cache.invalidate_article(article_id, removed=True)
+    dashboard_snapshot.article_deleted(article)
+    trending_articles.discard(article_id)
     
     return {"message": "Article deleted successfully"}
 
 @router.post("/{article_id}/publish")
 async def publish_article(
     article_id: str,
-    current_user: UserTable = Depends(require_editor_or_admin()),
+    current_user: Principal = Depends(require_editor_or_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Publish article"""
@@ -608,18 +551,22 @@ async def publish_article(
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
+    previous_status = article.status
     article.status = ArticleStatus.PUBLISHED
     article.published_at = datetime.utcnow()
     article.updated_at = datetime.utcnow()
     
     await db.commit()
+    listing_cache.invalidate_article(article_id, state=article_state(article))
+    dashboard_snapshot.article_saved(article, previous_status)
+    trending_articles.refresh(article_id)
     
     return {"message": "Article published successfully"}
 
 @router.post("/{article_id}/unpublish")
 async def unpublish_article(
     article_id: str,
-    current_user: UserTable = Depends(require_editor_or_admin()),
+    current_user: Principal = Depends(require_editor_or_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Unpublish article"""
@@ -629,9 +576,13 @@ async def unpublish_article(
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
+    previous_status = article.status
     article.status = ArticleStatus.DRAFT
     article.updated_at = datetime.utcnow()
     
     await db.commit()
+    listing_cache.invalidate_article(article_id, state=article_state(article))
+    dashboard_snapshot.article_saved(article, previous_status)
+    trending_articles.discard(article_id)
     
     return {"message": "Article unpublished successfully"}
\ No newline at end of file
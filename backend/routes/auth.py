@@ -1,19 +1,39 @@
 """
 Authentication routes for SQLite
 """
-from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import authenticate_user, create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import (
+    authenticate_user, create_session, get_current_active_user, optional_security, require_admin,
+    revoke_session, revoked_sessions, rotate_refresh_token, session_tokens, sessions_to_revoke, Principal
+)
 from database import get_db
-from models import Token, LoginRequest, UserTable, UserResponse, UserProfile
+from models import Token, LoginRequest, LogoutRequest, RefreshRequest, UserTable, UserResponse, UserProfile
+from passwords import password_hasher
+from rate_limit import login_rate_limiter
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 @router.post("/login", response_model=Token)
-async def login(login_request: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(login_request: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
     """Login endpoint"""
+    # Before the user lookup and the bcrypt check, which are what a flood costs
+    retry_after = await login_rate_limiter.check(
+        request.client.host if request.client else "", login_request.username
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
     user = await authenticate_user(login_request.username, login_request.password, db)
     if not user:
         raise HTTPException(
@@ -22,16 +42,31 @@ async def login(login_request: LoginRequest, db: AsyncSession = Depends(get_db))
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    user.last_login = user.last_seen = datetime.utcnow()
+    session_id, refresh_token = create_session(user, db)
+    await db.commit()
+    
+    return session_tokens(user, session_id, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(refresh_request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token (no password check)"""
+    user, session_id, refresh_token = await rotate_refresh_token(refresh_request.refresh_token, db)
+    await db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return session_tokens(user, session_id, refresh_token)
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: UserTable = Depends(get_current_active_user)):
+async def get_current_user_info(
+    principal: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Get current user information"""
+    result = await db.execute(select(UserTable).where(UserTable.id == principal.id))
+    current_user = result.scalar_one_or_none()
+    if current_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     profile = UserProfile(
         name=current_user.name or "",
         bio=current_user.bio,
@@ -46,10 +81,44 @@ async def get_current_user_info(current_user: UserTable = Depends(get_current_ac
         profile=profile,
         created_at=current_user.created_at,
         last_login=current_user.last_login,
+        last_seen=current_user.last_seen,
         is_active=current_user.is_active
     )
 
 @router.post("/logout")
-async def logout():
-    """Logout endpoint (client-side token removal)"""
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+async def logout(
+    logout_request: Optional[LogoutRequest] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+):
+    """Logout endpoint: revokes the session of the access and/or refresh token presented"""
+    session_ids = await sessions_to_revoke(
+        credentials.credentials if credentials else None,
+        logout_request.refresh_token if logout_request else None,
+        db
+    )
+    for session_id in session_ids:
+        await revoke_session(session_id, db)
+    await db.commit()
+    return {"message": "Successfully logged out"}
+
+@router.get("/password-hashing/stats")
+async def get_password_hashing_stats(
+    current_user: Principal = Depends(require_admin())
+):
+    """Concurrency and queueing counters of the password hashing pool (admin only)"""
+    return password_hasher.stats()
+
+@router.get("/rate-limit/stats")
+async def get_login_rate_limit_stats(
+    current_user: Principal = Depends(require_admin())
+):
+    """Login rate limiter counters and bucket store size (admin only)"""
+    return login_rate_limiter.stats()
+
+@router.get("/revocation/stats")
+async def get_revocation_stats(
+    current_user: Principal = Depends(require_admin())
+):
+    """Revoked-session filter size and hit counters (admin only)"""
+    return revoked_sessions.stats()
@@ -7,9 +7,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import get_current_active_user, require_admin
+from auth import get_current_active_user, require_admin, Principal
 from database import get_db
-from models import CategoryTable, Category, CategoryCreate, CategoryUpdate, UserTable
+from hydration import hydration_cache
+from models import CategoryTable, Category, CategoryCreate, CategoryUpdate
 import utils
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
@@ -50,7 +51,7 @@ async def get_categories_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     search: Optional[str] = Query(None),
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get categories with pagination and filtering (admin with auth)"""
@@ -78,7 +79,7 @@ async def get_categories_admin(
     ]
 async def get_category(
     category_id: str,
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get single category by ID"""
@@ -93,7 +94,7 @@ async def get_category(
 @router.post("/", response_model=Category)
 async def create_category(
     category_data: CategoryCreate,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Create new category"""
@@ -119,6 +120,7 @@ async def create_category(
     
     db.add(category)
     await db.commit()
+    hydration_cache.invalidate()
     await db.refresh(category)
     
     return Category.from_orm(category)
@@ -127,7 +129,7 @@ async def create_category(
 async def update_category(
     category_id: str,
     category_data: CategoryUpdate,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Update category"""
@@ -164,6 +166,7 @@ async def update_category(
         category.description = category_data.description
     
     await db.commit()
+    hydration_cache.invalidate()
     await db.refresh(category)
     
     return Category.from_orm(category)
@@ -171,7 +174,7 @@ async def update_category(
 @router.delete("/{category_id}")
 async def delete_category(
     category_id: str,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete category"""
@@ -185,5 +188,6 @@ async def delete_category(
     
     await db.delete(category)
     await db.commit()
+    hydration_cache.invalidate()
     
     return {"message": "Category deleted successfully"}
\ No newline at end of file
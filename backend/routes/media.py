@@ -0,0 +1,126 @@
+"""
+Media upload and streaming routes
+"""
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from PIL import Image, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from auth import get_current_active_user, Principal
+import media
+
+router = APIRouter(prefix="/api/media", tags=["media"])
+
+# Stored files are content-addressed, so they never change under a name
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.post("/upload")
+async def upload_media(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Upload an image and return its permanent URL
+
+    Responsive derivatives are rendered in the background after the response.
+    """
+    content_type = (file.content_type or "").lower()
+    if content_type not in media.CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail="Unsupported media type")
+
+    data = await file.read(media.MAX_UPLOAD_BYTES + 1)
+    if len(data) > media.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty file")
+    # The declared type is the client's claim; the bytes must agree with it
+    if media.sniff_content_type(data) != content_type:
+        raise HTTPException(status_code=415, detail="File content does not match its media type")
+
+    name = await run_in_threadpool(media.store_bytes, data, content_type)
+    background_tasks.add_task(media.generate_derivatives, name)
+
+    url = media.media_url(name)
+    return {
+        "name": name,
+        "url": url,
+        "size": len(data),
+        "content_type": content_type,
+        "variants": media.derivative_urls(url)
+    }
+
+@router.get("/{name}")
+async def get_media(name: str, request: Request):
+    """Stream a stored file with Range support and immutable caching"""
+    if not media.is_media_name(name):
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    return file_response(request, media.media_path(name), name, media.content_type_for(name))
+
+@router.get("/{name}/{variant}")
+async def get_media_derivative(name: str, variant: str, request: Request):
+    """Stream a resized WebP/JPEG derivative, rendering it on first request"""
+    size, _, fmt = variant.partition(".")
+    if (
+        not media.is_media_name(name)
+        or size not in media.DERIVATIVE_WIDTHS
+        or fmt not in media.DERIVATIVE_FORMATS
+    ):
+        raise HTTPException(status_code=404, detail="Media not found")
+    if not media.media_path(name).exists():
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    try:
+        path = await media.ensure_derivative(name, size, fmt)
+    except BrokenProcessPool:
+        # A worker died mid-render; media.ensure_derivative starts a new pool
+        raise HTTPException(status_code=503, detail="Image rendering unavailable, retry shortly")
+    except (Image.DecompressionBombError, UnidentifiedImageError, OSError, ValueError):
+        # Pillow raises these for formats, files or dimensions it will not decode
+        raise HTTPException(status_code=415, detail="Cannot render this image")
+    
+    _, content_type = media.DERIVATIVE_FORMATS[fmt]
+    return file_response(request, path, f"{name}/{variant}", content_type)
+
+def file_response(request: Request, path: Path, etag: str, content_type: str) -> Response:
+    """Stream ``path`` honouring If-None-Match and single byte ranges"""
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": f'"{etag}"',
+        "Accept-Ranges": "bytes",
+        # Browsers must not reinterpret an upload as HTML or script
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and size:
+        try:
+            byte_range = media.parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        media.iter_file(path, start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
@@ -6,9 +6,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from auth import get_current_active_user, require_admin
+from auth import get_current_active_user, require_admin, Principal
 from database import get_db
-from models import UserTable
 
 router = APIRouter(prefix="/api/seo", tags=["seo"])
 
@@ -46,7 +45,7 @@ class SEOUpdate(BaseModel):
 
 @router.get("/settings", response_model=SEOSettings)
 async def get_seo_settings(
-    current_user: UserTable = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get current SEO settings"""
@@ -55,7 +54,7 @@ async def get_seo_settings(
 @router.put("/settings", response_model=SEOSettings)
 async def update_seo_settings(
     updates: SEOUpdate,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Update SEO settings"""
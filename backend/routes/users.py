@@ -6,10 +6,13 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from auth import get_current_active_user, require_admin, get_password_hash
+from auth import get_current_active_user, require_admin, hash_password, invalidate_principal, Principal
 from database import get_db
+from hydration import hydration_cache
 from models import UserTable, UserCreate, UserUpdate, UserResponse, UserRole, UserProfile
+import media
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
@@ -19,7 +22,7 @@ async def get_users(
     limit: int = Query(20, ge=1, le=100),
     role: Optional[UserRole] = None,
     search: Optional[str] = None,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Get users with pagination and filtering"""
@@ -57,6 +60,7 @@ async def get_users(
             profile=profile,
             created_at=user.created_at,
             last_login=user.last_login,
+            last_seen=user.last_seen,
             is_active=user.is_active
         ))
     
@@ -65,7 +69,7 @@ async def get_users(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Get single user by ID"""
@@ -89,13 +93,14 @@ async def get_user(
         profile=profile,
         created_at=user.created_at,
         last_login=user.last_login,
+        last_seen=user.last_seen,
         is_active=user.is_active
     )
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user_data: UserCreate,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Create new user"""
@@ -118,16 +123,17 @@ async def create_user(
     user = UserTable(
         username=user_data.username,
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await hash_password(user_data.password),
         role=user_data.role,
         name=user_data.profile.name,
         bio=user_data.profile.bio,
-        avatar=user_data.profile.avatar,
+        avatar=await run_in_threadpool(media.externalize_image, user_data.profile.avatar),
         is_active=True
     )
     
     db.add(user)
     await db.commit()
+    hydration_cache.invalidate()
     await db.refresh(user)
     
     profile = UserProfile(
@@ -144,6 +150,7 @@ async def create_user(
         profile=profile,
         created_at=user.created_at,
         last_login=user.last_login,
+        last_seen=user.last_seen,
         is_active=user.is_active
     )
 
@@ -151,7 +158,7 @@ async def create_user(
 async def update_user(
     user_id: str,
     user_data: UserUpdate,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user"""
@@ -187,17 +194,23 @@ async def update_user(
         user.email = user_data.email
     
     if user_data.role is not None:
+        if user_data.role != user.role:
+            user.token_version = (user.token_version or 0) + 1
         user.role = user_data.role
     
     if user_data.profile is not None:
         user.name = user_data.profile.name
         user.bio = user_data.profile.bio
-        user.avatar = user_data.profile.avatar
+        user.avatar = await run_in_threadpool(media.externalize_image, user_data.profile.avatar)
     
     if user_data.is_active is not None:
+        if user_data.is_active != user.is_active:
+            user.token_version = (user.token_version or 0) + 1
         user.is_active = user_data.is_active
     
     await db.commit()
+    hydration_cache.invalidate()
+    invalidate_principal(user_id)
     await db.refresh(user)
     
     profile = UserProfile(
@@ -214,13 +227,14 @@ async def update_user(
         profile=profile,
         created_at=user.created_at,
         last_login=user.last_login,
+        last_seen=user.last_seen,
         is_active=user.is_active
     )
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
-    current_user: UserTable = Depends(require_admin()),
+    current_user: Principal = Depends(require_admin()),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete user"""
@@ -236,5 +250,7 @@ async def delete_user(
     
     await db.delete(user)
     await db.commit()
+    hydration_cache.invalidate()
+    invalidate_principal(user_id)
     
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+SQLite FTS5 full-text search index for articles
+"""
+import re
+from typing import Optional
+from sqlalchemy import column, literal_column, select, table
+
+FTS_TABLE = "articles_fts"
+
+# External-content FTS5 index over articles; triggers keep it in sync so the
+# index never needs to be rebuilt by application code. It is keyed on
+# articles.search_rowid rather than the implicit rowid, which VACUUM may
+# renumber because the articles primary key is a string; the insert trigger
+# hands out the next key.
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, subtitle, content, tags,
+        content='articles', content_rowid='search_rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON articles BEGIN
+        UPDATE articles SET search_rowid = (SELECT coalesce(max(search_rowid), 0) + 1 FROM articles)
+        WHERE rowid = new.rowid AND search_rowid IS NULL;
+        INSERT INTO {FTS_TABLE}(rowid, title, subtitle, content, tags)
+        SELECT search_rowid, title, subtitle, content, tags FROM articles WHERE rowid = new.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, subtitle, content, tags)
+        VALUES ('delete', old.search_rowid, old.title, old.subtitle, old.content, old.tags);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, subtitle, content, tags ON articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, subtitle, content, tags)
+        VALUES ('delete', old.search_rowid, old.title, old.subtitle, old.content, old.tags);
+        INSERT INTO {FTS_TABLE}(rowid, title, subtitle, content, tags)
+        VALUES (new.search_rowid, new.title, new.subtitle, new.content, new.tags);
+    END""",
+]
+
+# bm25 column weights: title, subtitle, content, tags
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+fts_table = table(FTS_TABLE, column("rowid"))
+fts_column = literal_column(FTS_TABLE)
+article_key = literal_column("articles.search_rowid")
+
+def create_search_index(connection):
+    """Create the FTS5 index and triggers (sync, for run_sync); backfill on first run"""
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first()
+    for statement in FTS_SCHEMA:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        print("✅ Full-text search index built")
+
+def drop_search_index(connection):
+    """Drop the FTS5 index and its triggers (sync, for run_sync)"""
+    for suffix in ("ai", "ad", "au"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+def to_fts_query(search: str) -> Optional[str]:
+    """Turn free user input into a safe FTS5 query (all terms, last one as prefix)"""
+    terms = re.findall(r'\w+', search or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def match(fts_query: str):
+    """FTS5 MATCH expression against the articles index"""
+    return fts_column.op("MATCH")(fts_query)
+
+def match_condition(search: str):
+    """WHERE condition restricting articles to full-text matches of ``search``"""
+    fts_query = to_fts_query(search)
+    if fts_query is None:
+        return None
+    return article_key.in_(select(fts_table.c.rowid).where(match(fts_query)))
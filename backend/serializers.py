@@ -0,0 +1,116 @@
+"""
+Fast article serialization
+
+Article routes build plain dicts in the shape of the response models and
+return them through ArticleJSONResponse. FastAPI does not re-validate a
+returned Response, so every object is built exactly once and encoded by
+orjson; the response_model on each route still documents the shape.
+"""
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import case, func, select
+
+from models import ArticleTable
+import media
+import utils
+
+# Leading characters of the body fetched to build a listing excerpt
+EXCERPT_SOURCE_LENGTH = 400
+
+def summary_query():
+    """Column-level select for ArticleSummary listings (skips body and inline images)
+
+    Author and category fields are hydrated from memory, so no joins.
+    """
+    return select(
+        ArticleTable.id,
+        ArticleTable.slug,
+        ArticleTable.title,
+        ArticleTable.subtitle,
+        func.coalesce(
+            ArticleTable.seo_description,
+            func.substr(ArticleTable.content, 1, EXCERPT_SOURCE_LENGTH)
+        ).label("excerpt"),
+        ArticleTable.author_id,
+        ArticleTable.category_id,
+        ArticleTable.published_at,
+        ArticleTable.created_at,
+        ArticleTable.views,
+        # Inline base64 images are not URLs; never ship them in listings
+        case(
+            (ArticleTable.featured_image.like("data:%"), None),
+            else_=ArticleTable.featured_image
+        ).label("image_url"),
+    )
+
+class ArticleJSONResponse(ORJSONResponse):
+    """orjson-encoded response for pre-serialized article payloads"""
+
+def user_to_dict(user) -> dict:
+    """UserResponse-shaped dict from a UserTable row"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "role": user.role,
+        "profile": {
+            "name": user.name or "",
+            "bio": user.bio,
+            "avatar": user.avatar,
+        },
+        "created_at": user.created_at,
+        "last_login": user.last_login,
+        "last_seen": user.last_seen,
+        "is_active": user.is_active,
+    }
+
+def category_to_dict(category) -> dict:
+    """Category-shaped dict from a CategoryTable row"""
+    return {
+        "id": category.id,
+        "name": category.name,
+        "slug": category.slug,
+        "description": category.description,
+        "created_at": category.created_at,
+    }
+
+def article_to_dict(article, author, category) -> dict:
+    """ArticleResponse-shaped dict from article, author and category rows"""
+    return hydrated_article_to_dict(article, user_to_dict(author), category_to_dict(category))
+
+def hydrated_article_to_dict(article, author: dict, category: dict) -> dict:
+    """ArticleResponse-shaped dict from an article row and pre-built author/category dicts"""
+    return {
+        "id": article.id,
+        "title": article.title,
+        "subtitle": article.subtitle,
+        "content": article.content,
+        "author": author,
+        "category": category,
+        "tags": utils.json_to_tags(article.tags),
+        "featured_image": article.featured_image,
+        "status": article.status,
+        "published_at": article.published_at,
+        "created_at": article.created_at,
+        "updated_at": article.updated_at,
+        "views": article.views,
+        "slug": article.slug,
+        "seo_title": article.seo_title,
+        "seo_description": article.seo_description,
+    }
+
+def summary_to_dict(row, author: dict, category: dict) -> dict:
+    """ArticleSummary-shaped dict from a summary_query() row and hydrated author/category"""
+    return {
+        "id": row.id,
+        "slug": row.slug,
+        "title": row.title,
+        "subtitle": row.subtitle,
+        "excerpt": utils.make_excerpt(row.excerpt),
+        "category_name": category["name"],
+        "category_slug": category["slug"],
+        "author_name": author["profile"]["name"] or author["username"],
+        "published_at": row.published_at,
+        "views": row.views or 0,
+        "image_url": row.image_url,
+        "image_variants": media.derivative_urls(row.image_url),
+    }
@@ -0,0 +1,103 @@
+"""
+Hash-sharded analytics storage
+
+Rollups (see rollups) and traffic rows (see traffic) live in
+ANALYTICS_SHARDS SQLite files of their own instead of the main database.
+An article's rows go to shard ``crc32(article_id) % ANALYTICS_SHARDS``, and
+each shard keeps the site-wide rows for its own articles. Every shard has
+its own engine and so its own writer lock: view flushes commit to the
+shards in parallel and never hold the lock editors need to save articles.
+
+Reads for one article go to that article's shard. Site-wide reads fan out
+to every shard concurrently (``fan_out``) and the caller merges the
+results; views add up, and visitor sketches union, so merged figures equal
+what a single database would return.
+"""
+import asyncio
+import os
+import zlib
+from typing import Dict, List, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from models import (
+    AnalyticsHourlyTable, AnalyticsMonthlyTable, AnalyticsTable, AnalyticsTrafficTable, Base,
+    ReferrerDomainTable, SiteDailyTable, SiteHourlyTable, SiteMonthlyTable, UserAgentFamilyTable
+)
+import hyperloglog
+
+ANALYTICS_SHARDS = int(os.getenv("ANALYTICS_SHARDS", "4"))
+# ``{shard}`` is replaced by the shard number
+ANALYTICS_SHARD_URL = os.getenv("ANALYTICS_SHARD_URL", "sqlite+aiosqlite:///./analytics_{shard}.db")
+
+# Site-wide rows that predate sharding belong to no article; they are kept here
+SITE_SHARD = 0
+
+SHARDED_MODELS = (
+    AnalyticsHourlyTable, AnalyticsTable, AnalyticsMonthlyTable,
+    SiteHourlyTable, SiteDailyTable, SiteMonthlyTable,
+    ReferrerDomainTable, UserAgentFamilyTable, AnalyticsTrafficTable,
+)
+SHARDED_TABLES = [model.__table__ for model in SHARDED_MODELS]
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+def shard_url(shard: int) -> str:
+    return ANALYTICS_SHARD_URL.format(shard=shard)
+
+def _create_engine(url: str) -> AsyncEngine:
+    shard_engine = create_async_engine(url, future=True)
+    event.listen(shard_engine.sync_engine, "connect", _register_sql_functions)
+    return shard_engine
+
+def _register_sql_functions(dbapi_connection, connection_record):
+    hyperloglog.register_sqlite_functions(dbapi_connection)
+
+engines: List[AsyncEngine] = [_create_engine(shard_url(shard)) for shard in range(ANALYTICS_SHARDS)]
+
+def shard_of(article_id: str) -> int:
+    """Shard holding an article's rows (stable across processes and restarts)"""
+    return zlib.crc32(article_id.encode()) % ANALYTICS_SHARDS
+
+def engines_for(article_id: Optional[str] = None) -> List[AsyncEngine]:
+    """The article's shard, or every shard for site-wide reads"""
+    if article_id is None:
+        return engines
+    return [engines[shard_of(article_id)]]
+
+def partition(items: Dict[K, V], article_id_of=lambda key: key[0]) -> Dict[int, Dict[K, V]]:
+    """Split a dict keyed by article (``article_id_of(key)``) by shard"""
+    parts: Dict[int, Dict[K, V]] = {}
+    for key, value in items.items():
+        parts.setdefault(shard_of(article_id_of(key)), {})[key] = value
+    return parts
+
+async def _rows(shard_engine: AsyncEngine, query) -> list:
+    async with shard_engine.connect() as conn:
+        result = await conn.execute(query)
+        return result.all()
+
+async def fan_out(query, article_id: Optional[str] = None) -> List[list]:
+    """Rows of ``query`` from each shard it concerns, read concurrently"""
+    return await asyncio.gather(*(_rows(shard_engine, query) for shard_engine in engines_for(article_id)))
+
+async def read(query, article_id: Optional[str] = None) -> list:
+    """Rows of ``query`` from the article's shard, or from all shards concatenated"""
+    return [row for rows in await fan_out(query, article_id) for row in rows]
+
+def create_schema(connection):
+    """Create the sharded tables (sync, for ``AsyncConnection.run_sync``)"""
+    Base.metadata.create_all(connection, tables=SHARDED_TABLES)
+
+async def init_shards():
+    """Create every shard's tables"""
+    for shard_engine in engines:
+        async with shard_engine.begin() as conn:
+            await conn.run_sync(create_schema)
+
+def sync_engine(shard: int):
+    """Blocking engine on one shard file, for migrations"""
+    return create_engine(make_url(shard_url(shard)).set(drivername="sqlite"))
@@ -0,0 +1,246 @@
+"""
+Referrer and user-agent dimensions for analytics
+
+Views are also counted per (article, UTC day, referrer domain, user-agent
+family) in analytics_traffic. Domains and families are interned in the
+referrer_domains and user_agent_families tables, so each value is stored
+once and traffic rows carry two small integer keys. User-agent parsing is
+LRU-cached, and each interned value's id is cached after its first lookup.
+
+Like the rollups, these tables live in the analytics shards (see shards).
+Every shard interns its own values, so ids differ between shards and
+site-wide results are merged by value (``merge_views``).
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import DateTime, bindparam, delete, func, insert, select, text
+
+from cache import TTLCache
+from models import AnalyticsTrafficTable, ReferrerDomainTable, UserAgentFamilyTable
+
+# Longest user-agent prefix classified; also bounds the parse cache's memory
+MAX_USER_AGENT_LENGTH = 512
+USER_AGENT_CACHE_SIZE = 4096
+# Interned ids kept in memory per dimension
+DIMENSION_CACHE_SIZE = 20000
+DIMENSION_CACHE_TTL_SECONDS = 24 * 3600.0
+
+DIRECT = ""
+
+class UserAgentFamily(NamedTuple):
+    browser: str
+    os: str
+    device: str
+    is_bot: bool
+
+BOT = UserAgentFamily("Bot", "Other", "bot", True)
+UNKNOWN = UserAgentFamily("Other", "Other", "other", False)
+
+_BOT_PATTERN = re.compile(
+    r"bot|crawl|spider|slurp|facebookexternalhit|embedly|preview|headless"
+    r"|curl|wget|python-|httpx|go-http|okhttp|java/",
+    re.IGNORECASE
+)
+# First match wins: Edge, Opera and Samsung Internet also claim Chrome and Safari
+_BROWSERS = (
+    ("Edge", re.compile(r"Edg(e|A|iOS)?/")),
+    ("Opera", re.compile(r"OPR/|Opera")),
+    ("Samsung Internet", re.compile(r"SamsungBrowser/")),
+    ("Firefox", re.compile(r"Firefox/|FxiOS/")),
+    ("Chrome", re.compile(r"Chrome/|CriOS/")),
+    ("Safari", re.compile(r"Version/[\d.]+.*Safari/")),
+    ("Internet Explorer", re.compile(r"MSIE |Trident/")),
+)
+_OPERATING_SYSTEMS = (
+    ("Windows", re.compile(r"Windows")),
+    ("Android", re.compile(r"Android")),
+    ("iOS", re.compile(r"iPhone|iPad|iPod")),
+    ("macOS", re.compile(r"Macintosh|Mac OS X")),
+    ("ChromeOS", re.compile(r"CrOS")),
+    ("Linux", re.compile(r"Linux")),
+)
+_TABLET = re.compile(r"iPad|Tablet|Android(?!.*Mobile)")
+_MOBILE = re.compile(r"Mobi|iPhone|iPod|Android")
+
+_SEARCH_ENGINES = {"google", "bing", "duckduckgo", "yahoo", "yandex", "baidu", "ecosia", "qwant"}
+_SOCIAL_NETWORKS = {
+    "facebook", "twitter", "linkedin", "reddit", "instagram", "youtube",
+    "pinterest", "tiktok", "threads", "mastodon", "bsky", "telegram"
+}
+_SOCIAL_DOMAINS = {"t.co", "x.com", "lnkd.in", "t.me"}
+
+def _first_match(patterns, user_agent: str) -> str:
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return "Other"
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def _classify(user_agent: str) -> UserAgentFamily:
+    if not user_agent:
+        return UNKNOWN
+    if _BOT_PATTERN.search(user_agent):
+        return BOT
+    if _TABLET.search(user_agent):
+        device = "tablet"
+    elif _MOBILE.search(user_agent):
+        device = "mobile"
+    else:
+        device = "desktop"
+    return UserAgentFamily(
+        _first_match(_BROWSERS, user_agent), _first_match(_OPERATING_SYSTEMS, user_agent), device, False
+    )
+
+def classify_user_agent(user_agent: Optional[str]) -> UserAgentFamily:
+    """Browser, OS, device class and bot flag of a User-Agent header"""
+    return _classify((user_agent or "")[:MAX_USER_AGENT_LENGTH])
+
+def referrer_domain(referrer: Optional[str]) -> str:
+    """Host of a referrer URL without ``www.``; DIRECT when there is none"""
+    if not referrer:
+        return DIRECT
+    try:
+        host = urlsplit(referrer.strip()).hostname or DIRECT
+    except ValueError:
+        return DIRECT
+    host = host.rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+def source_kind(domain: str) -> str:
+    """Dashboard traffic source of a referrer domain"""
+    if domain == DIRECT:
+        return "Direct"
+    labels = set(domain.split("."))
+    if labels & _SEARCH_ENGINES:
+        return "Search"
+    if domain in _SOCIAL_DOMAINS or labels & _SOCIAL_NETWORKS:
+        return "Social Media"
+    return "Referrals"
+
+class Dimension:
+    """Cached ids of one interned dimension table, per shard"""
+
+    def __init__(self, model, columns: Tuple[str, ...]):
+        self.table = model.__table__
+        self.columns = columns
+        self._ids = TTLCache(DIMENSION_CACHE_SIZE, DIMENSION_CACHE_TTL_SECONDS)
+
+    async def ids(self, conn, keys: Iterable[tuple], shard: int) -> Dict[tuple, int]:
+        """Ids of ``keys`` in ``shard``, inserting values not stored yet
+
+        Run in a transaction of its own: ids are cached as soon as they are
+        read, so they must not come from a transaction that may roll back.
+        """
+        found = {}
+        missing = set()
+        for key in set(keys):
+            key_id = self._ids.get((shard, key))
+            if key_id is None:
+                missing.add(key)
+            else:
+                found[key] = key_id
+        if not missing:
+            return found
+        await conn.execute(
+            insert(self.table).prefix_with("OR IGNORE"),
+            [dict(zip(self.columns, key)) for key in missing]
+        )
+        first_column = self.table.c[self.columns[0]]
+        result = await conn.execute(
+            select(self.table.c.id, *(self.table.c[column] for column in self.columns))
+            .where(first_column.in_({key[0] for key in missing}))
+        )
+        for key_id, *values in result.all():
+            key = tuple(values)
+            if key in missing:
+                self._ids.set((shard, key), key_id)
+                found[key] = key_id
+        return found
+
+referrer_domains = Dimension(ReferrerDomainTable, ("domain",))
+user_agent_families = Dimension(UserAgentFamilyTable, UserAgentFamily._fields)
+
+TrafficKey = Tuple[str, datetime, str, UserAgentFamily]
+
+# Shards have no articles table: callers drop unknown article ids first
+UPSERT_TRAFFIC = text(
+    "INSERT INTO analytics_traffic (article_id, date, referrer_id, user_agent_id, views) "
+    "VALUES (:article_id, :day, :referrer_id, :user_agent_id, :views) "
+    "ON CONFLICT (article_id, date, referrer_id, user_agent_id) DO UPDATE SET "
+    "views = analytics_traffic.views + excluded.views"
+).bindparams(bindparam("day", type_=DateTime()))
+
+async def intern(conn, traffic: Dict[TrafficKey, int], shard: int) -> Tuple[Dict[tuple, int], Dict[tuple, int]]:
+    """Referrer and user-agent ids for a traffic batch in one shard (see Dimension.ids)"""
+    domains = await referrer_domains.ids(conn, ((domain,) for _, _, domain, _ in traffic), shard)
+    families = await user_agent_families.ids(conn, (family for _, _, _, family in traffic), shard)
+    return domains, families
+
+async def write_traffic(conn, traffic: Dict[TrafficKey, int], dimension_ids):
+    """Add buffered views keyed by (article_id, day, domain, family) to analytics_traffic"""
+    if not traffic:
+        return
+    domains, families = dimension_ids
+    await conn.execute(UPSERT_TRAFFIC, [
+        {
+            "article_id": article_id,
+            "day": day,
+            "referrer_id": domains[(domain,)],
+            "user_agent_id": families[family],
+            "views": views,
+        }
+        for (article_id, day, domain, family), views in traffic.items()
+    ])
+
+async def compact_traffic(conn, cutoff: datetime) -> int:
+    """Expire traffic rows older than ``cutoff``; returns rows removed"""
+    result = await conn.execute(delete(AnalyticsTrafficTable).where(AnalyticsTrafficTable.date < cutoff))
+    return result.rowcount
+
+def _in_range(query, start: datetime, end: datetime, article_id: Optional[str]):
+    query = query.where(AnalyticsTrafficTable.date >= start, AnalyticsTrafficTable.date < end)
+    if article_id is not None:
+        query = query.where(AnalyticsTrafficTable.article_id == article_id)
+    return query
+
+def referrers_query(start: datetime, end: datetime, article_id: str = None):
+    """(domain, views) in [start, end), most views first, site-wide or for one article"""
+    views = func.sum(AnalyticsTrafficTable.views).label("views")
+    query = (
+        select(ReferrerDomainTable.domain, views)
+        .join(ReferrerDomainTable, ReferrerDomainTable.id == AnalyticsTrafficTable.referrer_id)
+        .group_by(AnalyticsTrafficTable.referrer_id)
+        .order_by(views.desc())
+    )
+    return _in_range(query, start, end, article_id)
+
+def devices_query(start: datetime, end: datetime, article_id: str = None):
+    """(device, views) in [start, end), most views first, site-wide or for one article"""
+    views = func.sum(AnalyticsTrafficTable.views).label("views")
+    query = (
+        select(UserAgentFamilyTable.device, views)
+        .join(UserAgentFamilyTable, UserAgentFamilyTable.id == AnalyticsTrafficTable.user_agent_id)
+        .group_by(UserAgentFamilyTable.device)
+        .order_by(views.desc())
+    )
+    return _in_range(query, start, end, article_id)
+
+def merge_views(rows) -> List[Tuple[str, int]]:
+    """Sum (value, views) rows from several shards, most views first"""
+    totals: Dict[str, int] = {}
+    for value, views in rows:
+        totals[value] = totals.get(value, 0) + views
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+def source_breakdown(views_by_kind: Dict[str, int]) -> list:
+    """Dashboard ``traffic_sources`` entries, largest first"""
+    total = sum(views_by_kind.values())
+    return [
+        {"source": kind, "percentage": round(100 * views / total, 1), "visits": views}
+        for kind, views in sorted(views_by_kind.items(), key=lambda item: -item[1])
+        if views
+    ]
@@ -0,0 +1,219 @@
+"""
+Trending articles ranked by exponentially decayed view counts
+
+Each view adds weight ``exp(λ·t)`` to its article's score, with
+λ = ln 2 / TRENDING_HALF_LIFE_SECONDS, so a view counts half as much after
+every half-life. Scores are kept as logarithms (log-sum-exp), which makes
+them comparable across time without rescaling: the ranking only changes
+when a view arrives, and an article's decayed view count right now is
+``exp(score - λ·now)``.
+
+Views are counted from the view counter's flushes (see view_buffer), which
+only carry ids that matched an article, so ids a client makes up never
+enter the ranking or push real articles out of it.
+
+At most TRENDING_CAPACITY articles are tracked; a min-heap of (score, id)
+finds the one to evict. ``GET /api/articles/trending`` serves a cached
+ranking of ArticleSummary dicts and never touches the database. A
+background sync task loads summaries for the leading articles (dropping
+ids that are not published) and checkpoints scores to trending_scores, so
+a restart resumes the ranking.
+"""
+import heapq
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from background import PeriodicTask
+from database import AsyncSessionLocal, engine
+from hydration import hydration_cache
+from models import ArticleStatus, ArticleTable, TrendingScoreTable
+from view_buffer import view_counter
+import rollups
+import serializers
+
+TRENDING_HALF_LIFE_SECONDS = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", "21600"))
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "1000"))
+# Summaries are reloaded and scores checkpointed this often
+TRENDING_SYNC_SECONDS = float(os.getenv("TRENDING_SYNC_SECONDS", "60"))
+# Longest feed served; summaries are kept for twice as many leading articles
+TRENDING_MAX_LIMIT = 50
+# How often the cached ranking is recomputed
+TRENDING_REFRESH_SECONDS = 1.0
+# Articles whose decayed view count falls below this are forgotten at checkpoint
+TRENDING_MIN_WEIGHT = 0.01
+
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflow"""
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+class TrendingRanking:
+    """Bounded, exponentially decayed view scores with a cached top list"""
+
+    def __init__(self, capacity: int = TRENDING_CAPACITY, half_life: float = TRENDING_HALF_LIFE_SECONDS):
+        self.capacity = capacity
+        self.decay = math.log(2) / half_life
+        self._scores: Dict[str, float] = {}
+        # Min-heap with stale entries; an entry is live while it matches _scores
+        self._heap: List[Tuple[float, str]] = []
+        self._summaries: Dict[str, dict] = {}
+        self._ranking: Optional[List[dict]] = None
+        self._ranked_at = 0.0
+        self._changed = False
+        self._checkpointed_at = time.monotonic()
+        self._task = PeriodicTask("trending-sync", TRENDING_SYNC_SECONDS, self.sync)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def record(self, article_id: str, timestamp: float = None, views: int = 1):
+        """Count ``views`` views of an article (O(log n), no I/O)"""
+        weight = self.decay * (timestamp if timestamp is not None else time.time()) + math.log(views)
+        current = self._scores.get(article_id)
+        score = weight if current is None else _log_add(current, weight)
+        self._set(article_id, score)
+        if len(self._scores) > self.capacity:
+            self._evict()
+        self._changed = True
+
+    def views_flushed(self, batch: Dict[tuple, rollups.RollupCounters], site_sketches, sources):
+        """ViewCounter listener: count the views of a committed flush"""
+        # Flushes run every few seconds, so flush time stands in for view time
+        now = time.time()
+        for (article_id, _), counters in batch.items():
+            if counters.views:
+                self.record(article_id, now, counters.views)
+
+    def _set(self, article_id: str, score: float):
+        self._scores[article_id] = score
+        heapq.heappush(self._heap, (score, article_id))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(score, article_id) for article_id, score in self._scores.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self):
+        while self._heap:
+            score, article_id = heapq.heappop(self._heap)
+            if self._scores.get(article_id) == score:
+                self.discard(article_id)
+                return
+
+    def discard(self, article_id: str):
+        """Stop ranking an article (unpublished or deleted)"""
+        if self._scores.pop(article_id, None) is not None:
+            self._changed = True
+        if self._summaries.pop(article_id, None) is not None:
+            self._ranking = None
+
+    def refresh(self, article_id: str):
+        """Reload an edited article's summary on the next sync"""
+        if self._summaries.pop(article_id, None) is not None:
+            self._ranking = None
+            self._task.wake()
+
+    def current_weight(self, score: float, now: float = None) -> float:
+        return math.exp(score - self.decay * (now if now is not None else time.time()))
+
+    def leaders(self, count: int) -> List[str]:
+        """Ids of the ``count`` highest-scoring articles"""
+        return heapq.nlargest(count, self._scores, key=self._scores.__getitem__)
+
+    def top(self, limit: int) -> List[dict]:
+        """TrendingArticle dicts for the ``limit`` leading published articles"""
+        now = time.monotonic()
+        if self._ranking is None or now - self._ranked_at >= TRENDING_REFRESH_SECONDS:
+            self._ranking = self._rank()
+            self._ranked_at = now
+        return self._ranking[:limit]
+
+    def _rank(self) -> List[dict]:
+        wall_clock = time.time()
+        ranking = []
+        missing = False
+        for article_id in self.leaders(2 * TRENDING_MAX_LIMIT):
+            summary = self._summaries.get(article_id)
+            if summary is None:
+                missing = True
+                continue
+            score = round(self.current_weight(self._scores[article_id], wall_clock), 3)
+            ranking.append({**summary, "score": score})
+            if len(ranking) == TRENDING_MAX_LIMIT:
+                break
+        if missing:
+            self._task.wake()
+        return ranking
+
+    async def sync(self):
+        """Load summaries for the leading articles, then checkpoint scores"""
+        leaders = self.leaders(2 * TRENDING_MAX_LIMIT)
+        if leaders:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    serializers.summary_query().where(
+                        ArticleTable.id.in_(leaders),
+                        ArticleTable.status == ArticleStatus.PUBLISHED
+                    )
+                )
+                rows = result.fetchall()
+                authors, categories = await hydration_cache.lookup(
+                    db,
+                    author_ids={row.author_id for row in rows},
+                    category_ids={row.category_id for row in rows}
+                )
+            summaries = {
+                row.id: serializers.summary_to_dict(row, authors[row.author_id], categories[row.category_id])
+                for row in rows
+                if row.author_id in authors and row.category_id in categories
+            }
+            for article_id in leaders:
+                if article_id not in summaries:
+                    self.discard(article_id)
+            self._summaries = summaries
+            self._ranking = None
+        # Woken early for missing summaries: leave checkpoints to the interval
+        if time.monotonic() - self._checkpointed_at >= TRENDING_SYNC_SECONDS:
+            await self.checkpoint()
+
+    async def checkpoint(self):
+        """Persist scores, forgetting articles that have decayed away"""
+        self._checkpointed_at = time.monotonic()
+        if not self._changed:
+            return
+        floor = math.log(TRENDING_MIN_WEIGHT) + self.decay * time.time()
+        for article_id in [article_id for article_id, score in self._scores.items() if score < floor]:
+            self.discard(article_id)
+        self._changed = False
+        rows = [{"article_id": article_id, "score": score} for article_id, score in self._scores.items()]
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(delete(TrendingScoreTable))
+                if rows:
+                    await conn.execute(insert(TrendingScoreTable), rows)
+        except BaseException:
+            self._changed = True
+            raise
+
+    async def restore(self):
+        """Load the last checkpoint (call once at startup, before start())"""
+        async with engine.connect() as conn:
+            result = await conn.execute(select(TrendingScoreTable.article_id, TrendingScoreTable.score))
+            for article_id, score in result.all():
+                if article_id not in self._scores:
+                    self._set(article_id, score)
+        while len(self._scores) > self.capacity:
+            self._evict()
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        """Stop the sync loop and write a final checkpoint"""
+        await self._task.stop()
+        await self.checkpoint()
+
+trending_articles = TrendingRanking()
+view_counter.add_listener(trending_articles.views_flushed)
@@ -2,6 +2,7 @@
 Utility functions for SQLite
 """
 import re
+import base64
 from typing import Optional
 from datetime import datetime
 import json
@@ -13,6 +14,21 @@ def create_slug(title: str) -> str:
     slug = re.sub(r'[-\s]+', '-', slug)
     return slug.strip('-')
 
+def make_excerpt(text: Optional[str], max_length: int = 200) -> Optional[str]:
+    """Create a plain-text excerpt from (possibly HTML) article text"""
+    if not text:
+        return None
+    plain = re.sub(r'<[^>]*>', ' ', text)
+    plain = re.sub(r'\s+', ' ', plain).strip()
+    if len(plain) <= max_length:
+        return plain
+    return plain[:max_length].rsplit(' ', 1)[0] + '…'
+
+def format_duration(seconds: float) -> str:
+    """m:ss display form used by the admin charts"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
 def paginate_results(skip: int, limit: int, max_limit: int = 100) -> tuple:
     """Validate and return pagination parameters"""
     if skip < 0:
@@ -21,6 +37,20 @@ def paginate_results(skip: int, limit: int, max_limit: int = 100) -> tuple:
         limit = max_limit
     return skip, limit
 
+def encode_cursor(created_at: datetime, item_id: str) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor"""
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor into (created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(item_id)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
 def tags_to_json(tags_list):
     """Convert list of tags to JSON string"""
     if not tags_list:
@@ -36,6 +66,15 @@ def json_to_tags(tags_json):
     except:
         return []
 
+def normalize_tags(tags_list):
+    """Strip, drop empty and de-duplicate tag names, keeping order"""
+    seen = []
+    for tag in tags_list or []:
+        name = tag.strip() if isinstance(tag, str) else ""
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
 def get_date_range(start_date: Optional[str], end_date: Optional[str]) -> tuple:
     """Parse and validate date range"""
     start = None
@@ -0,0 +1,260 @@
+"""
+Write-behind buffer for article view counts
+
+Page views, engaged time and scroll depth are counted in memory per
+(article, UTC hour) and written by a background task as one
+``UPDATE articles SET views = views + ?`` per article in the main database,
+plus hourly, daily and monthly rollup upserts (see rollups) and per-source
+traffic upserts (see traffic) in each analytics shard (see shards). The
+main database and the shards are written concurrently, one transaction
+each. A failed write is retried by the next flush on its own: counters
+whose shard write failed are held apart from new views, so the retry never
+adds their views to the article totals a second time. Visitors are folded
+into per-hour HyperLogLog sketches as they arrive.
+Readers never wait on SQLite's single writer lock and no increment is lost
+to a read-modify-write race. Counts not yet flushed are lost only if the
+process dies without running the lifespan shutdown.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+
+from background import PeriodicTask
+from database import engine
+from hyperloglog import HyperLogLog, hash_item
+from models import ArticleTable
+import rollups
+import shards
+import traffic
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "5"))
+ROLLUP_COMPACTION_INTERVAL_SECONDS = float(os.getenv("ROLLUP_COMPACTION_INTERVAL_SECONDS", "3600"))
+# Flush early once this many (article, hour) counters are waiting
+MAX_PENDING_COUNTERS = 10000
+
+INCREMENT_VIEWS = (
+    update(ArticleTable)
+    .where(ArticleTable.id == bindparam("article_id"))
+    .values(views=func.coalesce(ArticleTable.views, 0) + bindparam("increment"))
+)
+
+def _merge(batch, site_sketches, sources, more_batch, more_sketches, more_sources):
+    """Fold ``more_*`` counters into ``batch``, ``site_sketches`` and ``sources``"""
+    for key, counters in more_batch.items():
+        if key in batch:
+            counters.merge(batch[key])
+        batch[key] = counters
+    for key, sketch in more_sketches.items():
+        if key in site_sketches:
+            sketch.merge(site_sketches[key])
+        site_sketches[key] = sketch
+    for source, views in more_sources.items():
+        sources[source] = sources.get(source, 0) + views
+
+class ViewCounter:
+    """In-memory per-(article, hour) counters, flushed in batches"""
+
+    def __init__(self, interval: float = VIEW_FLUSH_INTERVAL_SECONDS):
+        self._pending: Dict[Tuple[str, datetime], rollups.RollupCounters] = {}
+        # Site-wide visitors per (shard, hour): each shard's site rows cover its own articles
+        self._site_sketches: Dict[Tuple[int, datetime], HyperLogLog] = {}
+        self._traffic: Dict[traffic.TrafficKey, int] = {}
+        # Article view totals whose write to the main database failed
+        self._unwritten_totals: Dict[str, int] = {}
+        # Shard parts whose write failed; their views are already in the totals
+        self._unwritten_rollups: Dict[Tuple[str, datetime], rollups.RollupCounters] = {}
+        self._unwritten_site_sketches: Dict[Tuple[int, datetime], HyperLogLog] = {}
+        self._unwritten_traffic: Dict[traffic.TrafficKey, int] = {}
+        self._listeners: List[Callable] = []
+        self._task = PeriodicTask("view-counter-flush", interval, self.flush)
+
+    def add_listener(self, listener: Callable):
+        """Call ``listener(batch, site_sketches, traffic)`` with the shards each flush committed"""
+        self._listeners.append(listener)
+
+    def _counters(self, article_id: str, hour: datetime) -> rollups.RollupCounters:
+        key = (article_id, hour)
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = rollups.RollupCounters()
+            if len(self._pending) >= MAX_PENDING_COUNTERS:
+                self._task.wake()
+        return counters
+
+    def record(
+        self,
+        article_id: str,
+        count: int = 1,
+        when: datetime = None,
+        visitor: str = None,
+        referrer: str = None,
+        user_agent: str = None
+    ):
+        """Count ``count`` views of an article by ``visitor`` (O(1), no I/O)"""
+        hour = rollups.hour_start(when or datetime.utcnow())
+        counters = self._counters(article_id, hour)
+        counters.views += count
+        source = (
+            article_id, rollups.day_start(hour),
+            traffic.referrer_domain(referrer), traffic.classify_user_agent(user_agent)
+        )
+        self._traffic[source] = self._traffic.get(source, 0) + count
+        if visitor:
+            hashed = hash_item(visitor)
+            counters.add_visitor(hashed)
+            site_key = (shards.shard_of(article_id), hour)
+            site_sketch = self._site_sketches.get(site_key)
+            if site_sketch is None:
+                site_sketch = self._site_sketches[site_key] = HyperLogLog(rollups.SITE_SKETCH_PRECISION)
+            site_sketch.add_hash(hashed)
+
+    def record_engagement(self, article_id: str, seconds: int, when: datetime = None):
+        """Add engaged reading time to an article's hourly total"""
+        hour = rollups.hour_start(when or datetime.utcnow())
+        self._counters(article_id, hour).engaged_seconds += seconds
+
+    def record_scroll(self, article_id: str, depth: int, when: datetime = None):
+        """Add one page view's maximum scroll depth (percent)"""
+        counters = self._counters(article_id, rollups.hour_start(when or datetime.utcnow()))
+        counters.scroll_depth_sum += depth
+        counters.scroll_samples += 1
+
+    def _requeue(self, batch, site_sketches, sources):
+        """Put counters nothing was written for back so the next flush retries them"""
+        _merge(self._pending, self._site_sketches, self._traffic, batch, site_sketches, sources)
+
+    async def _known_articles(self, article_ids) -> set:
+        if not article_ids:
+            return set()
+        async with engine.connect() as conn:
+            result = await conn.execute(select(ArticleTable.id).where(ArticleTable.id.in_(article_ids)))
+            return set(result.scalars())
+
+    async def _write_totals(self, totals: Dict[str, int]):
+        if not totals:
+            return
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(INCREMENT_VIEWS, [
+                    {"article_id": article_id, "increment": count}
+                    for article_id, count in totals.items()
+                ])
+        except BaseException:
+            for article_id, count in totals.items():
+                self._unwritten_totals[article_id] = self._unwritten_totals.get(article_id, 0) + count
+            raise
+
+    async def _write_shard(self, shard: int, batch, site_sketches: Dict[datetime, HyperLogLog], sources):
+        shard_engine = shards.engines[shard]
+        try:
+            if sources:
+                async with shard_engine.begin() as conn:
+                    dimension_ids = await traffic.intern(conn, sources, shard)
+            async with shard_engine.begin() as conn:
+                await rollups.write_rollups(conn, batch, site_sketches)
+                if sources:
+                    await traffic.write_traffic(conn, sources, dimension_ids)
+        except BaseException:
+            # Keep the counters for the next attempt (also on cancellation),
+            # apart from new views: the totals write covered these
+            _merge(
+                self._unwritten_rollups, self._unwritten_site_sketches, self._unwritten_traffic,
+                batch, {(shard, hour): sketch for hour, sketch in site_sketches.items()}, sources
+            )
+            raise
+
+    async def flush(self):
+        """Write article totals to the main database and rollups to every shard, concurrently
+
+        Each write is its own transaction; one that fails is retried by the
+        next flush without repeating the others. Retried shard parts are
+        written to their shard only, never added to the totals again.
+        """
+        if not (self._pending or self._unwritten_totals or self._unwritten_rollups):
+            return
+        batch, self._pending = self._pending, {}
+        site_sketches, self._site_sketches = self._site_sketches, {}
+        sources, self._traffic = self._traffic, {}
+        try:
+            known = await self._known_articles({article_id for article_id, _ in batch})
+        except BaseException:
+            self._requeue(batch, site_sketches, sources)
+            raise
+        # Shards cannot check ids against articles, so unknown ones are dropped here
+        batch = {key: counters for key, counters in batch.items() if key[0] in known}
+        sources = {key: views for key, views in sources.items() if key[0] in known}
+
+        totals, self._unwritten_totals = self._unwritten_totals, {}
+        for (article_id, _), counters in batch.items():
+            if counters.views:
+                totals[article_id] = totals.get(article_id, 0) + counters.views
+        # Shard parts retried from an earlier flush; their views are in the totals already
+        _merge(
+            batch, site_sketches, sources,
+            self._unwritten_rollups, self._unwritten_site_sketches, self._unwritten_traffic
+        )
+        self._unwritten_rollups, self._unwritten_site_sketches, self._unwritten_traffic = {}, {}, {}
+        shard_sketches: Dict[int, Dict[datetime, HyperLogLog]] = {}
+        for (shard, hour), sketch in site_sketches.items():
+            shard_sketches.setdefault(shard, {})[hour] = sketch
+        shard_batches = shards.partition(batch)
+        shard_sources = shards.partition(sources)
+        writes = [(None, self._write_totals(totals))] + [
+            (shard, self._write_shard(
+                shard, shard_batch, shard_sketches.get(shard, {}), shard_sources.get(shard, {})
+            ))
+            for shard, shard_batch in shard_batches.items()
+        ]
+        results = await asyncio.gather(*(write for _, write in writes), return_exceptions=True)
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        flushed_batch = {}
+        flushed_sketches: Dict[datetime, HyperLogLog] = {}
+        flushed_sources = {}
+        for (shard, _), result in zip(writes, results):
+            if shard is None or isinstance(result, BaseException):
+                continue
+            flushed_batch.update(shard_batches[shard])
+            flushed_sources.update(shard_sources.get(shard, {}))
+            for hour, sketch in shard_sketches.get(shard, {}).items():
+                if hour in flushed_sketches:
+                    flushed_sketches[hour].merge(sketch)
+                else:
+                    flushed_sketches[hour] = sketch
+        logger.debug("Flushed analytics for %d articles", len(totals))
+        if flushed_batch:
+            for listener in self._listeners:
+                try:
+                    listener(flushed_batch, flushed_sketches, flushed_sources)
+                except Exception:
+                    logger.exception("View flush listener failed")
+        if errors:
+            raise errors[0]
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        await self._task.stop()
+
+async def _compact_shard(shard_engine) -> int:
+    async with shard_engine.begin() as conn:
+        removed = await rollups.compact_rollups(conn)
+        removed += await traffic.compact_traffic(conn, rollups.retained_since(rollups.DAILY))
+    return removed
+
+async def compact_rollups():
+    """Expire rollup buckets that have aged out of their tier, in every shard"""
+    removed = sum(await asyncio.gather(*(_compact_shard(shard_engine) for shard_engine in shards.engines)))
+    if removed:
+        logger.info("Expired %d rollup rows", removed)
+
+view_counter = ViewCounter()
+rollup_compaction = PeriodicTask("rollup-compaction", ROLLUP_COMPACTION_INTERVAL_SECONDS, compact_rollups)
@@ -1,6 +1,11 @@
-import React from 'react';
+import React, { useEffect } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { ArticleContent, RelatedArticles, SocialShare, ArticleMeta } from './components';
+import OptimizedImage from './components/OptimizedImage';
+import { flush, trackHeartbeat, trackScrollDepth, trackView } from './utils/beacon';
+
+// Reading time is reported in slices of this length while the tab is visible
+const HEARTBEAT_MS = 15000;
 
 // Mock article data
 const mockArticleData = {
@@ -93,6 +98,36 @@ function ArticlePage() {
     subtitle: `Це шаблон статті з ID: ${id}`
   };
 
+  // First-party analytics: view, reading time and scroll depth, batched to /api/analytics/collect
+  useEffect(() => {
+    trackView(id);
+    let maxDepth = 0;
+    let depthSent = false;
+    const onScroll = () => {
+      const scrollable = document.documentElement.scrollHeight - window.innerHeight;
+      maxDepth = Math.max(maxDepth, scrollable > 0 ? (window.scrollY / scrollable) * 100 : 100);
+    };
+    // Once per page view, when the reader leaves the article or the page
+    const sendDepth = () => {
+      if (!depthSent) {
+        depthSent = true;
+        trackScrollDepth(id, maxDepth);
+        flush();
+      }
+    };
+    const heartbeat = setInterval(() => {
+      if (document.visibilityState === 'visible') trackHeartbeat(id, HEARTBEAT_MS / 1000);
+    }, HEARTBEAT_MS);
+    window.addEventListener('scroll', onScroll, { passive: true });
+    window.addEventListener('pagehide', sendDepth);
+    return () => {
+      clearInterval(heartbeat);
+      window.removeEventListener('scroll', onScroll);
+      window.removeEventListener('pagehide', sendDepth);
+      sendDepth();
+    };
+  }, [id]);
+
   return (
     <div className="bg-white">
       {/* Breadcrumb */}
@@ -111,10 +146,12 @@ function ArticlePage() {
       {/* Article Header */}
       <div className="relative bg-black text-white overflow-hidden">
         <div className="absolute inset-0">
-          <img
+          <OptimizedImage
             src={article.image}
             alt="Article background"
-            className="w-full h-full object-cover opacity-70"
+            className="w-full h-full opacity-70"
+            priority
+            placeholder={false}
           />
           <div className="absolute inset-0 bg-gradient-to-r from-black/80 to-transparent"></div>
         </div>
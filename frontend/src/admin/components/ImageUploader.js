@@ -1,6 +1,7 @@
 import React, { useCallback, useState } from 'react';
 import { useDropzone } from 'react-dropzone';
 import { v4 as uuidv4 } from 'uuid';
+import { mediaAPI } from '../services/api';
 
 const ImageUploader = ({ onImageUpload, accept = 'image/*', maxSize = 5242880 }) => {
   const [uploading, setUploading] = useState(false);
@@ -11,22 +12,16 @@ const ImageUploader = ({ onImageUpload, accept = 'image/*', maxSize = 5242880 })
     
     try {
       const uploadPromises = acceptedFiles.map(async (file) => {
-        // Convert to base64 for demo - in production, upload to server
-        return new Promise((resolve) => {
-          const reader = new FileReader();
-          reader.onload = () => {
-            const imageData = {
-              id: uuidv4(),
-              name: file.name,
-              size: file.size,
-              type: file.type,
-              url: reader.result,
-              uploadedAt: new Date().toISOString()
-            };
-            resolve(imageData);
-          };
-          reader.readAsDataURL(file);
-        });
+        // Upload to the media store; rows keep only the returned URL
+        const result = await mediaAPI.upload(file);
+        return {
+          id: uuidv4(),
+          name: file.name,
+          size: result.size,
+          type: result.content_type,
+          url: `${process.env.REACT_APP_BACKEND_URL}${result.url}`,
+          uploadedAt: new Date().toISOString()
+        };
       });
 
       const images = await Promise.all(uploadPromises);
@@ -53,6 +53,7 @@ export const AuthProvider = ({ children }) => {
           });
         } catch (error) {
           localStorage.removeItem('admin_token');
+          localStorage.removeItem('admin_refresh_token');
           dispatch({ type: 'LOGOUT' });
         }
       } else {
@@ -68,9 +69,10 @@ export const AuthProvider = ({ children }) => {
     dispatch({ type: 'LOGIN_START' });
     try {
       const response = await authAPI.login(credentials);
-      const { access_token } = response;
+      const { access_token, refresh_token } = response;
       
       localStorage.setItem('admin_token', access_token);
+      localStorage.setItem('admin_refresh_token', refresh_token);
       
       // Get user info
       const user = await authAPI.getCurrentUser();
@@ -90,7 +92,10 @@ export const AuthProvider = ({ children }) => {
 
   // Logout function
   const logout = () => {
+    // Best effort: the tokens are dropped locally either way
+    authAPI.logout().catch(() => {});
     localStorage.removeItem('admin_token');
+    localStorage.removeItem('admin_refresh_token');
     dispatch({ type: 'LOGOUT' });
   };
 
@@ -20,12 +20,45 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// One refresh at a time: a refresh token works once, so concurrent 401s share it
+let refreshing = null;
+
+const refreshAccessToken = () => {
+  if (!refreshing) {
+    const refreshToken = localStorage.getItem('admin_refresh_token');
+    refreshing = (refreshToken
+      ? axios.post(`${BASE_URL}/auth/refresh`, { refresh_token: refreshToken }).then(({ data }) => {
+          localStorage.setItem('admin_token', data.access_token);
+          localStorage.setItem('admin_refresh_token', data.refresh_token);
+          return data.access_token;
+        })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
 // Response interceptor for error handling
 api.interceptors.response.use(
   (response) => response.data,
-  (error) => {
-    if (error.response?.status === 401) {
+  async (error) => {
+    const { config, response } = error;
+    if (response?.status === 401) {
+      // An expired access token is renewed without logging in again
+      if (config && !config._retried && config.url !== '/auth/login') {
+        try {
+          const token = await refreshAccessToken();
+          config._retried = true;
+          config.headers.Authorization = `Bearer ${token}`;
+          return api(config);
+        } catch (refreshError) {
+          // Fall through to the login page
+        }
+      }
       localStorage.removeItem('admin_token');
+      localStorage.removeItem('admin_refresh_token');
       window.location.href = '/admin/login';
     }
     return Promise.reject(error);
@@ -36,13 +69,15 @@ api.interceptors.response.use(
 export const authAPI = {
   login: (credentials) => api.post('/auth/login', credentials),
   getCurrentUser: () => api.get('/auth/me'),
-  logout: () => api.post('/auth/logout'),
+  // Revokes the session server-side, so its tokens stop working everywhere
+  logout: () => api.post('/auth/logout', { refresh_token: localStorage.getItem('admin_refresh_token') }),
 };
 
 // Articles API
 export const articlesAPI = {
   // Public Articles API (no auth needed)
   getPublicArticles: (params = {}) => api.get('/articles/', { params }),
+  getPublicArticleSummaries: (params = {}) => api.get('/articles/', { params: { ...params, view: 'summary' } }),
   // Admin Articles API (with auth)
   getArticles: (params = {}) => api.get('/articles/admin', { params }),
   getArticle: (id) => api.get(`/articles/${id}`),
@@ -71,6 +106,15 @@ export const categoriesAPI = {
   deleteCategory: (id) => api.delete(`/categories/${id}`),
 };
 
+// Media API
+export const mediaAPI = {
+  upload: (file) => {
+    const form = new FormData();
+    form.append('file', file);
+    return api.post('/media/upload', form, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
+};
+
 // Analytics API
 export const analyticsAPI = {
   getDashboardStats: () => api.get('/analytics/dashboard'),
@@ -14,8 +14,16 @@ const OptimizedImage = ({
   const [isInView, setIsInView] = useState(priority);
   const imgRef = useRef();
 
+  // Server-side derivatives of media store images (see /api/media/{name}/{size}.{fmt})
+  const isMediaStoreUrl = (originalSrc) => Boolean(originalSrc && originalSrc.includes('/api/media/'));
+  const MEDIA_DERIVATIVES = [[320, 'thumb'], [640, 'card'], [1280, 'hero']];
+
   // Generate responsive image URLs
   const generateResponsiveUrl = (originalSrc, targetWidth) => {
+    if (isMediaStoreUrl(originalSrc)) {
+      const match = MEDIA_DERIVATIVES.find(([w]) => w >= targetWidth) || MEDIA_DERIVATIVES[MEDIA_DERIVATIVES.length - 1];
+      return `${originalSrc}/${match[1]}.webp`;
+    }
     if (!originalSrc || !originalSrc.includes('unsplash.com')) {
       return originalSrc;
     }
@@ -37,7 +45,9 @@ const OptimizedImage = ({
 
   // Generate srcset for responsive images
   const generateSrcSet = (originalSrc) => {
-    const widths = [400, 800, 1200, 1600];
+    const widths = isMediaStoreUrl(originalSrc)
+      ? MEDIA_DERIVATIVES.map(([w]) => w)
+      : [400, 800, 1200, 1600];
     return widths
       .map(w => `${generateResponsiveUrl(originalSrc, w)} ${w}w`)
       .join(', ');
@@ -0,0 +1,71 @@
+// Batched first-party analytics: events are queued in memory and sent to
+// /api/analytics/collect in one request, via navigator.sendBeacon when the
+// page is hidden so nothing is lost on navigation.
+
+const COLLECT_URL = `${process.env.REACT_APP_BACKEND_URL || ''}/api/analytics/collect`;
+const MAX_BATCH = 100;
+const FLUSH_INTERVAL_MS = 10000;
+const VISITOR_KEY = 'sdn_visitor_id';
+
+let queue = [];
+let timer = null;
+
+const visitorId = () => {
+  try {
+    let id = window.localStorage.getItem(VISITOR_KEY);
+    if (!id) {
+      id = (window.crypto && window.crypto.randomUUID)
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      window.localStorage.setItem(VISITOR_KEY, id);
+    }
+    return id;
+  } catch (e) {
+    return undefined;
+  }
+};
+
+export const flush = () => {
+  if (timer) {
+    clearTimeout(timer);
+    timer = null;
+  }
+  while (queue.length) {
+    const body = JSON.stringify(queue.splice(0, MAX_BATCH));
+    // A string body is sent as text/plain, which needs no CORS preflight
+    const sent = navigator.sendBeacon && navigator.sendBeacon(COLLECT_URL, body);
+    if (!sent) {
+      fetch(COLLECT_URL, { method: 'POST', body, keepalive: true }).catch(() => {});
+    }
+  }
+};
+
+const enqueue = (event) => {
+  queue.push({ ...event, visitor_id: visitorId() });
+  if (queue.length >= MAX_BATCH) {
+    flush();
+  } else if (!timer) {
+    timer = setTimeout(flush, FLUSH_INTERVAL_MS);
+  }
+};
+
+// document.referrer is the page that led to this visit (empty for direct traffic)
+export const trackView = (articleId) => enqueue({
+  type: 'view',
+  article_id: articleId,
+  referrer: (typeof document !== 'undefined' && document.referrer) || undefined,
+});
+
+export const trackHeartbeat = (articleId, seconds) =>
+  enqueue({ type: 'heartbeat', article_id: articleId, seconds: Math.min(Math.round(seconds), 300) });
+
+// Send once per page view with the deepest point reached
+export const trackScrollDepth = (articleId, depth) =>
+  enqueue({ type: 'scroll', article_id: articleId, depth: Math.max(0, Math.min(Math.round(depth), 100)) });
+
+if (typeof document !== 'undefined') {
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flush();
+  });
+  window.addEventListener('pagehide', flush);
+}
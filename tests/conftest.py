@@ -0,0 +1,58 @@
+"""
+Shared pytest setup: make the backend modules importable, and a scratch database
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Async engine on a fresh SQLite file with every table created
+
+    No connection pool, so tests may drive it from several ``asyncio.run``
+    calls (each has its own event loop).
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from models import Base
+
+    path = tmp_path / "test.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+    return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+@pytest.fixture
+def db_sessions(db_engine):
+    """``async with db_sessions() as db`` sessions on ``db_engine``"""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+@pytest.fixture
+def analytics_shards(tmp_path, monkeypatch):
+    """Fresh analytics shard files in place of shards.engines"""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    import shards
+
+    engines = []
+    for shard in range(shards.ANALYTICS_SHARDS):
+        path = tmp_path / f"analytics_{shard}.db"
+        sync_engine = create_engine(f"sqlite:///{path}")
+        with sync_engine.begin() as conn:
+            shards.create_schema(conn)
+        sync_engine.dispose()
+        shard_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        event.listen(shard_engine.sync_engine, "connect", shards._register_sql_functions)
+        engines.append(shard_engine)
+    monkeypatch.setattr(shards, "engines", engines)
+    return engines
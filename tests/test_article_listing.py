@@ -0,0 +1,97 @@
+"""
+Public article listing endpoint: keyset paging and the summary view
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from database import get_db
+from hydration import hydration_cache
+from listing_cache import listing_cache
+from models import ArticleStatus, ArticleSummary, ArticleTable, CategoryTable, UserRole, UserTable
+from routes.articles import router
+
+ARTICLES = 25
+
+@pytest.fixture
+def client(db_engine, db_sessions):
+    async def seed():
+        async with db_engine.begin() as conn:
+            await conn.execute(insert(UserTable), {
+                "id": "user-1", "username": "editor", "email": "e@example.com",
+                "password_hash": "-", "role": UserRole.EDITOR, "name": "Ed Itor",
+            })
+            await conn.execute(insert(CategoryTable), {"id": "cat-1", "name": "Space", "slug": "space"})
+            # Five articles share each timestamp, so paging must break ties by id
+            await conn.execute(insert(ArticleTable), [
+                {
+                    "id": f"article-{n:02d}", "title": f"Article {n}", "slug": f"article-{n:02d}",
+                    "content": f"Body of article {n} " * 20, "author_id": "user-1",
+                    "category_id": "cat-1", "status": ArticleStatus.PUBLISHED, "views": n,
+                    "created_at": datetime(2025, 1, 1) + timedelta(hours=n // 5),
+                }
+                for n in range(ARTICLES)
+            ])
+
+    async def session():
+        async with db_sessions() as db:
+            yield db
+
+    asyncio.run(seed())
+    listing_cache.clear()
+    hydration_cache.invalidate()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = session
+    yield TestClient(app)
+    listing_cache.clear()
+    hydration_cache.invalidate()
+
+def test_full_page_returns_a_next_cursor(client):
+    full = client.get("/api/articles/", params={"limit": 10})
+    last = client.get("/api/articles/", params={"limit": ARTICLES + 1})
+
+    assert full.status_code == 200
+    assert len(full.json()) == 10
+    assert full.headers["x-next-cursor"]
+    assert "x-next-cursor" not in last.headers
+
+@pytest.mark.parametrize("view", ["full", "summary"])
+def test_following_cursors_visits_every_article_once(client, view):
+    seen = []
+    params = {"limit": 7, "view": view}
+    while True:
+        response = client.get("/api/articles/", params=params)
+        assert response.status_code == 200
+        seen.extend(article["id"] for article in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+
+    assert len(seen) == ARTICLES
+    # Newest first; ties on created_at in descending id order
+    assert seen == [f"article-{n:02d}" for n in reversed(range(ARTICLES))]
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "!!!", "eyJub3QiOiAiYSBjdXJzb3IifQ"])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get("/api/articles/", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+def test_summary_view_carries_listing_fields_without_content(client):
+    response = client.get("/api/articles/", params={"view": "summary", "limit": 1})
+
+    summary, = response.json()
+    assert set(summary) == set(ArticleSummary.model_fields)
+    assert "content" not in summary
+    assert summary["id"] == "article-24"
+    assert (summary["category_name"], summary["category_slug"]) == ("Space", "space")
+    assert summary["author_name"] == "Ed Itor"
+    assert summary["excerpt"].startswith("Body of article 24")
+    assert summary["views"] == 24
@@ -0,0 +1,33 @@
+"""
+Bloom filter membership
+"""
+import uuid
+
+from bloom import BloomFilter
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [str(uuid.uuid4()) for _ in range(1000)]
+
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert len(bloom) == 1000
+
+def test_false_positive_rate_stays_near_target_at_capacity():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for n in range(5000):
+        bloom.add(f"revoked-{n}")
+
+    false_positives = sum(f"live-{n}" in bloom for n in range(20000))
+
+    assert false_positives / 20000 < 0.02
+
+def test_size_follows_capacity_and_error_rate():
+    bloom = BloomFilter(capacity=10000, error_rate=0.001)
+
+    # About 1.44 * log2(1000) bits per item, and ln(2) * bits / items hashes
+    assert 143000 < bloom.size < 145000
+    assert bloom.hashes == 10
+    assert len(bloom.bits) == (bloom.size + 7) // 8
@@ -0,0 +1,94 @@
+"""
+Beacon batch collection: validation, backpressure and draining
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from collector import EVENT_BATCH, MAX_BEACON_BYTES, EventCollector
+from routes import analytics as analytics_routes
+from view_buffer import ViewCounter
+
+BATCH = [
+    {"type": "view", "article_id": "article-1", "visitor_id": "v-1", "referrer": "https://news.example.com/"},
+    {"type": "heartbeat", "article_id": "article-1", "seconds": 15},
+    {"type": "scroll", "article_id": "article-1", "depth": 80},
+]
+
+@pytest.fixture
+def collector(monkeypatch):
+    collector = EventCollector(ViewCounter(), maxsize=1)
+    monkeypatch.setattr(analytics_routes, "event_collector", collector)
+    return collector
+
+@pytest.fixture
+def client(collector):
+    app = FastAPI()
+    app.include_router(analytics_routes.router)
+    return TestClient(app)
+
+def pending(collector: EventCollector) -> dict:
+    return {article_id: counters for (article_id, _), counters in collector.counter._pending.items()}
+
+def test_text_plain_batch_is_accepted(client, collector):
+    response = client.post(
+        "/api/analytics/collect", content=json.dumps(BATCH), headers={"Content-Type": "text/plain"}
+    )
+
+    assert response.status_code == 204
+    counters = pending(collector)["article-1"]
+    assert (counters.views, counters.engaged_seconds, counters.scroll_depth_sum) == (1, 15, 80)
+    assert collector.stats()["accepted"] == 3
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"[]",
+    json.dumps([{"type": "view"}]).encode(),
+    json.dumps([{"type": "scroll", "article_id": "article-1", "depth": 101}]).encode(),
+    json.dumps([{"type": "click", "article_id": "article-1"}]).encode(),
+])
+def test_malformed_batch_is_rejected(client, collector, body):
+    response = client.post("/api/analytics/collect", content=body, headers={"Content-Type": "text/plain"})
+
+    assert response.status_code == 422
+    assert pending(collector) == {}
+
+def test_oversized_batch_is_rejected(client, collector):
+    body = json.dumps([{**BATCH[0], "referrer": "x" * MAX_BEACON_BYTES}])
+
+    response = client.post("/api/analytics/collect", content=body, headers={"Content-Type": "text/plain"})
+
+    assert response.status_code == 413
+    assert pending(collector) == {}
+
+def test_full_queue_is_rejected(client, collector):
+    # The writer is running but has fallen behind
+    collector._queue = asyncio.Queue(collector.maxsize)
+    collector._queue.put_nowait(([], "visitor", datetime.utcnow(), None))
+
+    response = client.post("/api/analytics/collect", content=json.dumps(BATCH))
+
+    assert response.status_code == 503
+    assert collector.stats() == {"accepted": 0, "dropped": 3, "queued": 1}
+
+def test_stop_drains_queued_batches_into_the_counter():
+    collector = EventCollector(ViewCounter(), maxsize=10)
+    events = EVENT_BATCH.validate_python(BATCH)
+
+    async def scenario():
+        collector.start()
+        # Queued, but the writer gets no turn before stop()
+        for _ in range(2):
+            assert collector.submit(events, "visitor", datetime(2025, 1, 1, 12), "Mozilla/5.0")
+        assert collector.stats()["queued"] == 2
+        await collector.stop()
+
+    asyncio.run(scenario())
+
+    counters = pending(collector)["article-1"]
+    assert (counters.views, counters.engaged_seconds, counters.scroll_samples) == (2, 30, 2)
+    assert collector.stats()["queued"] == 0
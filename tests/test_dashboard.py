@@ -0,0 +1,47 @@
+"""
+Dashboard snapshot rebuilds and incremental updates
+"""
+import asyncio
+from types import SimpleNamespace
+
+from dashboard import DashboardSnapshot
+from models import ArticleStatus
+import shards
+
+def article(article_id: str, status=ArticleStatus.PUBLISHED):
+    return SimpleNamespace(id=article_id, status=status, views=0, title=article_id, published_at=None)
+
+def test_update_during_a_rebuild_forces_another_rebuild(db_engine, db_sessions, monkeypatch):
+    monkeypatch.setattr(shards, "engines", [db_engine])
+    snapshot = DashboardSnapshot()
+
+    async def scenario():
+        async with db_sessions() as db:
+            build = asyncio.create_task(snapshot.get(db))
+            while not snapshot._lock.locked():
+                await asyncio.sleep(0)
+            # Reported while the rebuild's queries are in flight
+            snapshot.article_saved(article("article-1"), created=True)
+            await build
+        stale_after_first_build = snapshot._needs_rebuild()
+        async with db_sessions() as db:
+            await snapshot.get(db)
+        return stale_after_first_build
+
+    assert asyncio.run(scenario())
+    assert not snapshot._needs_rebuild()
+
+def test_update_between_rebuilds_is_applied_in_place(db_engine, db_sessions, monkeypatch):
+    monkeypatch.setattr(shards, "engines", [db_engine])
+    snapshot = DashboardSnapshot()
+
+    async def scenario():
+        async with db_sessions() as db:
+            await snapshot.get(db)
+            snapshot.article_saved(article("article-1"), created=True)
+            return await snapshot.get(db)
+
+    payload = asyncio.run(scenario())
+
+    assert not snapshot._needs_rebuild()
+    assert payload["published_articles"] == 1
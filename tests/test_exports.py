@@ -0,0 +1,112 @@
+"""
+Streaming CSV and Parquet exports over the analytics shards
+"""
+import asyncio
+import csv
+import io
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+from models import AnalyticsTable, ArticleTable
+import exports
+import shards
+
+START = datetime(2025, 1, 1)
+END = datetime(2025, 2, 1)
+ARTICLE_IDS = [f"article-{n}" for n in range(6)]
+
+def day(n: int) -> datetime:
+    return datetime(2025, 1, n)
+
+@pytest.fixture
+def seeded(db_engine, analytics_shards, monkeypatch):
+    """Three days of rollups per article, plus rows of a deleted article"""
+    monkeypatch.setattr(exports, "engine", db_engine)
+    monkeypatch.setattr(exports, "EXPORT_CHUNK_ROWS", 2)
+
+    async def seed():
+        async with db_engine.begin() as conn:
+            await conn.execute(ArticleTable.__table__.insert(), [
+                {
+                    "id": article_id, "title": f"Title {article_id}", "slug": article_id,
+                    "content": "-", "author_id": "user-1", "category_id": "cat-1"
+                }
+                for article_id in ARTICLE_IDS
+            ])
+        for article_id in ARTICLE_IDS + ["deleted"]:
+            async with shards.engines_for(article_id)[0].begin() as conn:
+                await conn.execute(AnalyticsTable.__table__.insert(), [
+                    {
+                        "id": f"{article_id}-{n}", "article_id": article_id, "date": day(n),
+                        "views": n * 10, "unique_views": n, "session_duration": n * 60,
+                        "scroll_depth_sum": n * 50, "scroll_samples": n,
+                    }
+                    for n in (1, 2, 3)
+                ])
+        # Outside [START, END)
+        async with shards.engines_for("article-0")[0].begin() as conn:
+            await conn.execute(AnalyticsTable.__table__.insert(), {
+                "id": "article-0-late", "article_id": "article-0", "date": END, "views": 1,
+            })
+
+    asyncio.run(seed())
+
+def expected_rows(article_ids):
+    return sorted(
+        (day(n).isoformat(" "), article_id, f"Title {article_id}", article_id,
+         str(n * 10), str(n), str(n * 60), str(n * 50), str(n))
+        for article_id in article_ids
+        for n in (1, 2, 3)
+    )
+
+def collect(chunks) -> list:
+    async def scenario():
+        return [chunk async for chunk in chunks]
+    return asyncio.run(scenario())
+
+def test_csv_streams_header_then_rows_in_chunks(seeded):
+    chunks = collect(exports.iter_csv(exports.rollup_export_query(START, END)))
+
+    parsed = [list(csv.reader(io.StringIO(chunk.decode()))) for chunk in chunks]
+    header, *rows = [row for chunk in parsed for row in chunk]
+
+    assert header == exports.EXPORT_COLUMNS
+    assert parsed[0][0] == exports.EXPORT_COLUMNS
+    assert sorted(map(tuple, rows)) == expected_rows(ARTICLE_IDS)
+    assert all(len(chunk) <= 2 for chunk in parsed[1:])
+    assert len(chunks) >= len(rows) // 2
+    # Each shard is walked in (article_id, date) order
+    for shard_rows in [[row for row in rows if shards.shard_of(row[1]) == s] for s in range(shards.ANALYTICS_SHARDS)]:
+        keys = [(row[1], row[0]) for row in shard_rows]
+        assert keys == sorted(keys)
+
+def test_csv_for_one_article_reads_its_shard_only(seeded):
+    query = exports.rollup_export_query(START, END, article_id="article-0")
+
+    chunks = collect(exports.iter_csv(query, "article-0"))
+
+    header, *rows = csv.reader(io.StringIO(b"".join(chunks).decode()))
+    assert header == exports.EXPORT_COLUMNS
+    assert sorted(map(tuple, rows)) == expected_rows(["article-0"])
+
+def test_parquet_streams_one_row_group_per_chunk(seeded):
+    chunks = collect(exports.iter_parquet(exports.rollup_export_query(START, END)))
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    table = parquet.read()
+
+    assert len(chunks) > 2
+    assert chunks[0].startswith(b"PAR1")
+    assert chunks[-1].endswith(b"PAR1")
+    assert table.schema.names == exports.EXPORT_COLUMNS
+    assert table.num_rows == len(ARTICLE_IDS) * 3
+    assert parquet.num_row_groups >= table.num_rows // 2
+    assert all(
+        parquet.metadata.row_group(n).num_rows <= 2 for n in range(parquet.num_row_groups)
+    )
+    rows = sorted(zip(*(table.column(name).to_pylist() for name in ("article_id", "date", "views"))))
+    assert rows == sorted(
+        (article_id, day(n), n * 10) for article_id in ARTICLE_IDS for n in (1, 2, 3)
+    )
@@ -0,0 +1,97 @@
+"""
+Hydration cache hits, invalidation and reloads
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event, update
+
+from hydration import HydrationCache
+from models import CategoryTable, UserRole, UserTable
+import hydration
+
+@pytest.fixture
+def queries(db_engine):
+    """Statements run on ``db_engine``, in order"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    return statements
+
+def seed(db_sessions):
+    async def scenario():
+        async with db_sessions() as db:
+            db.add(CategoryTable(id="cat-1", name="Space", slug="space"))
+            db.add(UserTable(
+                id="user-1", username="editor", email="e@example.com",
+                password_hash="-", role=UserRole.EDITOR
+            ))
+            await db.commit()
+    asyncio.run(scenario())
+
+def lookup(db_sessions, cache, author_ids=("user-1",), category_ids=("cat-1",)):
+    async def scenario():
+        async with db_sessions() as db:
+            return await cache.lookup(db, author_ids, category_ids)
+    return asyncio.run(scenario())
+
+def rename_category(db_sessions, name):
+    async def scenario():
+        async with db_sessions() as db:
+            await db.execute(update(CategoryTable).where(CategoryTable.id == "cat-1").values(name=name))
+            await db.commit()
+    asyncio.run(scenario())
+
+def test_lookups_are_served_from_memory(db_sessions, queries):
+    seed(db_sessions)
+    cache = HydrationCache()
+    queries.clear()
+
+    authors, categories = lookup(db_sessions, cache)
+    loads = len(queries)
+    for _ in range(3):
+        lookup(db_sessions, cache)
+
+    assert loads == 2
+    assert len(queries) == loads
+    assert authors["user-1"]["username"] == "editor"
+    assert "password_hash" not in authors["user-1"]
+    assert categories["cat-1"]["name"] == "Space"
+
+def test_invalidate_reloads_on_next_lookup(db_sessions):
+    seed(db_sessions)
+    cache = HydrationCache()
+    lookup(db_sessions, cache)
+
+    rename_category(db_sessions, "Astronomy")
+    stale = lookup(db_sessions, cache)[1]["cat-1"]["name"]
+    cache.invalidate()
+    fresh = lookup(db_sessions, cache)[1]["cat-1"]["name"]
+
+    assert (stale, fresh) == ("Space", "Astronomy")
+
+def test_ttl_bounds_staleness(db_sessions, monkeypatch):
+    seed(db_sessions)
+    cache = HydrationCache()
+    lookup(db_sessions, cache)
+    monkeypatch.setattr(hydration, "CACHE_TTL_SECONDS", 0.0)
+
+    rename_category(db_sessions, "Astronomy")
+
+    assert lookup(db_sessions, cache)[1]["cat-1"]["name"] == "Astronomy"
+
+def test_unknown_id_reloads_once_it_is_old_enough(db_sessions, queries, monkeypatch):
+    seed(db_sessions)
+    cache = HydrationCache()
+    lookup(db_sessions, cache)
+    queries.clear()
+
+    lookup(db_sessions, cache, category_ids=("cat-2",))
+    assert queries == []
+
+    monkeypatch.setattr(hydration, "MISS_RELOAD_SECONDS", 0.0)
+    lookup(db_sessions, cache, category_ids=("cat-2",))
+    assert len(queries) == 2
@@ -0,0 +1,51 @@
+"""
+HyperLogLog accuracy, serialization and merge behaviour
+"""
+import pytest
+
+from hyperloglog import HyperLogLog, count_blob, merge_blobs
+
+def sketch_of(items, precision=12):
+    sketch = HyperLogLog(precision)
+    for item in items:
+        sketch.add(item)
+    return sketch
+
+@pytest.mark.parametrize("n", [0, 10, 1000, 50000])
+def test_count_is_within_error_bound(n):
+    sketch = sketch_of(f"visitor-{i}" for i in range(n))
+
+    # ~1.6% standard error at precision 12; allow four sigma
+    assert abs(sketch.count() - n) <= max(1, 0.065 * n)
+
+def test_duplicates_do_not_inflate_count():
+    sketch = sketch_of(["same-visitor"] * 1000)
+
+    assert sketch.count() == 1
+
+def test_serialized_size_is_fixed():
+    small = sketch_of(["a"], precision=10).to_bytes()
+    large = sketch_of((str(i) for i in range(100000)), precision=10).to_bytes()
+
+    assert len(small) == len(large) == 1 + 2 ** 10
+    assert HyperLogLog.from_bytes(large).to_bytes() == large
+
+def test_merge_counts_the_union():
+    monday = sketch_of(f"v{i}" for i in range(0, 6000))
+    tuesday = sketch_of(f"v{i}" for i in range(4000, 10000))
+
+    union = HyperLogLog.from_bytes(merge_blobs(monday.to_bytes(), tuesday.to_bytes()))
+
+    assert abs(union.count() - 10000) <= 650
+    assert union.count() == sketch_of(f"v{i}" for i in range(10000)).count()
+
+def test_blob_helpers_treat_null_as_empty():
+    blob = sketch_of(["a", "b"]).to_bytes()
+
+    assert merge_blobs(None, blob) == blob
+    assert merge_blobs(blob, None) == blob
+    assert count_blob(None) == 0
+
+def test_merge_rejects_mismatched_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
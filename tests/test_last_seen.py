@@ -0,0 +1,92 @@
+"""
+Last-seen tracker buffering
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from last_seen import LastSeenTracker
+from models import UserRole, UserTable
+import last_seen
+
+def seed_users(db_sessions, *user_ids):
+    async def scenario():
+        async with db_sessions() as db:
+            for user_id in user_ids:
+                db.add(UserTable(
+                    id=user_id, username=user_id, email=f"{user_id}@example.com",
+                    password_hash="-", role=UserRole.EDITOR
+                ))
+            await db.commit()
+    asyncio.run(scenario())
+
+def updates(engine):
+    """(executemany, parameter rows) of each UPDATE run on ``engine``"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            seen.append((executemany, len(parameters) if executemany else 1))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    return seen
+
+def test_record_keeps_one_pending_write_per_user():
+    tracker = LastSeenTracker()
+
+    for minute in range(30):
+        tracker.record("user-1", datetime(2025, 1, 1, 12, minute))
+    tracker.record("user-2", datetime(2025, 1, 1, 12, 5))
+
+    assert len(tracker) == 2
+    assert tracker._pending["user-1"] == datetime(2025, 1, 1, 12, 29)
+
+def test_flush_writes_every_pending_user_in_one_batched_update(db_engine, db_sessions, monkeypatch):
+    monkeypatch.setattr(last_seen, "engine", db_engine)
+    seed_users(db_sessions, "user-1", "user-2", "user-3")
+    statements = updates(db_engine)
+    tracker = LastSeenTracker()
+    for n, user_id in enumerate(["user-1", "user-2", "user-3"]):
+        tracker.record(user_id, datetime(2025, 1, 1, 12, n))
+
+    asyncio.run(tracker.flush())
+
+    async def stored():
+        async with db_sessions() as db:
+            return dict((await db.execute(select(UserTable.id, UserTable.last_seen))).all())
+
+    assert statements == [(True, 3)]
+    assert len(tracker) == 0
+    assert asyncio.run(stored()) == {
+        "user-1": datetime(2025, 1, 1, 12, 0),
+        "user-2": datetime(2025, 1, 1, 12, 1),
+        "user-3": datetime(2025, 1, 1, 12, 2),
+    }
+
+def test_failed_flush_requeues_the_batch(tmp_path, monkeypatch):
+    # No users table, so the UPDATE fails
+    path = tmp_path / "empty.db"
+    create_engine(f"sqlite:///{path}").dispose()
+    broken = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(last_seen, "engine", broken)
+    tracker = LastSeenTracker()
+    tracker.record("user-1", datetime(2025, 1, 1, 12, 0))
+    tracker.record("user-2", datetime(2025, 1, 1, 12, 0))
+
+    @event.listens_for(broken.sync_engine, "before_cursor_execute")
+    def newer_activity(conn, cursor, statement, parameters, context, executemany):
+        # Recorded while the failing batch is in flight
+        tracker.record("user-1", datetime(2025, 1, 1, 12, 30))
+
+    with pytest.raises(OperationalError):
+        asyncio.run(tracker.flush())
+
+    assert tracker._pending == {
+        "user-1": datetime(2025, 1, 1, 12, 30),
+        "user-2": datetime(2025, 1, 1, 12, 0),
+    }
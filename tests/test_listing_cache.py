@@ -0,0 +1,118 @@
+"""
+Listing cache eviction rules and stale-store protection
+"""
+import pytest
+
+from listing_cache import ArticleState, ListingCache, listing_params
+from models import ArticleStatus
+
+PUBLISHED = ArticleStatus.PUBLISHED
+DRAFT = ArticleStatus.DRAFT
+
+def params(status=None, category_id=None, search=None, skip=0, cursor=None):
+    return listing_params("summary", status, category_id, None, None, search, skip, 20, cursor, 0)
+
+def state(status=PUBLISHED, category_id="science"):
+    return ArticleState(status, category_id, "author-1", frozenset())
+
+@pytest.fixture
+def cache():
+    return ListingCache(maxsize=100, ttl=60)
+
+def fill(cache, pages):
+    for key, article_ids in pages.items():
+        cache.store(key, b"[]", {}, article_ids, cache.generation)
+
+def cached(cache, pages):
+    return {name for name, key in pages.items() if cache.get(key) is not None}
+
+def test_category_move(cache):
+    pages = {
+        "old category, first page": (params(category_id="science"), {"a-1", "a-2"}),
+        "old category, cursor page without it": (params(category_id="science", cursor="c"), {"a-3"}),
+        "old category, offset page": (params(category_id="science", skip=20), {"a-3"}),
+        "new category, first page": (params(category_id="space"), {"a-4"}),
+        "new category, cursor page": (params(category_id="space", cursor="c"), {"a-5"}),
+        "other category": (params(category_id="health"), {"a-6"}),
+    }
+    named = {name: key for name, (key, _) in pages.items()}
+    fill(cache, {key: ids for key, ids in pages.values()})
+
+    cache.invalidate_article("a-1", state=state(category_id="space"))
+
+    assert cached(cache, named) == {"old category, cursor page without it", "other category"}
+
+def test_publish_reaches_published_pages_only(cache):
+    pages = {
+        "published": params(status="published"),
+        "drafts": params(status="draft"),
+        "unfiltered": params(),
+    }
+    fill(cache, {key: {"other"} for key in pages.values()})
+
+    cache.invalidate_article("a-1", state=state(status=PUBLISHED))
+
+    assert cached(cache, pages) == {"drafts"}
+
+def test_unpublish_evicts_pages_that_listed_it(cache):
+    pages = {
+        "published, listed it": params(status="published"),
+        "published, later cursor page": params(status="published", cursor="c"),
+        "drafts": params(status="draft"),
+    }
+    fill(cache, {
+        pages["published, listed it"]: {"a-1", "a-2"},
+        pages["published, later cursor page"]: {"a-3"},
+        pages["drafts"]: {"a-4"},
+    })
+
+    cache.invalidate_article("a-1", state=state(status=DRAFT))
+
+    assert cached(cache, pages) == {"published, later cursor page"}
+
+def test_delete_evicts_its_pages_and_offset_pages(cache):
+    pages = {
+        "listed it": params(),
+        "offset page": params(skip=20),
+        "cursor page without it": params(cursor="c"),
+        "search without it": params(search="mars"),
+    }
+    fill(cache, {
+        pages["listed it"]: {"a-1"},
+        pages["offset page"]: {"a-2"},
+        pages["cursor page without it"]: {"a-3"},
+        pages["search without it"]: {"a-4"},
+    })
+
+    cache.invalidate_article("a-1", removed=True)
+
+    assert cached(cache, pages) == {"cursor page without it", "search without it"}
+
+def test_title_edit_evicts_its_pages_and_searches(cache):
+    pages = {
+        "listed it": params(),
+        "search": params(search="Mars"),
+        "offset page": params(skip=20),
+        "other category": params(category_id="health"),
+    }
+    fill(cache, {
+        pages["listed it"]: {"a-1"},
+        pages["search"]: {"a-2"},
+        pages["offset page"]: {"a-3"},
+        pages["other category"]: {"a-4"},
+    })
+
+    cache.invalidate_article("a-1", text_changed=True)
+
+    assert cached(cache, pages) == {"offset page", "other category"}
+
+def test_page_queried_before_an_invalidation_is_not_stored(cache):
+    key = params()
+    generation = cache.generation  # the listing query starts
+
+    cache.invalidate_article("a-1", state=state())  # a write commits meanwhile
+    cache.store(key, b"[]", {}, {"a-2"}, generation)
+
+    assert cache.get(key) is None
+    cache.store(key, b"[]", {}, {"a-2"}, cache.generation)
+    assert cache.get(key) is not None
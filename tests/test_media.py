@@ -0,0 +1,134 @@
+"""
+Media uploads, content sniffing and conditional/ranged streaming
+"""
+import asyncio
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image, UnidentifiedImageError
+
+from auth import Principal, get_current_active_user
+from models import UserRole
+from routes.media import router
+import media
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, "MEDIA_ROOT", tmp_path)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_active_user] = lambda: Principal("user-1", "editor", UserRole.EDITOR, True)
+    yield TestClient(app)
+    # Uploads render derivatives in the background
+    media.shutdown_pool()
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=50-500", (50, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert media.parse_range(header, 100) == expected
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=200-300", "bytes=9-3"])
+def test_parse_range_rejects_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        media.parse_range(header, 100)
+
+def test_sniff_content_type_recognises_stored_formats():
+    assert media.sniff_content_type(png_bytes()) == "image/png"
+    assert media.sniff_content_type(b"GIF89a" + b"\0" * 10) == "image/gif"
+    assert media.sniff_content_type(b"RIFF\0\0\0\0WEBPVP8 ") == "image/webp"
+    assert media.sniff_content_type(b"\0\0\0\x1cftypavif\0\0\0\0avifmif1") == "image/avif"
+    assert media.sniff_content_type(b"<html><script>alert(1)</script>") is None
+
+def test_upload_rejects_content_that_is_not_the_declared_image(client):
+    fake = client.post("/api/media/upload", files={"file": ("x.png", b"<html></html>", "image/png")})
+    mislabelled = client.post("/api/media/upload", files={"file": ("x.jpg", png_bytes(), "image/jpeg")})
+
+    assert fake.status_code == 415
+    assert mislabelled.status_code == 415
+
+def test_upload_stores_and_serves_with_nosniff(client):
+    data = png_bytes()
+    uploaded = client.post("/api/media/upload", files={"file": ("x.png", data, "image/png")})
+    assert uploaded.status_code == 200
+
+    response = client.get(uploaded.json()["url"])
+
+    assert response.content == data
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-type"] == "image/png"
+
+def test_range_requests(client):
+    data = png_bytes()
+    url = media.media_url(media.store_bytes(data, "image/png"))
+    size = len(data)
+
+    partial = client.get(url, headers={"Range": "bytes=0-7"})
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={size}-"})
+
+    assert partial.status_code == 206
+    assert partial.content == data[:8]
+    assert partial.headers["content-range"] == f"bytes 0-7/{size}"
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+
+def test_matching_etag_is_not_modified(client):
+    url = media.media_url(media.store_bytes(png_bytes(), "image/png"))
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+@pytest.mark.parametrize("error, status", [
+    (Image.DecompressionBombError("too many pixels"), 415),
+    (UnidentifiedImageError("cannot identify image file"), 415),
+    (BrokenProcessPool("worker died"), 503),
+])
+def test_derivative_render_failures(client, monkeypatch, error, status):
+    url = media.media_url(media.store_bytes(png_bytes(), "image/png"))
+
+    async def failing_render(name, size, fmt):
+        raise error
+
+    monkeypatch.setattr(media, "ensure_derivative", failing_render)
+
+    assert client.get(f"{url}/card.webp").status_code == status
+
+def test_broken_pool_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, "MEDIA_ROOT", tmp_path)
+    name = media.store_bytes(png_bytes(), "image/png")
+
+    class DeadPool:
+        def submit(self, *args):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    monkeypatch.setattr(media, "_pool", DeadPool())
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(media.ensure_derivative(name, "thumb", "jpg"))
+    assert media._pool is None
+
+    try:
+        path = asyncio.run(media.ensure_derivative(name, "thumb", "jpg"))
+    finally:
+        media.shutdown_pool()
+    assert path.read_bytes().startswith(b"\xff\xd8")
@@ -0,0 +1,103 @@
+"""
+Startup migrations applied to a database created before them
+"""
+import pytest
+from sqlalchemy import create_engine, event, inspect, select
+
+from migrations import run_migrations
+from models import AnalyticsTable, ArticleTable, Base
+import hyperloglog
+import media
+import search
+import shards
+
+# The schema as create_all left it before any migration existed
+ORIGINAL_SCHEMA = [
+    """CREATE TABLE users (
+        id VARCHAR NOT NULL, username VARCHAR NOT NULL, email VARCHAR NOT NULL,
+        password_hash VARCHAR NOT NULL, role VARCHAR(8) NOT NULL, name VARCHAR,
+        bio TEXT, avatar TEXT, created_at DATETIME, last_login DATETIME, is_active BOOLEAN,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE UNIQUE INDEX ix_users_username ON users (username)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    """CREATE TABLE categories (
+        id VARCHAR NOT NULL, name VARCHAR NOT NULL, slug VARCHAR NOT NULL,
+        description TEXT, created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE UNIQUE INDEX ix_categories_slug ON categories (slug)",
+    """CREATE TABLE articles (
+        id VARCHAR NOT NULL, title VARCHAR NOT NULL, subtitle VARCHAR, content TEXT NOT NULL,
+        author_id VARCHAR NOT NULL, category_id VARCHAR NOT NULL, tags TEXT,
+        featured_image TEXT, status VARCHAR(9), published_at DATETIME, created_at DATETIME,
+        updated_at DATETIME, views INTEGER, slug VARCHAR NOT NULL, seo_title VARCHAR,
+        seo_description TEXT,
+        PRIMARY KEY (id),
+        FOREIGN KEY(author_id) REFERENCES users (id),
+        FOREIGN KEY(category_id) REFERENCES categories (id)
+    )""",
+    "CREATE UNIQUE INDEX ix_articles_slug ON articles (slug)",
+    """CREATE TABLE analytics (
+        id VARCHAR NOT NULL, article_id VARCHAR NOT NULL, date DATETIME, views INTEGER,
+        unique_views INTEGER, session_duration INTEGER, referrer VARCHAR, user_agent VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(article_id) REFERENCES articles (id)
+    )""",
+]
+
+@pytest.fixture
+def original_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "ANALYTICS_SHARD_URL", f"sqlite+aiosqlite:///{tmp_path}/analytics_{{shard}}.db")
+    monkeypatch.setattr(media, "MEDIA_ROOT", tmp_path / "media")
+    engine = create_engine(f"sqlite:///{tmp_path / 'original.db'}")
+    event.listen(engine, "connect", lambda dbapi_connection, _: hyperloglog.register_sqlite_functions(dbapi_connection))
+    with engine.begin() as conn:
+        for statement in ORIGINAL_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            "INSERT INTO articles (id, title, content, author_id, category_id, tags, status, "
+            "created_at, views, slug) VALUES ('a-1', 'Comet tails', 'Body', 'user-1', 'cat-1', "
+            "'[\"Space\"]', 'PUBLISHED', '2025-01-01 00:00:00', 7, 'comet-tails')"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO analytics (id, article_id, date, views, unique_views) "
+            "VALUES ('row-1', 'a-1', '2025-01-01 00:00:00', 7, 3)"
+        )
+    yield engine
+    engine.dispose()
+
+def start_up(engine):
+    """What Database.create_tables does, in the same order"""
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        run_migrations(conn)
+        search.create_search_index(conn)
+
+def test_original_database_starts_up(original_database):
+    start_up(original_database)
+
+    with original_database.connect() as conn:
+        index_names = {index["name"] for index in inspect(conn).get_indexes("articles")}
+        found = conn.execute(
+            select(ArticleTable.id, ArticleTable.search_rowid).where(search.match_condition("comet"))
+        ).all()
+        moved = conn.execute(select(AnalyticsTable.id)).all()
+
+    assert {"ix_articles_status_created_at_id", "ix_articles_search_rowid"} <= index_names
+    assert "ix_articles_status_published_at" not in index_names
+    assert found == [("a-1", 1)]
+    # Rollups now live in the article's shard
+    assert moved == []
+    shard_engine = shards.sync_engine(shards.shard_of("a-1"))
+    with shard_engine.connect() as shard:
+        assert shard.execute(select(AnalyticsTable.views)).scalars().all() == [7]
+    shard_engine.dispose()
+
+def test_restart_applies_nothing_new(original_database, capsys):
+    start_up(original_database)
+    capsys.readouterr()
+
+    start_up(original_database)
+
+    assert "Applied migration" not in capsys.readouterr().out
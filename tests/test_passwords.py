@@ -0,0 +1,36 @@
+"""
+Bounded password hashing pool
+"""
+import asyncio
+import threading
+
+import pytest
+
+from passwords import HashingQueueFull, PasswordHasher
+
+def test_run_caps_concurrency_and_rejects_past_the_queue_limit():
+    hasher = PasswordHasher(workers=2, max_queued=3)
+    release = threading.Event()
+    running = []
+
+    def work(n):
+        running.append(n)
+        release.wait(5)
+        return n * 2
+
+    async def scenario():
+        calls = [asyncio.create_task(hasher.run(work, n)) for n in range(5)]
+        await asyncio.sleep(0.05)
+        assert len(running) == 2
+        assert hasher.stats()["queued"] == 3
+        with pytest.raises(HashingQueueFull):
+            await hasher.run(work, 99)
+        release.set()
+        return await asyncio.gather(*calls)
+
+    try:
+        assert asyncio.run(scenario()) == [0, 2, 4, 6, 8]
+    finally:
+        hasher.shutdown()
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["running"]) == (5, 1, 0)
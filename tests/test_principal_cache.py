@@ -0,0 +1,20 @@
+"""
+Principal cache invalidation
+"""
+from auth import Principal, invalidate_principal, principal_cache
+from models import UserRole
+
+def test_invalidate_principal_drops_every_token_version_of_the_user():
+    principal_cache.clear()
+    editor = Principal("user-1", "editor", UserRole.EDITOR, True)
+    admin = Principal("user-2", "admin", UserRole.ADMIN, True)
+    principal_cache.set(("editor", 0), editor)
+    principal_cache.set(("editor", 1), editor)
+    principal_cache.set(("admin", 0), admin)
+
+    invalidate_principal("user-1")
+
+    assert principal_cache.get(("editor", 0)) is None
+    assert principal_cache.get(("editor", 1)) is None
+    assert principal_cache.get(("admin", 0)) == admin
+    principal_cache.clear()
@@ -0,0 +1,98 @@
+"""
+EXPLAIN QUERY PLAN checks for the article listing and analytics query shapes
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import and_, create_engine
+from sqlalchemy.dialects import sqlite
+
+from migrations import run_migrations
+from models import Base
+from routes.articles import filter_conditions, listing_query, paginate_newest_first
+import exports
+import rollups
+import traffic
+import utils
+
+CURSOR = utils.encode_cursor(datetime(2025, 1, 1), "00000000-0000-0000-0000-000000000000")
+
+@pytest.fixture(scope="module")
+def connection():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        run_migrations(conn)
+        yield conn
+
+def query_plan(connection, query):
+    compiled = query.compile(dialect=sqlite.dialect(paramstyle="named"))
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", compiled.construct_params()
+    ).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+@pytest.mark.parametrize("view", ["full", "summary"])
+@pytest.mark.parametrize("cursor", [None, CURSOR])
+@pytest.mark.parametrize("filters, index", [
+    ({}, "ix_articles_created_at_id"),
+    ({"status": "published"}, "ix_articles_status_created_at_id"),
+    ({"category_id": "cat-1"}, "ix_articles_category_created_at_id"),
+    ({"author_id": "user-1"}, "ix_articles_author_created_at_id"),
+])
+def test_listing_uses_composite_index(connection, view, cursor, filters, index):
+    query = listing_query(view).where(and_(True, *filter_conditions(**filters)))
+    query = paginate_newest_first(query, skip=0, limit=20, cursor=cursor)
+
+    plan = query_plan(connection, query)
+
+    assert index in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_migrations_are_idempotent(connection):
+    run_migrations(connection)
+    names = [row[0] for row in connection.exec_driver_sql("SELECT name FROM schema_migrations")]
+    assert len(names) == len(set(names))
+
+def test_tag_filter_uses_article_tags_index(connection):
+    query = listing_query("summary").where(and_(*filter_conditions(tag="Science")))
+    query = paginate_newest_first(query, skip=0, limit=20, cursor=None)
+
+    plan = query_plan(connection, query)
+
+    assert "ix_article_tags_tag_id_article_id" in plan
+
+@pytest.mark.parametrize("resolution, article_id, index", [
+    (rollups.HOURLY, None, "sqlite_autoindex_site_hourly_1"),
+    (rollups.HOURLY, "article-1", "sqlite_autoindex_analytics_hourly_1"),
+    (rollups.DAILY, None, "sqlite_autoindex_site_daily_1"),
+    (rollups.DAILY, "article-1", "ux_analytics_article_id_date"),
+    (rollups.MONTHLY, None, "sqlite_autoindex_site_monthly_1"),
+    (rollups.MONTHLY, "article-1", "sqlite_autoindex_analytics_monthly_1"),
+])
+def test_views_series_use_rollup_index(connection, resolution, article_id, index):
+    start, end = rollups.day_range(30, datetime(2025, 1, 31))
+
+    plan = query_plan(connection, rollups.views_query(start, end, article_id, resolution))
+
+    assert index in plan
+
+@pytest.mark.parametrize("article_id, index", [
+    (None, "ix_analytics_traffic_date_referrer_id"),
+    ("article-1", "sqlite_autoindex_analytics_traffic_1"),
+])
+def test_referrers_use_traffic_index(connection, article_id, index):
+    start, end = rollups.day_range(30, datetime(2025, 1, 31))
+
+    plan = query_plan(connection, traffic.referrers_query(start, end, article_id))
+
+    assert index in plan
+
+@pytest.mark.parametrize("resolution", rollups.RESOLUTIONS)
+@pytest.mark.parametrize("article_id", [None, "article-1"])
+def test_export_streams_in_index_order(connection, resolution, article_id):
+    start, end = rollups.day_range(30, datetime(2025, 1, 31))
+
+    plan = query_plan(connection, exports.rollup_export_query(start, end, resolution, article_id))
+
+    assert "TEMP B-TREE" not in plan
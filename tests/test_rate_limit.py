@@ -0,0 +1,62 @@
+"""
+Login token buckets and their stores
+"""
+import asyncio
+
+import pytest
+
+from rate_limit import LoginRateLimiter, MemoryBucketStore, Rule, SQLiteBucketStore, take_token
+
+RULE = Rule(burst=3, per_minute=6)
+
+def test_take_token_spends_the_burst_then_refills_at_the_rate():
+    bucket, now = None, 1000.0
+    for _ in range(3):
+        bucket, retry_after = take_token(bucket, RULE, now)
+        assert retry_after == 0.0
+
+    bucket, retry_after = take_token(bucket, RULE, now)
+    assert retry_after == pytest.approx(10.0)
+
+    bucket, retry_after = take_token(bucket, RULE, now + 10)
+    assert retry_after == 0.0
+    # Idle for far longer than a refill: back to the burst, never above it
+    assert take_token(bucket, RULE, now + 3600)[0][0] == RULE.burst - 1
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: MemoryBucketStore(max_keys=100),
+    lambda tmp_path: SQLiteBucketStore(str(tmp_path / "buckets.db"), max_keys=100),
+], ids=["memory", "sqlite"])
+def test_limiter_rejects_by_address_and_by_username(tmp_path, make_store):
+    store = make_store(tmp_path)
+    limiter = LoginRateLimiter(store, by_address=Rule(4, 1), by_username=Rule(2, 1))
+
+    async def attempts():
+        return [
+            await limiter.check("10.0.0.1", "Alice"),
+            await limiter.check("10.0.0.1", " alice "),
+            await limiter.check("10.0.0.1", "ALICE"),
+            await limiter.check("10.0.0.1", "bob"),
+            await limiter.check("10.0.0.1", "carol"),
+            await limiter.check("10.0.0.2", "carol"),
+        ]
+
+    try:
+        allowed = [retry_after == 0.0 for retry_after in asyncio.run(attempts())]
+    finally:
+        store.close()
+
+    assert allowed == [True, True, False, True, False, True]
+    assert (limiter.allowed, limiter.rejected_username, limiter.rejected_address) == (4, 1, 1)
+
+def test_memory_store_evicts_least_recently_used_buckets():
+    store = MemoryBucketStore(max_keys=2)
+
+    async def fill():
+        for key in ("a", "b", "a", "c"):
+            await store.take(key, RULE, 1000.0)
+
+    asyncio.run(fill())
+
+    assert len(store) == 2
+    assert store._buckets.get("b") is None
@@ -0,0 +1,74 @@
+"""
+Rollup tier selection and consolidation
+"""
+from datetime import datetime
+
+import pytest
+
+from hyperloglog import hash_item
+import rollups
+
+NOW = datetime(2025, 6, 15, 13, 30)
+
+@pytest.mark.parametrize("days, expected", [
+    (1, rollups.HOURLY),
+    (2, rollups.HOURLY),
+    (3, rollups.DAILY),
+    (30, rollups.DAILY),
+    (90, rollups.DAILY),
+    (365, rollups.MONTHLY),
+    (3650, rollups.MONTHLY),
+])
+def test_resolution_is_finest_tier_that_holds_range(days, expected):
+    start, end = rollups.day_range(days, NOW)
+
+    assert rollups.resolution_for(start, end, now=NOW) is expected
+
+def test_resolution_respects_finest():
+    start, end = rollups.day_range(1, NOW)
+
+    assert rollups.resolution_for(start, end, finest=rollups.DAILY, now=NOW) is rollups.DAILY
+
+def test_long_ranges_read_few_buckets():
+    start, end = rollups.day_range(3650, NOW)
+
+    assert len(list(rollups.buckets(rollups.MONTHLY, start, end))) <= 121
+
+def test_monthly_buckets_step_across_year_end():
+    start, end = datetime(2024, 11, 20), datetime(2025, 2, 1)
+
+    assert list(rollups.buckets(rollups.MONTHLY, start, end)) == [
+        datetime(2024, 11, 1), datetime(2024, 12, 1), datetime(2025, 1, 1)
+    ]
+
+def test_consolidate_merges_hours_into_days_and_months():
+    counters = {}
+    for hour in (datetime(2025, 1, 31, 22), datetime(2025, 1, 31, 23), datetime(2025, 2, 1, 0)):
+        counts = counters[("a", hour)] = rollups.RollupCounters()
+        counts.views = 2
+        counts.add_visitor(hash_item(f"visitor-{hour.hour}"))
+
+    days = rollups.consolidate(counters, rollups.DAILY)
+    months = rollups.consolidate(counters, rollups.MONTHLY)
+
+    assert {key: c.views for key, c in days.items()} == {
+        ("a", datetime(2025, 1, 31)): 4, ("a", datetime(2025, 2, 1)): 2
+    }
+    assert {key: c.views for key, c in months.items()} == {
+        ("a", datetime(2025, 1, 1)): 4, ("a", datetime(2025, 2, 1)): 2
+    }
+    # Consolidated sketches are copies; the hourly ones are written unchanged
+    assert counters[("a", datetime(2025, 1, 31, 22))].sketch.count() == 1
+    assert days[("a", datetime(2025, 1, 31))].sketch.count() == 2
+
+def test_fill_series_labels_hours():
+    start = datetime(2025, 1, 1)
+    series = rollups.fill_series(
+        [(datetime(2025, 1, 1, 1), 5, 3)], start, datetime(2025, 1, 1, 3), rollups.HOURLY
+    )
+
+    assert series == [
+        {"date": "2025-01-01T00:00", "views": 0, "unique_views": 0},
+        {"date": "2025-01-01T01:00", "views": 5, "unique_views": 3},
+        {"date": "2025-01-01T02:00", "views": 0, "unique_views": 0},
+    ]
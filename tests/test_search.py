@@ -0,0 +1,86 @@
+"""
+Full-text search index triggers and query parsing
+"""
+import pytest
+from sqlalchemy import create_engine, delete, select, update
+
+from models import ArticleTable, Base
+import search
+
+articles = ArticleTable.__table__
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    with engine.connect() as conn:
+        Base.metadata.create_all(conn)
+        search.create_search_index(conn)
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+def add(connection, article_id, title, content="Body text"):
+    connection.execute(articles.insert().values(
+        id=article_id, title=title, content=content, tags='["Space"]',
+        author_id="user-1", category_id="cat-1", slug=article_id
+    ))
+
+def found(connection, text):
+    query = select(articles.c.id).where(search.match_condition(text)).order_by(articles.c.id)
+    return connection.execute(query).scalars().all()
+
+def test_insert_trigger_indexes_new_articles(connection):
+    add(connection, "a-1", "Comet tails explained")
+    add(connection, "a-2", "Deep sea vents", content="A comet of bubbles")
+
+    assert found(connection, "comet") == ["a-1", "a-2"]
+    assert found(connection, "space") == ["a-1", "a-2"]
+    assert found(connection, "vent") == ["a-2"]
+
+def test_update_trigger_reindexes_changed_text(connection):
+    add(connection, "a-1", "Comet tails explained")
+
+    connection.execute(update(articles).where(articles.c.id == "a-1").values(title="Asteroid belts"))
+
+    assert found(connection, "comet") == []
+    assert found(connection, "asteroid") == ["a-1"]
+
+def test_delete_trigger_removes_articles(connection):
+    add(connection, "a-1", "Comet tails explained")
+    add(connection, "a-2", "Comet orbits")
+
+    connection.execute(delete(articles).where(articles.c.id == "a-1"))
+
+    assert found(connection, "comet") == ["a-2"]
+    assert found(connection, "tails") == []
+
+def test_index_survives_renumbered_rowids(connection):
+    for n in range(1, 6):
+        add(connection, f"a-{n}", f"Story {n}", content=f"keyword{n}")
+    connection.execute(delete(articles).where(articles.c.id.in_(["a-1", "a-3"])))
+
+    # What VACUUM is allowed to do to a table without an INTEGER PRIMARY KEY
+    connection.exec_driver_sql("UPDATE articles SET rowid = rowid + 10")
+    add(connection, "a-6", "Story 6", content="keyword6")
+
+    assert [found(connection, f"keyword{n}") for n in (2, 4, 5, 6)] == [["a-2"], ["a-4"], ["a-5"], ["a-6"]]
+    assert found(connection, "keyword1") == []
+    connection.exec_driver_sql(
+        f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}, rank) VALUES ('integrity-check', 1)"
+    )
+
+@pytest.mark.parametrize("text, expected", [
+    ("comet tails", '"comet" "tails"*'),
+    ('"comet tails"', '"comet" "tails"*'),
+    ('comet" OR "1"="1', '"comet" "OR" "1" "1"*'),
+    ("C++ / F#", '"C" "F"*'),
+    ("...", None),
+    ('""', None),
+    ("  ", None),
+    (None, None),
+])
+def test_to_fts_query(text, expected):
+    assert search.to_fts_query(text) == expected
+
+def test_punctuation_only_search_has_no_condition():
+    assert search.match_condition("?!*-") is None
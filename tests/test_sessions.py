@@ -0,0 +1,139 @@
+"""
+Refresh token rotation, replay detection and logout
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
+
+from models import RefreshTokenTable, UserRole, UserTable
+import auth
+
+def login(db_sessions):
+    async def scenario():
+        async with db_sessions() as db:
+            user = UserTable(username="editor", email="e@example.com", password_hash="-", role=UserRole.EDITOR)
+            db.add(user)
+            await db.flush()
+            session_id, refresh_token = auth.create_session(user, db)
+            await db.commit()
+            return auth.session_tokens(user, session_id, refresh_token), session_id
+    return asyncio.run(scenario())
+
+def refresh(db_sessions, refresh_token):
+    async def scenario():
+        async with db_sessions() as db:
+            user, session_id, new_token = await auth.rotate_refresh_token(refresh_token, db)
+            await db.commit()
+            return new_token
+    return asyncio.run(scenario())
+
+def revoked_at(db_sessions, session_id):
+    async def scenario():
+        async with db_sessions() as db:
+            return (await db.get(RefreshTokenTable, session_id)).revoked_at
+    return asyncio.run(scenario())
+
+def authenticate(db_sessions, access_token):
+    async def scenario():
+        async with db_sessions() as db:
+            credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=access_token)
+            return await auth.get_current_user(credentials, db)
+    return asyncio.run(scenario())
+
+@pytest.fixture(autouse=True)
+def fresh_principals():
+    auth.principal_cache.clear()
+    yield
+    auth.principal_cache.clear()
+
+def test_refresh_rotates_the_token(db_sessions):
+    tokens, session_id = login(db_sessions)
+
+    first = refresh(db_sessions, tokens["refresh_token"])
+    second = refresh(db_sessions, first)
+
+    assert len({tokens["refresh_token"], first, second}) == 3
+    assert all(token.startswith(session_id + ".") for token in (first, second))
+    assert revoked_at(db_sessions, session_id) is None
+
+def test_replaced_token_is_accepted_within_the_grace_window(db_sessions):
+    tokens, session_id = login(db_sessions)
+    refresh(db_sessions, tokens["refresh_token"])
+
+    # A second tab refreshing with the same token at the same time
+    assert refresh(db_sessions, tokens["refresh_token"])
+    assert revoked_at(db_sessions, session_id) is None
+
+def test_replaying_a_replaced_token_later_revokes_the_session(db_sessions, monkeypatch):
+    monkeypatch.setattr(auth, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", 0)
+    tokens, session_id = login(db_sessions)
+    current = refresh(db_sessions, tokens["refresh_token"])
+
+    with pytest.raises(HTTPException) as replay:
+        refresh(db_sessions, tokens["refresh_token"])
+
+    assert replay.value.status_code == 401
+    assert revoked_at(db_sessions, session_id) is not None
+    with pytest.raises(HTTPException):
+        refresh(db_sessions, current)
+    with pytest.raises(HTTPException):
+        authenticate(db_sessions, tokens["access_token"])
+
+def test_forged_secret_is_rejected_without_revoking(db_sessions):
+    tokens, session_id = login(db_sessions)
+
+    with pytest.raises(HTTPException) as forged:
+        refresh(db_sessions, f"{session_id}.garbage")
+
+    assert forged.value.status_code == 401
+    assert revoked_at(db_sessions, session_id) is None
+    assert refresh(db_sessions, tokens["refresh_token"])
+    assert authenticate(db_sessions, tokens["access_token"]).username == "editor"
+
+def test_logout_rejects_the_sessions_access_token(db_sessions):
+    tokens, session_id = login(db_sessions)
+    assert authenticate(db_sessions, tokens["access_token"]).username == "editor"
+
+    async def logout():
+        async with db_sessions() as db:
+            for revoked in await auth.sessions_to_revoke(tokens["access_token"], None, db):
+                await auth.revoke_session(revoked, db)
+            await db.commit()
+
+    asyncio.run(logout())
+
+    with pytest.raises(HTTPException) as rejected:
+        authenticate(db_sessions, tokens["access_token"])
+    assert rejected.value.status_code == 401
+    with pytest.raises(HTTPException):
+        refresh(db_sessions, tokens["refresh_token"])
+
+def change_user(db_sessions, **changes):
+    """Apply a role/activation change the way the user update route does"""
+    async def scenario():
+        async with db_sessions() as db:
+            user = (await db.execute(select(UserTable).where(UserTable.username == "editor"))).scalar_one()
+            user.token_version = (user.token_version or 0) + 1
+            for name, value in changes.items():
+                setattr(user, name, value)
+            await db.commit()
+            auth.invalidate_principal(user.id)
+            return user
+    return asyncio.run(scenario())
+
+@pytest.mark.parametrize("changes", [{"role": UserRole.ADMIN}, {"is_active": False}])
+def test_token_version_bump_rejects_older_access_tokens(db_sessions, changes):
+    tokens, session_id = login(db_sessions)
+    assert authenticate(db_sessions, tokens["access_token"]).role == UserRole.EDITOR
+
+    user = change_user(db_sessions, **changes)
+
+    with pytest.raises(HTTPException) as rejected:
+        authenticate(db_sessions, tokens["access_token"])
+    assert rejected.value.status_code == 401
+    if user.is_active:
+        reissued = auth.session_tokens(user, session_id, tokens["refresh_token"])
+        assert authenticate(db_sessions, reissued["access_token"]).role == UserRole.ADMIN
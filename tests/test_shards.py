@@ -0,0 +1,59 @@
+"""
+Analytics shard routing and cross-shard merges
+"""
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from hyperloglog import HyperLogLog, hash_item
+import rollups
+import shards
+import traffic
+
+def sketch(*visitors) -> bytes:
+    hll = HyperLogLog(rollups.SITE_SKETCH_PRECISION)
+    for visitor in visitors:
+        hll.add_hash(hash_item(visitor))
+    return hll.to_bytes()
+
+def test_shard_of_spreads_articles_evenly():
+    article_ids = [str(uuid.uuid4()) for _ in range(4000)]
+
+    counts = Counter(shards.shard_of(article_id) for article_id in article_ids)
+
+    assert set(counts) == set(range(shards.ANALYTICS_SHARDS))
+    assert min(counts.values()) > 0.8 * len(article_ids) / shards.ANALYTICS_SHARDS
+
+def test_partition_keeps_each_article_in_its_shard():
+    items = {(f"article-{n}", datetime(2025, 1, 1)): n for n in range(50)}
+
+    parts = shards.partition(items)
+
+    assert sum(len(part) for part in parts.values()) == len(items)
+    for shard, part in parts.items():
+        assert all(shards.shard_of(article_id) == shard for article_id, _ in part)
+
+def test_merge_buckets_adds_views_and_unions_visitors():
+    monday, tuesday = datetime(2025, 1, 6), datetime(2025, 1, 7)
+    rows = [
+        # Two shards' site rows for Monday share visitor "b"
+        (monday, 3, 2, sketch("a", "b")),
+        (monday, 4, 2, sketch("b", "c")),
+        (tuesday, 1, 1, sketch("a")),
+    ]
+
+    series, unique_visitors = rollups.merge_buckets(rows)
+
+    assert sorted(series) == [(monday, 7, 3), (tuesday, 1, 1)]
+    assert unique_visitors == 3
+
+def test_merge_buckets_keeps_counts_of_rows_without_sketches():
+    series, unique_visitors = rollups.merge_buckets([(datetime(2025, 1, 6), 5, 2, None)])
+
+    assert series == [(datetime(2025, 1, 6), 5, 2)]
+    assert unique_visitors == 0
+
+def test_merge_views_sums_by_value():
+    rows = [("google.com", 3), ("t.co", 5), ("google.com", 4)]
+
+    assert traffic.merge_views(rows) == [("google.com", 7), ("t.co", 5)]
@@ -0,0 +1,59 @@
+"""
+User-agent classification and referrer normalization
+"""
+import pytest
+
+from traffic import DIRECT, classify_user_agent, referrer_domain, source_kind
+
+CHROME_WINDOWS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+)
+EDGE_WINDOWS = CHROME_WINDOWS + " Edg/126.0.2592.87"
+SAFARI_IPHONE = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1"
+)
+SAFARI_IPAD = SAFARI_IPHONE.replace("iPhone; CPU iPhone OS", "iPad; CPU OS")
+FIREFOX_ANDROID_TABLET = "Mozilla/5.0 (Android 14; Tablet; rv:127.0) Gecko/127.0 Firefox/127.0"
+CHROME_ANDROID_PHONE = (
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0.0.0 Mobile Safari/537.36"
+)
+GOOGLEBOT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+@pytest.mark.parametrize("user_agent, expected", [
+    (CHROME_WINDOWS, ("Chrome", "Windows", "desktop", False)),
+    (EDGE_WINDOWS, ("Edge", "Windows", "desktop", False)),
+    (SAFARI_IPHONE, ("Safari", "iOS", "mobile", False)),
+    (SAFARI_IPAD, ("Safari", "iOS", "tablet", False)),
+    (FIREFOX_ANDROID_TABLET, ("Firefox", "Android", "tablet", False)),
+    (CHROME_ANDROID_PHONE, ("Chrome", "Android", "mobile", False)),
+    (GOOGLEBOT, ("Bot", "Other", "bot", True)),
+    ("curl/8.5.0", ("Bot", "Other", "bot", True)),
+    (None, ("Other", "Other", "other", False)),
+])
+def test_classify_user_agent(user_agent, expected):
+    assert tuple(classify_user_agent(user_agent)) == expected
+
+@pytest.mark.parametrize("referrer, expected", [
+    ("https://www.google.com/search?q=quantum", "google.com"),
+    ("https://News.Ycombinator.com/item?id=1", "news.ycombinator.com"),
+    ("android-app://com.google.android.gm/", "com.google.android.gm"),
+    ("not a url", DIRECT),
+    ("", DIRECT),
+    (None, DIRECT),
+])
+def test_referrer_domain(referrer, expected):
+    assert referrer_domain(referrer) == expected
+
+@pytest.mark.parametrize("domain, expected", [
+    (DIRECT, "Direct"),
+    ("google.co.uk", "Search"),
+    ("duckduckgo.com", "Search"),
+    ("t.co", "Social Media"),
+    ("m.facebook.com", "Social Media"),
+    ("news.ycombinator.com", "Referrals"),
+])
+def test_source_kind(domain, expected):
+    assert source_kind(domain) == expected
@@ -0,0 +1,85 @@
+"""
+Decayed trending scores and bounded tracking
+"""
+import asyncio
+import math
+
+import pytest
+from sqlalchemy import insert
+
+from models import ArticleTable
+from trending import TrendingRanking
+from view_buffer import ViewCounter
+import view_buffer
+
+HALF_LIFE = 3600.0
+NOW = 1_750_000_000.0
+
+def test_views_lose_half_their_weight_per_half_life():
+    ranking = TrendingRanking(capacity=10, half_life=HALF_LIFE)
+    for _ in range(4):
+        ranking.record("old", NOW - 2 * HALF_LIFE)
+    ranking.record("new", NOW)
+
+    assert ranking.current_weight(ranking._scores["old"], NOW) == pytest.approx(1.0)
+    assert ranking.current_weight(ranking._scores["new"], NOW) == pytest.approx(1.0)
+
+def test_recent_views_outrank_older_ones():
+    ranking = TrendingRanking(capacity=10, half_life=HALF_LIFE)
+    for _ in range(3):
+        ranking.record("yesterday", NOW - 24 * HALF_LIFE)
+    ranking.record("now", NOW)
+    ranking.record("now", NOW)
+
+    assert ranking.leaders(2) == ["now", "yesterday"]
+
+def test_scores_do_not_overflow_at_wall_clock_times():
+    ranking = TrendingRanking(capacity=10, half_life=60.0)
+    for offset in range(1000):
+        ranking.record("a", NOW + offset)
+
+    assert math.isfinite(ranking._scores["a"])
+
+def test_capacity_evicts_lowest_score():
+    ranking = TrendingRanking(capacity=3, half_life=HALF_LIFE)
+    for views, article_id in ((3, "a"), (2, "c")):
+        for _ in range(views):
+            ranking.record(article_id, NOW)
+    # Half the weight of d's single view, so b is the strict minimum
+    ranking.record("b", NOW - HALF_LIFE)
+    ranking.record("d", NOW)
+
+    assert len(ranking) == 3
+    assert set(ranking.leaders(3)) == {"a", "c", "d"}
+
+def test_discard_removes_article():
+    ranking = TrendingRanking(capacity=3, half_life=HALF_LIFE)
+    ranking.record("a", NOW)
+    ranking.discard("a")
+    ranking.record("b", NOW)
+
+    assert ranking.leaders(3) == ["b"]
+
+def test_flushes_rank_only_ids_that_match_an_article(db_engine, analytics_shards, monkeypatch):
+    monkeypatch.setattr(view_buffer, "engine", db_engine)
+    counter = ViewCounter()
+    ranking = TrendingRanking(capacity=3, half_life=HALF_LIFE)
+    counter.add_listener(ranking.views_flushed)
+
+    async def scenario():
+        async with db_engine.begin() as conn:
+            await conn.execute(insert(ArticleTable), [
+                {"id": article_id, "title": article_id, "content": "", "slug": article_id,
+                 "author_id": "user-1", "category_id": "category-1"}
+                for article_id in ("real-1", "real-2")
+            ])
+        counter.record("real-1", count=2)
+        counter.record("real-2")
+        # A flood of made-up ids outnumbering the capacity
+        for n in range(50):
+            counter.record(f"junk-{n}", count=5)
+        await counter.flush()
+
+    asyncio.run(scenario())
+
+    assert ranking.leaders(3) == ["real-1", "real-2"]
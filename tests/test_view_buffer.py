@@ -0,0 +1,139 @@
+"""
+Write-behind view counting: batched totals, shard rollups and retries
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from models import AnalyticsTable, ArticleTable
+from view_buffer import ViewCounter
+import shards
+import view_buffer
+
+WHEN = datetime(2025, 1, 1, 12, 30)
+
+@pytest.fixture
+def counter(db_engine, analytics_shards, monkeypatch):
+    monkeypatch.setattr(view_buffer, "engine", db_engine)
+
+    async def seed():
+        async with db_engine.begin() as conn:
+            await conn.execute(insert(ArticleTable), [
+                {"id": article_id, "title": article_id, "content": "", "slug": article_id,
+                 "author_id": "user-1", "category_id": "category-1", "views": 0}
+                for article_id in ("article-1", "article-2")
+            ])
+
+    asyncio.run(seed())
+    return ViewCounter()
+
+def article_views(db_engine) -> dict:
+    async def scenario():
+        async with db_engine.connect() as conn:
+            return dict((await conn.execute(select(ArticleTable.id, ArticleTable.views))).all())
+    return asyncio.run(scenario())
+
+def daily_views(article_id: str) -> int:
+    async def scenario():
+        async with shards.engines_for(article_id)[0].connect() as conn:
+            return await conn.scalar(
+                select(func.coalesce(func.sum(AnalyticsTable.views), 0))
+                .where(AnalyticsTable.article_id == article_id)
+            )
+    return asyncio.run(scenario())
+
+@pytest.fixture
+def broken_shard(tmp_path, analytics_shards):
+    """Swap article-1's shard for a database without tables; returns a repair function"""
+    path = tmp_path / "broken.db"
+    create_engine(f"sqlite:///{path}").dispose()
+    shard = shards.shard_of("article-1")
+    healthy = analytics_shards[shard]
+    analytics_shards[shard] = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+    def repair():
+        analytics_shards[shard] = healthy
+    return repair
+
+def test_failed_shard_write_is_retried_without_recounting_totals(counter, db_engine, broken_shard):
+    for _ in range(5):
+        counter.record("article-1", when=WHEN)
+
+    with pytest.raises(OperationalError):
+        asyncio.run(counter.flush())
+    assert article_views(db_engine)["article-1"] == 5
+
+    broken_shard()  # the shard comes back
+    counter.record("article-1", when=WHEN)
+    asyncio.run(counter.flush())
+    asyncio.run(counter.flush())
+
+    assert article_views(db_engine)["article-1"] == 6
+    assert daily_views("article-1") == 6
+
+def test_repeated_views_collapse_into_one_batched_update(counter, db_engine):
+    updates = []
+
+    @event.listens_for(db_engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE articles"):
+            updates.append(len(parameters) if executemany else 1)
+
+    for minute in range(10):
+        counter.record("article-1", when=WHEN.replace(minute=minute), visitor=f"visitor-{minute}")
+    for _ in range(3):
+        counter.record("article-2", when=WHEN)
+    asyncio.run(counter.flush())
+
+    assert updates == [2]
+    assert article_views(db_engine) == {"article-1": 10, "article-2": 3}
+    assert (daily_views("article-1"), daily_views("article-2")) == (10, 3)
+
+def test_stop_flushes_what_is_still_buffered(counter, db_engine):
+    async def scenario():
+        counter.start()
+        counter.record("article-1", count=4, when=WHEN)
+        await counter.stop()
+
+    asyncio.run(scenario())
+
+    assert article_views(db_engine)["article-1"] == 4
+    assert len(counter._pending) == 0
+
+def test_flush_that_reaches_no_database_requeues_everything(counter, db_engine, tmp_path, monkeypatch):
+    path = tmp_path / "empty.db"
+    create_engine(f"sqlite:///{path}").dispose()
+    monkeypatch.setattr(view_buffer, "engine", create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool))
+    counter.record("article-1", count=2, when=WHEN)
+
+    with pytest.raises(OperationalError):
+        asyncio.run(counter.flush())
+    counter.record("article-1", when=WHEN)
+    monkeypatch.setattr(view_buffer, "engine", db_engine)
+    asyncio.run(counter.flush())
+
+    assert article_views(db_engine)["article-1"] == 3
+    assert daily_views("article-1") == 3
+
+def test_failed_totals_write_is_retried_without_rewriting_shards(counter, db_engine):
+    failures = [OperationalError("UPDATE articles", {}, Exception("database is locked"))]
+
+    @event.listens_for(db_engine.sync_engine, "before_cursor_execute")
+    def fail_once(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE articles") and failures:
+            raise failures.pop()
+
+    counter.record("article-1", count=2, when=WHEN)
+    with pytest.raises(OperationalError):
+        asyncio.run(counter.flush())
+    assert daily_views("article-1") == 2
+
+    asyncio.run(counter.flush())
+
+    assert article_views(db_engine)["article-1"] == 2
+    assert daily_views("article-1") == 2